@@ -242,6 +242,54 @@ CELERY_RESULT_SERIALIZER = "json"
 
 CELERY_BROKER_URL = 'redis://localhost:6379'
 
+# Periodic tasks, run by 'celery -A config beat'
+CELERY_BEAT_SCHEDULE = {
+    'drain-kiosk-submissions': {
+        'task': 'data_monitoring.tasks.process_kiosk_submissions',
+        'schedule': 60.0,  # Seconds; picks up queued submissions whose worker could not be started
+    },
+}
+
+# Cache Settings
+# Shared between the gunicorn workers and the Celery workers
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://localhost:6379/1',
+    }
+}
+
+# Kiosk Settings
+KIOSK_SUBMISSION_BATCH_SIZE = 100  # Submissions applied per worker transaction
+KIOSK_REFERENCE_CACHE_TIMEOUT = 3600  # Reference data is also invalidated by signals on change
+ORDER_LOOKUP_LOCAL_SIZE = 2048  # Order summaries kept in each process for QR scans
+ORDER_LOOKUP_LOCAL_TTL = 60  # Seconds before a process re-reads an order summary from the shared cache
+ORDER_LOOKUP_CACHE_TIMEOUT = 86400  # Order summaries are also invalidated on SalesOrder changes
+
+# Monitoring List Settings
+MONITORING_LIST_PAGE_SIZE = 200  # Rows per page of the dryplan/drymix/dryline/delamination/inspection lists
+MONITORING_LIST_MAX_PAGE_SIZE = 1000  # Upper bound for the page_size parameter
+MONITORING_LIST_COUNT_LIMIT = 10000  # Row counts stop here where no planner estimate exists (SQLite)
+EXPORT_CHUNK_SIZE = 2000  # Rows fetched per round trip by the streaming exports
+EXPORT_SPOOL_MAX_MEMORY = 8 * 1024 * 1024  # Bytes of export rows spooled in memory before moving to a temporary file
+API_DEFAULT_DAYS = 7  # Days of records returned by the JSON API when no start_date / end_date or order list is given
+
+# Archive Settings
+PHASE_ARCHIVE_AGE_DAYS = 365  # Phase rows of shipped orders older than this move to ArchivedPhase
+PHASE_ARCHIVE_BATCH_SIZE = 1000  # Rows moved per transaction
+
+# Lot Settings
+LOT_RESERVATION_MINUTES = 30  # A lot number reserved by a search is handed out again after this
+
+# Traceability Settings
+TRACE_MAX_DEPTH = 8  # Edges followed by a lot genealogy trace
+
+# Order Upload Settings
+ORDER_UPLOAD_CHUNK_SIZE = 500  # Orders written per transaction by the ERP order sheet upload
+ORDER_UPLOAD_STORAGE = 'local'  # Where uploaded sheets are kept for the worker: 'local' or 's3'
+ORDER_UPLOAD_DIR = BASE_DIR / 'uploads/order_sheets'  # Local storage, shared with the Celery worker
+ORDER_UPLOAD_S3_PREFIX = 'uploads/order_sheets/'  # S3 storage, in AWS_STORAGE_BUCKET_NAME
+
 # Email Backend Settings
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = 'smtp.gmail.com'
@@ -9,6 +9,8 @@ AWS_STORAGE_BUCKET_NAME = 'bsv-mes-prod-bucket'
 AWS_S3_CUSTOM_DOMAIN = 'bsv-mes-prod-bucket.s3.ap-southeast-1.amazonaws.com'
 AWS_S3_REGION_NAME = 'ap-southeast-1'
 
+ORDER_UPLOAD_STORAGE = 's3'  # Uploaded order sheets are read by the Celery worker from S3
+
 env = environ.Env()
 environ.Env.read_env(BASE_DIR / '.env')
 
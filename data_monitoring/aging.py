@@ -0,0 +1,90 @@
+from django.db import transaction
+from django.db.models import Count, Max, Min, Sum
+from django.utils import timezone
+from .models import AgingPosition, AgingMovement
+
+import logging
+logger = logging.getLogger('data_monitoring')
+
+# Aging room occupancy.
+# A DryLine roll put in a position opens an AgingMovement (entry); moving it elsewhere or taking it out of the
+# aging room closes it (exit). DryLine.ag_position keeps the last position of the roll.
+# AgingPosition carries the occupancy of each rack (rolls, quantity, oldest / newest entry), refreshed for the
+# positions touched by each entry or exit from their open movements only (partial index on exit_date IS NULL).
+
+def position_code(aging_position):
+    return aging_position.replace(" ", "").upper()
+
+def refresh_positions(position_ids):
+    """Recompute the occupancy of the given positions from their open movements."""
+    position_ids = set(position_ids)
+    if not position_ids:
+        return []
+    occupancy = {
+        row['position_id']: row
+        for row in AgingMovement.objects.filter(position_id__in=position_ids, exit_date__isnull=True)
+        .values('position_id')
+        .annotate(roll_count=Count('id'), pd_qty=Sum('dryline__pd_qty'), first_entry_date=Min('entry_date'), last_entry_date=Max('entry_date'))
+    }
+
+    now = timezone.now()
+    positions = list(AgingPosition.objects.filter(id__in=position_ids))
+    for position in positions:
+        row = occupancy.get(position.id, {})
+        position.roll_count = row.get('roll_count', 0)
+        position.pd_qty = row.get('pd_qty') or 0
+        position.first_entry_date = row.get('first_entry_date')
+        position.last_entry_date = row.get('last_entry_date')
+        position.modify_date = now
+    AgingPosition.objects.bulk_update(positions, ['roll_count', 'pd_qty', 'first_entry_date', 'last_entry_date', 'modify_date'])
+    return positions
+
+def enter_position(rolls, aging_position):
+    """
+    Put the DryLine rolls of a queryset in an aging position. Rolls already in another position leave it,
+    rolls already in this one keep their entry. Returns the number of rolls.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        position, _ = AgingPosition.objects.get_or_create(code=position_code(aging_position))
+        # Lock the rolls and their open movements first: a concurrent entry or exit of the same rolls waits, then
+        # sees the movements written here instead of opening a second one per roll (unique_open_aging_movement)
+        roll_ids = list(rolls.select_for_update().values_list('id', flat=True))
+        open_movements = AgingMovement.objects.filter(dryline_id__in=roll_ids, exit_date__isnull=True)
+        list(open_movements.select_for_update().values_list('id', flat=True))
+        staying = set(open_movements.filter(position=position).values_list('dryline_id', flat=True))
+        left_positions = set(open_movements.exclude(position=position).values_list('position_id', flat=True))
+        open_movements.exclude(position=position).update(exit_date=now)
+
+        AgingMovement.objects.bulk_create([
+            AgingMovement(position=position, dryline_id=roll_id, entry_date=now)
+            for roll_id in roll_ids if roll_id not in staying
+        ])
+        rolls.model.objects.filter(id__in=roll_ids).update(ag_position=position.code, modify_date=now)
+        refresh_positions(left_positions | {position.id})
+    return len(roll_ids)
+
+def exit_positions(rolls):
+    """Take the DryLine rolls of a queryset out of the aging room. Returns the number of rolls taken out."""
+    now = timezone.now()
+    with transaction.atomic():
+        open_movements = AgingMovement.objects.filter(dryline_id__in=rolls.values('id'), exit_date__isnull=True)
+        position_ids = set(open_movements.select_for_update().values_list('position_id', flat=True))
+        count = open_movements.update(exit_date=now)
+        refresh_positions(position_ids)
+    return count
+
+def occupancy(now=None):
+    """Occupied positions with their dwell times (hours the oldest / newest roll has been in), by code."""
+    now = now or timezone.now()
+    positions = list(AgingPosition.objects.filter(roll_count__gt=0).order_by('code'))
+    for position in positions:
+        position.max_dwell_hours = round((now - position.first_entry_date).total_seconds() / 3600, 1)
+        position.min_dwell_hours = round((now - position.last_entry_date).total_seconds() / 3600, 1)
+    return positions
+
+def position_rolls(code):
+    """Open movements of a position with their rolls, longest stay first."""
+    return AgingMovement.objects.filter(
+        position__code=position_code(code), exit_date__isnull=True
+    ).select_related('dryline', 'dryline__sales_order').order_by('entry_date', 'id')
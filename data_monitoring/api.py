@@ -0,0 +1,170 @@
+import base64
+import binascii
+import hashlib
+from functools import wraps
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.db.models import Count, Max, Q
+from django.db.models.functions import Coalesce
+from django.http import JsonResponse
+from .exports import EXPORTS, export_queryset, export_window
+from .listing import keyset_page, page_size_param
+
+# Read-only JSON API over the phase records, for the BI / ERP clients polling the monitoring data.
+# Rows are selected with the same filters as the list pages and exports (order list, search fields, date range, line)
+# and paged by keyset on (create_date, id), newest first. `fields` picks the columns returned.
+# Without an order list, only the records of the last API_DEFAULT_DAYS days are returned unless start_date / end_date
+# are given; the window applied is part of every response.
+# Each response carries an ETag and Last-Modified derived from modify_date, so a poll of unchanged data is a 304.
+# Machine clients authenticate with HTTP Basic auth as a Django user, browsers with their session.
+
+def order_fields(path):
+    return {
+        'order_no': f'{path}__order_no',
+        'order_type': f'{path}__order_type',
+        'etd': f'{path}__etd',
+        'customer_name': f'{path}__customer_name',
+        'item_name': f'{path}__item_name',
+        'color_code': f'{path}__color_code',
+        'pattern': f'{path}__pattern',
+        'order_qty': f'{path}__order_qty',
+    }
+
+# Resource name -> export spec giving the model and filters, and the fields of the API rows (name -> ORM path)
+API_RESOURCES = {
+    'productionplan': {
+        'spec': {**EXPORTS['dryplan'], 'filter': Q()}, # Every item group, see the item_group parameter
+        'fields': {
+            'id': 'id', 'plan_no': 'plan_no', 'plan_date': 'plan_date', 'plan_qty': 'plan_qty', 'pd_line': 'pd_line',
+            'item_group': 'item_group', **order_fields('sales_order'),
+            'pd_information': 'pd_information', 'create_date': 'create_date', 'modify_date': 'modify_date',
+        },
+    },
+    'drymix': {
+        'spec': EXPORTS['drymix'],
+        'fields': {
+            'id': 'id', 'production_plan': 'production_plan_id', **order_fields('sales_order'),
+            'worker_code': 'worker_code', 'mixing_information': 'mixing_information',
+            'create_date': 'create_date', 'modify_date': 'modify_date',
+        },
+    },
+    'dryline': {
+        'spec': EXPORTS['dryline'],
+        'fields': {
+            'id': 'id', 'production_plan': 'production_plan_id', 'line_no': 'line_no', **order_fields('sales_order'),
+            'pd_qty': 'pd_qty', 'pd_lot': 'pd_lot', 'ag_position': 'ag_position', 'pd_information': 'pd_information',
+            'create_date': 'create_date', 'modify_date': 'modify_date',
+        },
+    },
+    'delamination': {
+        'spec': EXPORTS['delamination'],
+        'fields': {
+            'id': 'id', 'production_plan': 'production_plan_id', 'line_no': 'line_no', **order_fields('sales_order'),
+            'dlami_qty': 'dlami_qty', 'dlami_lot': 'dlami_lot', 'dlami_information': 'dlami_information',
+            'create_date': 'create_date', 'modify_date': 'modify_date',
+        },
+    },
+    'inspection': {
+        'spec': EXPORTS['inspection'],
+        'fields': {
+            'id': 'id', 'production_plan': 'production_plan_id', 'line_no': 'line_no', **order_fields('sales_order'),
+            'ins_qty': 'ins_qty', 'qty_to_printing': 'qty_to_printing', 'position': 'position', 'ins_information': 'ins_information',
+            'create_date': 'create_date', 'modify_date': 'modify_date',
+        },
+    },
+    'printing': {
+        'spec': EXPORTS['printing'],
+        'fields': {
+            'id': 'id', 'production_plan': 'production_plan_id', 'line_no': 'line_no', **order_fields('sales_order'),
+            'print_qty': 'print_qty', 'print_information': 'print_information',
+            'create_date': 'create_date', 'modify_date': 'modify_date',
+        },
+    },
+}
+
+class APIError(Exception):
+    pass
+
+def basic_auth_user(request):
+    """Active user of the request's HTTP Basic credentials, None when missing or wrong."""
+    method, _, credentials = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+    if method.lower() != 'basic' or not credentials:
+        return None
+    try:
+        username, separator, password = base64.b64decode(credentials.strip(), validate=True).decode('utf-8').partition(':')
+    except (binascii.Error, UnicodeDecodeError):
+        return None
+    if not separator:
+        return None
+    user = authenticate(request, username=username, password=password)
+    return user if user is not None and user.is_active else None
+
+def api_login_required(view):
+    """login_required for the API: a logged-in session or HTTP Basic credentials, 401 otherwise (no login redirect)."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            user = basic_auth_user(request)
+            if user is None:
+                response = JsonResponse({"status": "fail", "message": "Authentication required"}, status=401)
+                response['WWW-Authenticate'] = 'Basic realm="BSV MES API", charset="UTF-8"'
+                return response
+            # Per request only, no session is opened for machine clients
+            request.user = user
+        return view(request, *args, **kwargs)
+    return wrapper
+
+def api_spec(name):
+    """Export spec of the resource with the API's own default window."""
+    return {**API_RESOURCES[name]['spec'], 'default_days': settings.API_DEFAULT_DAYS}
+
+def api_window(name, data):
+    """(start_date, end_date) of the records returned, None when an order list is given."""
+    return export_window(api_spec(name), data)
+
+def api_queryset(name, data):
+    """Records of the resource matching the request parameters."""
+    queryset = export_queryset(api_spec(name), data)
+    item_group = data.get('item_group', '')
+    if item_group and name == 'productionplan':
+        queryset = queryset.filter(item_group=item_group)
+    return queryset
+
+def api_fields(name, data):
+    """Requested fields (?fields=id,order_no,...), all of them by default."""
+    fields = API_RESOURCES[name]['fields']
+    requested = [field.strip() for field in data.get('fields', '').split(',') if field.strip()]
+    unknown = [field for field in requested if field not in fields]
+    if unknown:
+        raise APIError(f"Unknown fields: {', '.join(unknown)}")
+    return requested or list(fields)
+
+def api_validators(request, name):
+    """
+    (ETag, Last-Modified) of a request: the newest modify_date and the row count of the filtered records,
+    so edits and deletions both change the ETag. Computed once per request with one aggregate query.
+    """
+    if not hasattr(request, 'api_validators'):
+        if name not in API_RESOURCES:
+            request.api_validators = (None, None)
+        else:
+            summary = api_queryset(name, request.GET).order_by().aggregate(
+                last_modified=Max(Coalesce('modify_date', 'create_date')),
+                count=Count('id')
+            )
+            last_modified = summary['last_modified']
+            version = f"{name}:{sorted(request.GET.lists())}:{summary['count']}:{last_modified and last_modified.isoformat()}"
+            request.api_validators = (hashlib.md5(version.encode()).hexdigest(), last_modified)
+    return request.api_validators
+
+def api_page(name, data):
+    """
+    One page of the resource as JSON-ready dicts and the cursor of the next page.
+    Only the requested columns are read; id and create_date are always read for the cursor.
+    """
+    fields = api_fields(name, data)
+    paths = API_RESOURCES[name]['fields']
+    queryset = api_queryset(name, data).values(*dict.fromkeys(['id', 'create_date'] + [paths[field] for field in fields]))
+
+    rows, next_cursor = keyset_page(queryset, 'create_date', data.get('cursor', ''), page_size_param(data), descending=True)
+    return [{field: row[paths[field]] for field in fields} for row in rows], next_cursor
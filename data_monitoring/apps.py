@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class DataMonitoringConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'data_monitoring'
+
+    def ready(self):
+        from . import signals
@@ -0,0 +1,70 @@
+import datetime
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import DryMix, DryLine, Delamination, Inspection, Printing, ProductionEvent, ArchivedPhase
+from .events import PHASE_PROCESSES, build_event
+
+import logging
+logger = logging.getLogger('data_monitoring')
+
+# Hot/cold split of the phase tables.
+# Phase rows of shipped orders (SalesOrder.status=True) older than PHASE_ARCHIVE_AGE_DAYS are moved, with their
+# ProductionEvent, to ArchivedPhase. The monitoring lists, waitlists and exports only read the hot tables;
+# order timelines read the archive when OrderStatus is refreshed, so the order search still counts them.
+
+ARCHIVED_MODELS = [DryMix, DryLine, Delamination, Inspection, Printing]
+
+def archive_cutoff(age_days=None):
+    if age_days is None:
+        age_days = settings.PHASE_ARCHIVE_AGE_DAYS
+    return timezone.now() - datetime.timedelta(days=age_days)
+
+def archivable_rows(model, cutoff):
+    return model.objects.filter(sales_order__status=True, create_date__lt=cutoff)
+
+def archived_phase(row):
+    """ArchivedPhase of a phase row: its timeline event and the whole row."""
+    event = build_event(row, row.sales_order_id)
+    return ArchivedPhase(
+        sales_order_id=row.sales_order_id,
+        process=event.process,
+        source_id=row.id,
+        machine=event.machine,
+        qty=event.qty,
+        payload=event.payload,
+        data={field.attname: getattr(row, field.attname) for field in row._meta.concrete_fields},
+        create_date=row.create_date
+    )
+
+def archive_batch(model, ids):
+    """Move one batch of rows of a phase table to the archive, in one transaction."""
+    with transaction.atomic():
+        rows = list(model.objects.filter(id__in=ids))
+        ArchivedPhase.objects.bulk_create([archived_phase(row) for row in rows], ignore_conflicts=True)
+        # The events go first: the post_delete signals then find none and leave OrderStatus, which counts the
+        # archived rows, as it is
+        ProductionEvent.objects.filter(process=PHASE_PROCESSES[model], source_id__in=ids).delete()
+        # ORM delete: the aging movements of archived rolls cascade (their positions are refreshed by the
+        # AgingMovement signal) and the signals drop the trace edges of the rows
+        model.objects.filter(id__in=ids).delete()
+    return len(rows)
+
+def archive_phases(age_days=None, batch_size=None):
+    """
+    Archive the phase rows of shipped orders older than `age_days`, in batches of `batch_size` rows.
+    Returns {model name: archived row count}.
+    """
+    cutoff = archive_cutoff(age_days)
+    batch_size = batch_size or settings.PHASE_ARCHIVE_BATCH_SIZE
+
+    counts = {}
+    for model in ARCHIVED_MODELS:
+        counts[model.__name__] = 0
+        while True:
+            ids = list(archivable_rows(model, cutoff).order_by('id').values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            counts[model.__name__] += archive_batch(model, ids)
+        logger.info(f"[ARCHIVE] {model.__name__}: {counts[model.__name__]} rows before {cutoff:%Y-%m-%d}")
+    return counts
@@ -0,0 +1,100 @@
+from .models import DryMix, DryLine, Delamination, Inspection, Printing, ProductionEvent
+from production_management.models import ProductionPlan
+from .status import apply_event_changes
+from .trace import link_rows, unlink_rows
+
+# ProductionEvent is the per-order timeline of every plan and phase row.
+# It is written in the same transaction as the phase rows: explicitly by the batched kiosk writes
+# and through signals for rows saved one by one. An edit of a phase row (e.g. an unconfirmed roll
+# updated from the kiosk) rewrites the event of that row instead of appending a new one.
+# Every write also updates the OrderStatus of the orders it touched by the difference between the old and
+# new events, and replaces the trace links of its rows.
+
+PHASE_PROCESSES = {
+    ProductionPlan: 'DryPlan',
+    DryMix: 'DryMix',
+    DryLine: 'DryLine',
+    Delamination: 'RP',
+    Inspection: 'Inspection',
+    Printing: 'Printing',
+}
+
+EVENT_FIELDS = ['sales_order', 'machine', 'qty', 'payload', 'create_date']
+
+def build_event(phase, sales_order_id):
+    process = PHASE_PROCESSES[type(phase)]
+    event = ProductionEvent(sales_order_id=sales_order_id, process=process, source_id=phase.id, create_date=phase.create_date)
+
+    if process == 'DryPlan':
+        event.machine = phase.pd_line
+        event.qty = phase.plan_qty
+        event.payload = {**(phase.pd_information or {}), 'plan_date': str(phase.plan_date)[:10]}
+    elif process == 'DryMix':
+        event.machine = ''
+        event.payload = {'mixing_information': phase.mixing_information or [], 'worker_code': phase.worker_code}
+    elif process == 'DryLine':
+        event.machine = phase.line_no
+        event.qty = phase.pd_qty
+    elif process == 'RP':
+        event.machine = phase.line_no
+        event.qty = phase.dlami_qty
+    elif process == 'Inspection':
+        event.machine = phase.line_no
+        event.qty = phase.ins_qty
+        event.payload = {'defect': phase.ins_information or [], 'qty_to_printing': phase.qty_to_printing}
+    elif process == 'Printing':
+        event.machine = phase.line_no
+        event.qty = phase.print_qty
+    return event
+
+def record_production_events(phases):
+    """
+    Write (or rewrite) the events of the given plan / phase rows with one lookup query and one upsert.
+    Call it inside the transaction that wrote the rows.
+    """
+    # Only Dry plans are part of the timeline
+    other_plans = [phase for phase in phases if isinstance(phase, ProductionPlan) and phase.item_group != 'Dry']
+    removed = []
+    if other_plans:
+        removed = list(ProductionEvent.objects.filter(process='DryPlan', source_id__in=[plan.id for plan in other_plans]))
+        ProductionEvent.objects.filter(id__in=[event.id for event in removed]).delete()
+    phases = [phase for phase in phases if not (isinstance(phase, ProductionPlan) and phase.item_group != 'Dry')]
+    plan_ids = {phase.production_plan_id for phase in phases if not isinstance(phase, ProductionPlan) and phase.production_plan_id}
+    plan_orders = dict(ProductionPlan.objects.filter(id__in=plan_ids).values_list('id', 'sales_order_id')) if plan_ids else {}
+
+    events = []
+    for phase in phases:
+        if isinstance(phase, ProductionPlan):
+            sales_order_id = phase.sales_order_id
+        else:
+            sales_order_id = getattr(phase, 'sales_order_id', None) or plan_orders.get(phase.production_plan_id)
+        if sales_order_id is None:
+            continue
+        events.append(build_event(phase, sales_order_id))
+
+    # The events rewritten by this write, to update the order status by difference
+    previous = {
+        (event.process, event.source_id): event
+        for event in ProductionEvent.objects.filter(source_id__in={event.source_id for event in events}, process__in={event.process for event in events})
+    } if events else {}
+
+    ProductionEvent.objects.bulk_create(
+        events,
+        update_conflicts=True,
+        unique_fields=['process', 'source_id'],
+        update_fields=EVENT_FIELDS
+    )
+    apply_event_changes(
+        [(previous.get((event.process, event.source_id)), event) for event in events] + [(event, None) for event in removed]
+    )
+    link_rows(phases)
+    return events
+
+def delete_production_events(phase):
+    events = list(ProductionEvent.objects.filter(process=PHASE_PROCESSES[type(phase)], source_id=phase.id))
+    if events:
+        ProductionEvent.objects.filter(id__in=[event.id for event in events]).delete()
+        apply_event_changes([(event, None) for event in events])
+    # A deleted plan takes its trace links along
+    if not isinstance(phase, ProductionPlan):
+        unlink_rows([phase])
@@ -0,0 +1,229 @@
+import csv
+import datetime
+import json
+import pickle
+import tempfile
+from django.conf import settings
+from django.db.models import Q
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from openpyxl import Workbook
+from production_management.models import ProductionPlan
+from production_management.search import search_terms, search_filter
+from .models import DryMix, DryLine, Delamination, Inspection, Printing
+from .kiosk import DEFECT_CAUSES
+
+# Streaming exports of the monitoring lists.
+# Rows are read once with values_list(...).iterator(), a server-side cursor on PostgreSQL. JSON columns (chemicals,
+# defects, plan details) are flattened into one column per key, and the header needs every key before the first
+# row: the flattened rows are spooled (in memory up to EXPORT_SPOOL_MAX_MEMORY, then on disk) while the keys are
+# collected, then written out after the header. CSV streams from the spool to the response; XLSX goes through an
+# openpyxl write-only workbook, which is only a valid file once saved, to a temporary file.
+
+def order_columns(path):
+    return [
+        ('OrderNo', f'{path}__order_no'),
+        ('OrderType', f'{path}__order_type'),
+        ('OrderDate', f'{path}__order_date'),
+        ('RTD', f'{path}__rtd'),
+        ('ETD', f'{path}__etd'),
+        ('Brand', f'{path}__brand'),
+        ('Customer', f'{path}__customer_name'),
+        ('Item', f'{path}__item_name'),
+        ('ColorCode', f'{path}__color_code'),
+        ('Pattern', f'{path}__pattern'),
+        ('Spec', f'{path}__spec'),
+        ('OrderQty', f'{path}__order_qty'),
+    ]
+
+def flatten_dict(value):
+    """{'base': 'X', ...} -> one column per key."""
+    if not isinstance(value, dict):
+        return {}
+    return {key: item if isinstance(item, (str, int, float)) or item is None else json.dumps(item, ensure_ascii=False)
+            for key, item in value.items()}
+
+def flatten_chemicals(value):
+    """[{'item': 'A', 'quantity': 1, 'unit': 'kg'}, ...] -> one column per chemical."""
+    return {info.get('item'): f"{info.get('quantity')}{info.get('unit', '')}"
+            for info in value or [] if isinstance(info, dict) and info.get('item')}
+
+def flatten_defects(value):
+    """[{'defectCause': 'Shiny', 'quantity': 3}, ...] -> one column per defect cause."""
+    return {info.get('defectCause'): info.get('quantity')
+            for info in value or [] if isinstance(info, dict) and info.get('defectCause')}
+
+EXPORTS = {
+    'dryplan': {
+        'model': ProductionPlan,
+        'order_path': 'sales_order',
+        'filter': Q(item_group='Dry'),
+        'line_field': 'pd_line',
+        'default_days': 3,
+        'columns': [('Line', 'pd_line'), ('PlanDate', 'plan_date'), ('PlanNo', 'plan_no')] + order_columns('sales_order') + [
+            ('PlanQty', 'plan_qty'), ('DateTime', 'create_date')],
+        'json_field': 'pd_information',
+        'flatten': flatten_dict,
+    },
+    'drymix': {
+        'model': DryMix,
+        'order_path': 'sales_order',
+        'default_days': 3,
+        'columns': order_columns('sales_order') + [('DateTime', 'create_date'), ('WorkerCode', 'worker_code')],
+        'json_field': 'mixing_information',
+        'flatten': flatten_chemicals,
+    },
+    'dryline': {
+        'model': DryLine,
+        'order_path': 'sales_order',
+        'line_field': 'line_no',
+        'default_days': 3,
+        'columns': [('Line', 'line_no')] + order_columns('sales_order') + [
+            ('P/D Qty', 'pd_qty'), ('Lot', 'pd_lot'), ('AgingPosition', 'ag_position'), ('DateTime', 'create_date')],
+        'json_field': 'production_plan__pd_information',
+        'flatten': flatten_dict,
+    },
+    'delamination': {
+        'model': Delamination,
+        'order_path': 'sales_order',
+        'line_field': 'line_no',
+        'default_days': 7,
+        'columns': [('Line', 'line_no')] + order_columns('sales_order') + [
+            ('RP Qty', 'dlami_qty'), ('Lot', 'dlami_lot'), ('DateTime', 'create_date')],
+        'json_field': 'dlami_information',
+        'flatten': flatten_dict,
+    },
+    'inspection': {
+        'model': Inspection,
+        'order_path': 'sales_order',
+        'line_field': 'line_no',
+        'default_days': 3,
+        'columns': [('Line', 'line_no')] + order_columns('sales_order') + [
+            ('A Grade Qty', 'ins_qty'), ('Qty To Printing', 'qty_to_printing'), ('DateTime', 'create_date')],
+        'json_field': 'ins_information',
+        'flatten': flatten_defects,
+        'json_keys': list(DEFECT_CAUSES),
+    },
+    'printing': {
+        'model': Printing,
+        'order_path': 'sales_order',
+        'line_field': 'line_no',
+        'default_days': 3,
+        'columns': [('Line', 'line_no')] + order_columns('sales_order') + [
+            ('Print Qty', 'print_qty'), ('DateTime', 'create_date')],
+        'json_field': 'print_information',
+        'flatten': flatten_dict,
+    },
+}
+
+def order_numbers_param(data):
+    return [order_no.strip() for order_no in data.get('order_numbers', '').split(',') if order_no.strip()]
+
+def export_window(spec, data):
+    """
+    (start_date, end_date) of the rows, the request's dates or the last default_days days.
+    None when an order list is given: those orders are read whatever their dates.
+    """
+    if order_numbers_param(data):
+        return None
+    start_date = parse_date(data.get('start_date', ''))
+    end_date = parse_date(data.get('end_date', ''))
+    if not (start_date and end_date):
+        # Same window as the list page without a search
+        end_date = timezone.localdate()
+        start_date = end_date - datetime.timedelta(days=spec['default_days'])
+    return start_date, end_date
+
+def export_queryset(spec, data):
+    """Rows of the export, filtered like the list pages: order list, search fields, date range and line."""
+    query = spec.get('filter', Q())
+
+    order_numbers = order_numbers_param(data)
+    if order_numbers:
+        query &= Q(**{f"{spec['order_path']}__order_no__in": order_numbers})
+    else:
+        query &= search_filter(search_terms(data), spec['order_path'])
+
+        start_date, end_date = export_window(spec, data)
+        start_of_day = timezone.make_aware(datetime.datetime.combine(start_date, datetime.time.min))
+        end_of_day = timezone.make_aware(datetime.datetime.combine(end_date, datetime.time.max))
+        query &= Q(create_date__range=(start_of_day, end_of_day))
+
+    line = data.get('line', '')
+    if line and spec.get('line_field'):
+        query &= Q(**{spec['line_field']: line})
+
+    return spec['model'].objects.filter(query).order_by('-create_date', '-id')
+
+def spool_rows(spec, queryset):
+    """
+    Read the records once, spooling the flattened rows while their JSON keys are collected.
+    Returns the JSON keys in the order they should appear (the known keys, then the others as found) and the spool.
+    """
+    fields = [field for _, field in spec['columns']]
+    keys = dict.fromkeys(spec.get('json_keys', []))
+    spool = tempfile.SpooledTemporaryFile(max_size=settings.EXPORT_SPOOL_MAX_MEMORY)
+
+    for values in queryset.values_list(*fields, spec['json_field']).iterator(chunk_size=settings.EXPORT_CHUNK_SIZE):
+        row = [timezone.localtime(value).replace(tzinfo=None, microsecond=0) if isinstance(value, datetime.datetime) else value
+               for value in values[:-1]]
+        flattened = spec['flatten'](values[-1])
+        keys.update(dict.fromkeys(flattened))
+        pickle.dump((row, flattened), spool)
+    spool.seek(0)
+    return list(keys), spool
+
+def export_rows(spec, json_keys, spool):
+    """Header row, then one row per spooled record."""
+    yield [header for header, _ in spec['columns']] + json_keys
+    with spool:
+        while True:
+            try:
+                row, flattened = pickle.load(spool)
+            except EOFError:
+                return
+            yield row + [flattened.get(key) for key in json_keys]
+
+class Echo:
+    """File-like object csv.writer can write to; returns each line instead of storing it."""
+
+    def write(self, value):
+        return value
+
+def csv_response(rows, filename):
+    writer = csv.writer(Echo())
+
+    def lines():
+        yield '\ufeff' # Lets Excel open the UTF-8 file with Vietnamese text correctly
+        for row in rows:
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(lines(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
+
+def xlsx_response(rows, filename):
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet(filename[:31])
+    for row in rows:
+        worksheet.append(row)
+
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return FileResponse(
+        output,
+        as_attachment=True,
+        filename=f'{filename}.xlsx',
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
+
+def export_response(name, data, file_format='csv'):
+    spec = EXPORTS[name]
+    rows = export_rows(spec, *spool_rows(spec, export_queryset(spec, data)))
+    filename = f"{name}_{timezone.localtime().strftime('%Y%m%d_%H%M%S')}"
+
+    if file_format == 'xlsx':
+        return xlsx_response(rows, filename)
+    return csv_response(rows, filename)
@@ -0,0 +1,454 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F, Max, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+from django.core.cache import cache
+from django.conf import settings
+from .models import DryMix, DryLine, Delamination, Inspection, Printing, KioskSubmission
+from .events import record_production_events
+from production_management.models import SalesOrder, ProductionPlan
+from workforce_management.models import Worker
+from inventory_management.models import RawMaterial, Category
+import hashlib
+import json
+
+import logging
+logger = logging.getLogger('data_monitoring')
+
+# Kiosk scans are written in batches: every helper below costs a fixed number of
+# queries for the whole scan list instead of a few queries per scanned roll.
+# `create_date` lets events synced by an offline kiosk keep the time they were scanned.
+
+def scanned_order_numbers(scanned_orders):
+    """Return the SOV order numbers of a kiosk scan list, keeping the scan order."""
+    return [order['order_number'] for order in scanned_orders if order['order_number'][:3] == 'SOV']
+
+def resolve_sales_orders(order_numbers):
+    """Map order_no -> active SalesOrder for every scanned order number in one query."""
+    sales_orders = SalesOrder.objects.exclude(status=False).filter(order_no__in=set(order_numbers))
+    return {sales_order.order_no: sales_order for sales_order in sales_orders}
+
+def latest_by(queryset, partition_field):
+    """
+    Return {group value: newest row} for each `partition_field` group of the queryset.
+    Uses a ROW_NUMBER() window so the whole lookup is one query.
+    """
+    rows = queryset.annotate(
+        group_key=F(partition_field),
+        row_number=Window(
+            expression=RowNumber(),
+            partition_by=[F(partition_field)],
+            order_by=[F('create_date').desc(), F('id').desc()]
+        )
+    ).filter(row_number=1)
+    return {row.group_key: row for row in rows}
+
+def latest_plan_ids(sales_orders):
+    """Map sales_order_id -> id of its most recent ProductionPlan."""
+    plans = latest_by(
+        ProductionPlan.objects.filter(sales_order__in=sales_orders).only('id', 'sales_order_id', 'create_date'),
+        'sales_order_id'
+    )
+    return {sales_order_id: plan.id for sales_order_id, plan in plans.items()}
+
+def latest_dryline_plan_ids(sales_orders):
+    """Map sales_order_id -> production_plan_id of its most recent DryLine roll."""
+    phases = latest_by(
+        DryLine.objects.filter(sales_order__in=sales_orders).only('id', 'sales_order_id', 'production_plan_id', 'create_date'),
+        'sales_order_id'
+    )
+    return {sales_order_id: phase.production_plan_id for sales_order_id, phase in phases.items()}
+
+def ingest_drymix(data, create_date=None):
+    """Save one DryMix row per scanned order against the order's latest plan."""
+    order_numbers = scanned_order_numbers(data.get('scannedOrders', []))
+    quantity_data = data.get('quantityInput', [])
+    worker_code = data.get('staffNumber', '')  # The employee number of the worker
+    now = create_date or timezone.now()
+
+    with transaction.atomic():
+        sales_orders = resolve_sales_orders(order_numbers)
+        plan_ids = latest_plan_ids(sales_orders.values())
+
+        phases = []
+        for order_no in order_numbers:
+            sales_order = sales_orders.get(order_no)
+            if sales_order is None or sales_order.id not in plan_ids:
+                logger.info(f"[KIOSK] DRYMIX ERROR: {order_no}")
+                continue
+            phases.append(DryMix(
+                sales_order=sales_order,
+                production_plan_id=plan_ids[sales_order.id],
+                mixing_information=quantity_data,
+                worker_code=worker_code,
+                create_date=now
+            ))
+            logger.info(f"[KIOSK] DRYMIX SAVED: {order_no}")
+
+        DryMix.objects.bulk_create(phases)
+        record_production_events(phases)
+    return phases
+
+def ingest_dryline(data, create_date=None):
+    """
+    Save the DryLine production of each scanned order.
+    The latest roll of the plan is updated while it is not confirmed (no lot, not in the aging room),
+    otherwise a new roll is added.
+    """
+    order_numbers = list(dict.fromkeys(scanned_order_numbers(data.get('scannedOrders', []))))
+    quantity_data = data.get('quantityInput', [])
+    machine_value = data.get('machine', '')
+    now = create_date or timezone.now()
+
+    with transaction.atomic():
+        sales_orders = resolve_sales_orders(order_numbers)
+        plan_ids = latest_plan_ids(sales_orders.values())
+        latest_phases = latest_by(
+            DryLine.objects.filter(production_plan_id__in=plan_ids.values()).defer('pd_information'),
+            'production_plan_id'
+        )
+
+        created, updated = [], []
+        for order_no in order_numbers:
+            sales_order = sales_orders.get(order_no)
+            if sales_order is None or sales_order.id not in plan_ids:
+                logger.info(f"[KIOSK] DRYLINE ERROR: {order_no}")
+                continue
+            plan_id = plan_ids[sales_order.id]
+            production_phase = latest_phases.get(plan_id)
+
+            if production_phase is None or production_phase.pd_lot is not None or production_phase.ag_position is not None: # If the history is not found or the production roll is confirmed, add a new lot
+                created.append(DryLine(
+                    sales_order=sales_order,
+                    production_plan_id=plan_id,
+                    pd_qty=quantity_data,
+                    line_no=machine_value,
+                    create_date=now
+                ))
+            else: # If the production history exists and the roll is not confirmed, update the existing lot
+                production_phase.pd_qty = quantity_data
+                production_phase.line_no = machine_value
+                production_phase.create_date = now
+                production_phase.modify_date = now
+                updated.append(production_phase)
+            logger.info(f"[KIOSK] DRYLINE SAVED: {order_no}")
+
+        DryLine.objects.bulk_create(created)
+        DryLine.objects.bulk_update(updated, ['pd_qty', 'line_no', 'create_date', 'modify_date'])
+        record_production_events(created + updated)
+    return created + updated
+
+def ingest_rp(data, create_date=None):
+    """
+    Save the RP (Delamination) production of each scanned order against the plan of its latest DryLine roll.
+    The latest roll is updated while it has no lot, otherwise a new roll is added.
+    """
+    order_numbers = list(dict.fromkeys(scanned_order_numbers(data.get('scannedOrders', []))))
+    quantity_data = data.get('quantityInput', [])
+    machine_value = data.get('machine', '')
+    now = create_date or timezone.now()
+
+    with transaction.atomic():
+        sales_orders = resolve_sales_orders(order_numbers)
+        plan_ids = latest_dryline_plan_ids(sales_orders.values())
+        latest_phases = latest_by(
+            Delamination.objects.filter(production_plan_id__in=plan_ids.values()).defer('dlami_information'),
+            'production_plan_id'
+        )
+
+        created, updated = [], []
+        for order_no in order_numbers:
+            sales_order = sales_orders.get(order_no)
+            if sales_order is None or sales_order.id not in plan_ids:
+                logger.info(f"[KIOSK] RP ERROR: {order_no}")
+                continue
+            plan_id = plan_ids[sales_order.id]
+            production_phase = latest_phases.get(plan_id)
+
+            if production_phase is None or production_phase.dlami_lot is not None: # If the history is not found or the production roll is confirmed, add a new lot
+                created.append(Delamination(
+                    sales_order=sales_order,
+                    production_plan_id=plan_id,
+                    dlami_qty=quantity_data,
+                    line_no=machine_value,
+                    create_date=now
+                ))
+            else: # If the production history exists and the roll is not confirmed, update the existing lot
+                production_phase.dlami_qty = quantity_data
+                production_phase.line_no = machine_value
+                production_phase.create_date = now
+                production_phase.modify_date = now
+                updated.append(production_phase)
+            logger.info(f"[KIOSK] RP SAVED: {order_no}")
+
+        Delamination.objects.bulk_create(created)
+        Delamination.objects.bulk_update(updated, ['dlami_qty', 'line_no', 'create_date', 'modify_date'])
+        record_production_events(created + updated)
+    return created + updated
+
+def parse_inspection_quantities(quantity_data):
+    """Split the inspection kiosk input into (A-grade qty, qty to printing, defect list)."""
+    a_qty = 0
+    qty_to_printing = 0
+    defect = []
+
+    for item in quantity_data:
+        if item.get('Grade') == 'A':
+            a_qty = int(item.get('quantity', 0))
+        elif item.get('Grade') == 'Printing':
+            qty_to_printing = int(item.get('quantity', 0))
+        elif item.get('defectCause'):  # Only defects are stored in the JSON
+            defect.append({
+                'quantity': int(item.get('quantity', 0)),
+                'defectCause': item.get('defectCause')
+            })
+    return a_qty, qty_to_printing, defect
+
+def ingest_inspection(data, create_date=None):
+    """Save one Inspection row per scanned order against the plan of its latest DryLine roll."""
+    order_numbers = scanned_order_numbers(data.get('scannedOrders', []))
+    machine_value = data.get('machine', '')
+    a_qty, qty_to_printing, defect = parse_inspection_quantities(data.get('quantityInput', []))
+    now = create_date or timezone.now()
+
+    with transaction.atomic():
+        sales_orders = resolve_sales_orders(order_numbers)
+        plan_ids = latest_dryline_plan_ids(sales_orders.values())
+
+        phases = []
+        for order_no in order_numbers:
+            sales_order = sales_orders.get(order_no)
+            if sales_order is None:
+                logger.info(f"[KIOSK] INSPECTION ERROR: {order_no}")
+                continue
+            phases.append(Inspection(
+                sales_order=sales_order,
+                production_plan_id=plan_ids.get(sales_order.id),
+                ins_qty=a_qty,
+                qty_to_printing=qty_to_printing,
+                line_no=machine_value,
+                ins_information=defect,  # Always a list (empty or with defects)
+                create_date=now
+            ))
+            logger.info(f"[KIOSK] INSPECTION SAVED: {order_no}, A-GRADE: {a_qty}, TO PRINTING: {qty_to_printing}")
+
+        Inspection.objects.bulk_create(phases)
+        record_production_events(phases)
+    return phases
+
+def ingest_printing(data, create_date=None):
+    """Save one Printing row per scanned order with the quantity entered on the kiosk."""
+    order_numbers = scanned_order_numbers(data.get('scannedOrders', []))
+    quantity_input = data.get('quantityInput', '')
+    machine = data.get('machine', '')
+    now = create_date or timezone.now()
+
+    try:
+        print_qty = int(quantity_input)
+    except (TypeError, ValueError):
+        logger.info(f"[KIOSK] PRINTING QUANTITY ERROR: {quantity_input}")
+        return []
+
+    with transaction.atomic():
+        sales_orders = resolve_sales_orders(order_numbers)
+        plan_ids = latest_dryline_plan_ids(sales_orders.values())
+
+        phases = []
+        for order_no in order_numbers:
+            sales_order = sales_orders.get(order_no)
+            if sales_order is None:
+                logger.info(f"[KIOSK] PRINTING ERROR: {order_no}")
+                continue
+            phases.append(Printing(
+                sales_order=sales_order,
+                production_plan_id=plan_ids.get(sales_order.id),
+                print_qty=print_qty,
+                print_information=None,
+                line_no=machine,
+                create_date=now
+            ))
+            logger.info(f"[KIOSK] PRINTING SAVED: {order_no} - QTY: {quantity_input}")
+
+        Printing.objects.bulk_create(phases)
+        record_production_events(phases)
+    return phases
+
+KIOSK_INGESTORS = {
+    'drymix': ingest_drymix,
+    'dryline': ingest_dryline,
+    'rp': ingest_rp,
+    'inspection': ingest_inspection,
+    'printing': ingest_printing,
+}
+
+def validate_kiosk_payload(phase, data):
+    """Raise ValueError if a kiosk payload cannot be ingested, so it is rejected before being queued."""
+    if phase not in KIOSK_INGESTORS:
+        raise ValueError(f"Unknown phase: {phase}")
+
+    scanned_orders = data.get('scannedOrders', [])
+    if not isinstance(scanned_orders, list) or not all(isinstance(order, dict) and order.get('order_number') for order in scanned_orders):
+        raise ValueError("scannedOrders must be a list of {order_number: ...}")
+
+    quantity_data = data.get('quantityInput')
+    if phase == 'drymix':
+        if not isinstance(quantity_data or [], list) or not all(isinstance(material, dict) and material.get('item') for material in quantity_data or []):
+            raise ValueError("quantityInput must be a list of {item: ..., quantity: ...}")
+        for material in quantity_data or []:
+            float(material.get('quantity'))
+        staff_number = data.get('staffNumber', '')
+        if not isinstance(staff_number, str) or len(staff_number) > DryMix._meta.get_field('worker_code').max_length:
+            raise ValueError(f"Invalid staffNumber: {str(staff_number)[:40]}")
+    elif phase == 'inspection':
+        parse_inspection_quantities(quantity_data or [])
+    elif phase in ('dryline', 'rp', 'printing'):
+        int(quantity_data)
+
+def drain_kiosk_submissions(batch_size=100):
+    """
+    Apply pending kiosk submissions in batches until the queue is empty.
+    The phase rows and the 'done' mark of a submission are committed together,
+    so a submission is applied exactly once even if the worker is retried.
+    """
+    processed = 0
+    while True:
+        with transaction.atomic():
+            submissions = list(
+                KioskSubmission.objects.select_for_update(skip_locked=True)
+                .filter(status='pending')
+                .order_by('create_date', 'id')[:batch_size]
+            )
+            for submission in submissions:
+                try:
+                    with transaction.atomic():
+                        # Rows keep the time the kiosk submitted them, not the time the queue is drained
+                        phases = KIOSK_INGESTORS[submission.phase](submission.payload, create_date=submission.create_date)
+                    submission.status = 'done'
+                    submission.saved_count = len(phases)
+                except Exception as e:
+                    logger.info(f"[KIOSK] SUBMISSION ERROR: {submission.idempotency_key} {e}")
+                    submission.status = 'failed'
+                    submission.error = str(e)
+                submission.processed_date = timezone.now()
+            KioskSubmission.objects.bulk_update(submissions, ['status', 'saved_count', 'error', 'processed_date'])
+
+        processed += len(submissions)
+        if len(submissions) < batch_size:
+            return processed
+
+def apply_kiosk_events(kiosk_id, events):
+    """
+    Apply a batch of scan events recorded by an offline kiosk in one transaction.
+    Events are keyed by (kiosk_id, seq); those already applied are skipped, so a kiosk can resend the whole batch safely.
+    Returns the applied/skipped/failed sequence numbers and the kiosk's high-water mark.
+    """
+    events = sorted(events, key=lambda event: int(event['seq']))
+    applied, failed = [], []
+
+    with transaction.atomic():
+        skipped = set(
+            KioskSubmission.objects.filter(kiosk_id=kiosk_id, seq_no__in=[int(event['seq']) for event in events])
+            .values_list('seq_no', flat=True)
+        )
+
+        submissions = []
+        seen = set(skipped)
+        for event in events:
+            seq_no = int(event['seq'])
+            if seq_no in seen:
+                continue
+            seen.add(seq_no)
+            phase = event.get('phase')
+            payload = event.get('payload') or {}
+            submission = KioskSubmission(
+                idempotency_key=f"{kiosk_id}:{seq_no}",
+                kiosk_id=kiosk_id,
+                seq_no=seq_no,
+                phase=phase or '',
+                payload=payload,
+                create_date=event['create_date']
+            )
+            # The submission row claims (kiosk_id, seq) before the event is applied: a concurrent sync of the
+            # same batch waits for it and then skips the event instead of applying it twice
+            try:
+                with transaction.atomic():
+                    submission.save()
+            except IntegrityError:
+                skipped.add(seq_no)
+                continue
+
+            try:
+                validate_kiosk_payload(phase, payload)
+                with transaction.atomic():
+                    phases = KIOSK_INGESTORS[phase](payload, create_date=event['create_date'])
+                submission.status = 'done'
+                submission.saved_count = len(phases)
+                applied.append(seq_no)
+            except Exception as e:
+                # A broken event is recorded as failed so the kiosk does not resend it forever
+                logger.info(f"[KIOSK] SYNC ERROR: {kiosk_id}:{seq_no} {e}")
+                submission.status = 'failed'
+                submission.error = str(e)
+                failed.append(seq_no)
+            submission.processed_date = timezone.now()
+            submissions.append(submission)
+
+        KioskSubmission.objects.bulk_update(submissions, ['status', 'saved_count', 'error', 'processed_date'])
+        high_water_mark = KioskSubmission.objects.filter(kiosk_id=kiosk_id).aggregate(Max('seq_no'))['seq_no__max']
+
+    return {
+        'applied': applied,
+        'skipped': sorted(skipped),
+        'failed': failed,
+        'high_water_mark': high_water_mark,
+    }
+
+DEFECT_CAUSES = {
+    "Shiny": "Bóng",
+    "Stain": "Loang Màu",
+    "Stock": "Stock",
+    "Folding": "Quấn Nhăn",
+    "Pinhole": "Lỗ Kim",
+    "RP Line": "R/P Xước",
+    "Shortage": "Số Lượng Thiếu",
+    "RP Overlap": "R/P Nhăn",
+    "Wrong Base": "Da Sai",
+    "Surface Line": "Xước",
+    "Air Expansion": "Phồng Hơi",
+    "Contamination": "Dơ",
+    "Color Mismatch": "Màu Sai",
+    "Fabric Overlap": "Da Nhăn",
+    "Base Transparency": "Đốm"
+}
+
+REFERENCE_DATA_CACHE_KEY = 'kiosk_reference_data'
+
+def build_reference_data():
+    """Build the reference data used by the kiosk pages: workers by department, category -> materials and defect causes."""
+    workers = {}
+    for worker in Worker.objects.values('id', 'worker_code', 'name', 'department').order_by('id'):
+        workers.setdefault(worker.pop('department'), []).append(worker)
+
+    materials = {category: [] for category in Category.objects.values_list('category_name', flat=True).distinct()}
+    for category, material in RawMaterial.objects.values_list('category__category_name', 'material_name').order_by('id'):
+        materials.setdefault(category, []).append(material)
+
+    content = {
+        'workers': workers,
+        'materials': materials,
+        'defect_causes': DEFECT_CAUSES,
+    }
+    # The version doubles as the ETag, it only changes when the content does
+    version = hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()[:32]
+    return {'version': version, **content}
+
+def get_reference_data():
+    """Return the kiosk reference data from the shared cache, building it on a miss."""
+    reference_data = cache.get(REFERENCE_DATA_CACHE_KEY)
+    if reference_data is None:
+        reference_data = build_reference_data()
+        cache.set(REFERENCE_DATA_CACHE_KEY, reference_data, getattr(settings, 'KIOSK_REFERENCE_CACHE_TIMEOUT', 3600))
+    return reference_data
+
+def invalidate_reference_data():
+    cache.delete(REFERENCE_DATA_CACHE_KEY)
@@ -0,0 +1,87 @@
+import json
+from urllib.parse import urlencode
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Q
+
+# Shared paging for the monitoring lists and waitlists.
+# Pages are read by keyset (the sort value and id of the last row shown) instead of OFFSET,
+# so a page costs the same at the end of years of history as at the beginning.
+
+PAGER_IGNORED_PARAMS = ('cursor', 'csrfmiddlewaretoken')
+
+def keyset_cursor(row, field):
+    if isinstance(row, dict): # .values() rows
+        return f"{row[field].isoformat()}_{row['id']}"
+    return f"{getattr(row, field).isoformat()}_{row.id}"
+
+def keyset_page(queryset, field, cursor, page_size, descending=False):
+    """
+    One page of the queryset sorted by (field, id), starting after the cursor of the last row of the previous page.
+    Returns the rows and the cursor of the next page (None on the last page).
+    """
+    if cursor:
+        value, _, row_id = cursor.rpartition('_')
+        try:
+            value = queryset.model._meta.get_field(field).to_python(value)
+        except ValidationError:
+            value = None
+        if value and row_id.isdigit():
+            lookup = 'lt' if descending else 'gt'
+            queryset = queryset.filter(Q(**{f'{field}__{lookup}': value}) | Q(**{field: value, f'id__{lookup}': int(row_id)}))
+
+    order_by = [f'-{field}', '-id'] if descending else [field, 'id']
+    page = list(queryset.order_by(*order_by)[:page_size + 1])
+    next_cursor = keyset_cursor(page[page_size - 1], field) if len(page) > page_size else None
+    return page[:page_size], next_cursor
+
+def estimated_count(queryset):
+    """
+    Cheap row count for display: the planner estimate on PostgreSQL,
+    elsewhere an exact count that stops at MONITORING_LIST_COUNT_LIMIT.
+    """
+    queryset = queryset.order_by()
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+    return queryset[:settings.MONITORING_LIST_COUNT_LIMIT].count()
+
+def page_size_param(data):
+    try:
+        page_size = int(data.get('page_size', settings.MONITORING_LIST_PAGE_SIZE))
+    except ValueError:
+        page_size = settings.MONITORING_LIST_PAGE_SIZE
+    return min(max(page_size, 1), settings.MONITORING_LIST_MAX_PAGE_SIZE)
+
+def list_page(request, queryset, defer=(), export=None):
+    """
+    One page of a monitoring list, newest first by (create_date, id).
+    `defer` names heavy columns the template does not show. The returned dict goes to the template as `page`;
+    the pager re-submits the same search (GET or POST) with the cursor of the next page
+    and links the `export` of the same search (see exports.EXPORTS).
+    """
+    data = request.POST if request.method == 'POST' else request.GET
+    cursor = data.get('cursor', '')
+    page_size = page_size_param(data)
+
+    rows, next_cursor = keyset_page(queryset.defer(*defer), 'create_date', cursor, page_size, descending=True)
+    params = [(key, value) for key in data if key not in PAGER_IGNORED_PARAMS for value in data.getlist(key)]
+
+    return {
+        'rows': rows,
+        'cursor': cursor,
+        'next_cursor': next_cursor,
+        'page_size': page_size,
+        'estimated_total': estimated_count(queryset),
+        'method': request.method.lower(),
+        'params': params,
+        'export': export,
+        'query': urlencode([(key, value) for key, value in params if key != 'page_size']),
+    }
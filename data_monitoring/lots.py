@@ -0,0 +1,87 @@
+import datetime
+import uuid
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import ProductionLot, LotSequence
+
+import logging
+logger = logging.getLogger('data_monitoring')
+
+# Lot numbers (MMDD-n) for the roll lot registration.
+# A number is reserved when the rolls are searched and registered with them. Reservations carry a random key
+# so an expired number handed to another operator cannot be registered twice. New numbers come from a
+# LotSequence row per prefix locked with SELECT ... FOR UPDATE; released and expired numbers are handed out
+# again first, so numbers stay dense like the former gap search.
+
+class LotReservationError(Exception):
+    pass
+
+def lot_prefix():
+    return timezone.localdate().strftime('%m%d')
+
+def lot_number(lot_no):
+    """n of MMDD-n / MMDD-nA / MMDD-nB, None for other formats."""
+    number = lot_no.rpartition('-')[2].rstrip('AB')
+    return int(number) if number.isdigit() else None
+
+def lot_sequence(prefix):
+    """
+    The locked LotSequence of a prefix. The first one is started after the lots already registered with the prefix
+    (lots of the same day of former years included, lot_no is unique).
+    """
+    sequence = LotSequence.objects.select_for_update().filter(prefix=prefix).first()
+    if sequence is None:
+        numbers = [lot_number(lot_no) for lot_no in ProductionLot.objects.filter(lot_no__startswith=f'{prefix}-').values_list('lot_no', flat=True)]
+        LotSequence.objects.get_or_create(prefix=prefix, defaults={'last_no': max(filter(None, numbers), default=0)})
+        sequence = LotSequence.objects.select_for_update().get(prefix=prefix)
+    return sequence
+
+def reserve_lot():
+    """Reserve the next lot number of the day. Returns the ProductionLot with its reservation_key."""
+    now = timezone.now()
+    prefix = lot_prefix()
+    expire_date = now + datetime.timedelta(minutes=settings.LOT_RESERVATION_MINUTES)
+    reservation_key = uuid.uuid4().hex
+
+    with transaction.atomic():
+        # Released or expired numbers first; skip_locked lets concurrent sessions take different ones
+        lot = ProductionLot.objects.select_for_update(skip_locked=True).filter(
+            Q(status='released') | Q(status='reserved', expire_date__lt=now),
+            lot_no__startswith=f'{prefix}-'
+        ).order_by('id').first()
+
+        if lot is None:
+            sequence = lot_sequence(prefix)
+            sequence.last_no += 1
+            sequence.save(update_fields=['last_no', 'modify_date'])
+            lot = ProductionLot(lot_no=f'{prefix}-{sequence.last_no}')
+
+        lot.status = 'reserved'
+        lot.reservation_key = reservation_key
+        lot.expire_date = expire_date
+        lot.save()
+
+    logger.info(f"[ROLL LOT] RESERVED: {lot.lot_no}")
+    return lot
+
+def register_lot(lot_no, reservation_key):
+    """
+    Turn a reservation into a registered lot. Call it in the transaction that writes the lot on the rolls.
+    An expired reservation is still honoured until the number is handed out again.
+    """
+    updated = ProductionLot.objects.filter(lot_no=lot_no, status='reserved', reservation_key=reservation_key).update(
+        status='registered', reservation_key=None, expire_date=None
+    )
+    if not updated:
+        raise LotReservationError(f"Lot {lot_no} is not reserved by this session")
+
+def release_lot(lot_no, reservation_key):
+    """Give a reserved number back so the next reservation takes it."""
+    released = ProductionLot.objects.filter(lot_no=lot_no, status='reserved', reservation_key=reservation_key).update(
+        status='released', reservation_key=None, expire_date=None
+    )
+    if released:
+        logger.info(f"[ROLL LOT] RELEASED: {lot_no}")
+    return bool(released)
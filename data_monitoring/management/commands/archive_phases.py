@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from data_monitoring.archive import ARCHIVED_MODELS, archive_cutoff, archivable_rows, archive_phases
+
+
+class Command(BaseCommand):
+    help = 'Move the phase rows of shipped orders older than PHASE_ARCHIVE_AGE_DAYS to ArchivedPhase'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--age-days', type=int, help='Defaults to PHASE_ARCHIVE_AGE_DAYS')
+        parser.add_argument('--batch-size', type=int, help='Defaults to PHASE_ARCHIVE_BATCH_SIZE')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the rows that would be archived')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            cutoff = archive_cutoff(options['age_days'])
+            for model in ARCHIVED_MODELS:
+                self.stdout.write(f'{model.__name__}: {archivable_rows(model, cutoff).count()} rows before {cutoff:%Y-%m-%d}')
+            return
+
+        counts = archive_phases(options['age_days'], options['batch_size'])
+        for name, count in counts.items():
+            self.stdout.write(f'{name}: {count} rows archived')
+        self.stdout.write(self.style.SUCCESS(f'{sum(counts.values())} rows archived'))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from data_monitoring.events import PHASE_PROCESSES, record_production_events
+
+
+class Command(BaseCommand):
+    help = 'Write the ProductionEvent timeline for the existing plans and phase rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        for phase_model, process in PHASE_PROCESSES.items():
+            count = 0
+            batch = []
+            for phase in phase_model.objects.order_by('id').iterator(chunk_size=batch_size):
+                batch.append(phase)
+                if len(batch) == batch_size:
+                    count += self.write(batch)
+                    batch = []
+            if batch:
+                count += self.write(batch)
+            self.stdout.write(f"{process}: {count} events")
+
+        self.stdout.write(self.style.SUCCESS('Production events backfilled'))
+
+    def write(self, batch):
+        with transaction.atomic():
+            return len(record_production_events(batch))
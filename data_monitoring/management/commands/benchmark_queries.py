@@ -0,0 +1,197 @@
+import datetime
+import json
+import random
+import statistics
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from production_management.models import SalesOrder, ProductionPlan
+from data_monitoring.models import DryMix, DryLine, Delamination, Inspection, Printing
+from data_monitoring.events import record_production_events
+from data_monitoring.exports import EXPORTS, export_queryset
+from data_monitoring.waitlists import DRYLINE_LINES, RP_LINES, inspection_waitlist_orders, printing_waitlist_events
+
+PAGE_SIZE = 200
+
+class Rollback(Exception):
+    pass
+
+class Command(BaseCommand):
+    help = (
+        'Seed production history, then record the EXPLAIN plan and timing of the monitoring view queries. '
+        'The seeded rows are rolled back unless --keep is given. '
+        'Compare with a previous --output file through --baseline to see index regressions.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=2000, help='Orders to seed (0 to benchmark the existing data)')
+        parser.add_argument('--rolls', type=int, default=6, help='DryLine rolls per order')
+        parser.add_argument('--days', type=int, default=365, help='Days of history the seeded rows are spread over')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--output', help='Write the plans and timings to this JSON file')
+        parser.add_argument('--baseline', help='JSON file of a previous run to compare with')
+        parser.add_argument('--threshold', type=float, default=1.5, help='Slowdown ratio reported as a regression')
+        parser.add_argument('--keep', action='store_true', help='Commit the seeded rows')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                if options['orders']:
+                    self.seed(options['orders'], options['rolls'], options['days'])
+                results = self.benchmark(options['repeat'])
+                if not options['keep']:
+                    raise Rollback
+        except Rollback:
+            pass
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+        if options['baseline']:
+            self.compare(results, options['baseline'], options['threshold'])
+
+    def seed(self, order_count, rolls, days):
+        """Orders with a Dry plan and a full history (mix, rolls, RP, inspection, printing) spread over `days`."""
+        start = timezone.now() - datetime.timedelta(days=days)
+        seconds = days * 24 * 3600
+        order_id = f"SOVB{random.randint(0, 999999):06d}"
+        today = timezone.localdate()
+
+        # bulk_create sets the ids the plans and events are keyed on (PostgreSQL, SQLite 3.35+)
+        for offset in range(0, order_count, 500):
+            batch = range(offset, min(offset + 500, order_count))
+            orders = SalesOrder.objects.bulk_create([SalesOrder(
+                order_id=order_id, seq_no=i, order_no=f"{order_id}-{i}", customer_name=f"CUSTOMER {i % 40}", order_type='NO',
+                order_date=today, rtd=today, etd=today + datetime.timedelta(days=i % 90), brand='BRAND', item_name=f"ITEM {i % 300}",
+                color_code=f"C{i % 500:04d}", pattern=f"P{i % 50}", spec='1.0', order_qty=1000, qty_unit='M', unit_price=1.0,
+                currency='USD', production_location='VN', product_group='D', product_type='PU'
+            ) for i in batch])
+
+            dates = {order.id: start + datetime.timedelta(seconds=random.randrange(seconds)) for order in orders}
+            plans = ProductionPlan.objects.bulk_create([ProductionPlan(
+                sales_order=order, plan_date=dates[order.id].date(), plan_qty=1000, pd_line=random.choice(DRYLINE_LINES),
+                item_group='Dry' if order.seq_no % 10 else 'Wet', pd_information={'base': 'BASE', 'skin_resin': 'SKIN'},
+                create_date=dates[order.id]
+            ) for order in orders])
+
+            phases = list(plans)
+            for plan in plans:
+                when = plan.create_date
+                line = plan.pd_line
+                phases.append(DryMix(sales_order_id=plan.sales_order_id, production_plan=plan, worker_code='W001', create_date=when,
+                                     mixing_information=[{'item': 'PU-1', 'quantity': 10, 'unit': 'kg'}]))
+                for roll in range(rolls):
+                    when += datetime.timedelta(minutes=20)
+                    phases.append(DryLine(sales_order_id=plan.sales_order_id, production_plan=plan, pd_qty=150, line_no=line, create_date=when,
+                                          pd_lot=f"L{plan.id:07d}{roll}" if roll % 3 else None))
+                    if line in RP_LINES:
+                        phases.append(Delamination(sales_order_id=plan.sales_order_id, production_plan=plan, dlami_qty=140, line_no=random.choice(['bsvrp01', 'bsvrp02']),
+                                                   create_date=when + datetime.timedelta(minutes=5), dlami_lot=f"R{plan.id:07d}{roll}"))
+                when += datetime.timedelta(hours=6)
+                phases.append(Inspection(sales_order_id=plan.sales_order_id, production_plan=plan, ins_qty=800, line_no='bsvin01',
+                                         qty_to_printing=random.choice([0, 0, 200]), create_date=when,
+                                         ins_information=[{'defectCause': 'Shiny', 'quantity': 5}]))
+                if random.random() < 0.5:
+                    phases.append(Printing(sales_order_id=plan.sales_order_id, production_plan=plan, print_qty=200, line_no='bsvpr01',
+                                           create_date=when + datetime.timedelta(hours=2)))
+
+            for model in (DryMix, DryLine, Delamination, Inspection, Printing):
+                rows = [phase for phase in phases if type(phase) is model]
+                model.objects.bulk_create(rows)
+            record_production_events(phases)
+            self.stdout.write(f'Seeded {batch.stop} / {order_count} orders')
+
+        # Fresh planner statistics, otherwise the plans reflect the empty tables
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def queries(self):
+        """The queries behind the monitoring views, by name."""
+        now = timezone.now()
+        dryline = DryLine.objects.order_by('create_date', 'id').first()
+        delamination = Delamination.objects.exclude(dlami_lot=None).first()
+        lot_roll = DryLine.objects.exclude(pd_lot=None).first()
+        search_window = {'start_date': str((now - datetime.timedelta(days=30)).date()), 'end_date': str(now.date())}
+
+        def export_list(name, **data):
+            return export_queryset(EXPORTS[name], data).select_related(EXPORTS[name]['order_path'])[:PAGE_SIZE]
+
+        first_pd_qty = DryLine.objects.filter(production_plan=OuterRef('production_plan')).order_by('create_date', 'id').values('pd_qty')[:1]
+        queries = {
+            'dryplan_list': export_list('dryplan'),
+            'drymix_list': export_list('drymix'),
+            'dryline_list': export_list('dryline'),
+            'dryline_list_by_line': export_list('dryline', line='bsvdl01', **search_window),
+            'delamination_list': export_list('delamination'),
+            'inspection_list': export_list('inspection').annotate(quantity=Coalesce(Subquery(first_pd_qty), 0)),
+            'printing_list': export_list('printing'),
+            'inspection_to_printing': Inspection.objects.filter(qty_to_printing__gt=0, create_date__gte=now - datetime.timedelta(days=30)).order_by('-create_date')[:PAGE_SIZE],
+            'inspection_waitlist': inspection_waitlist_orders().order_by('etd', 'id')[:20],
+            'printing_waitlist': printing_waitlist_events().order_by('-create_date', '-id')[:50],
+        }
+        if dryline:
+            queries['dryline_plan_rolls'] = DryLine.objects.filter(production_plan_id=dryline.production_plan_id).order_by('-create_date')
+            queries['dryline_order_history'] = DryLine.objects.filter(sales_order_id=dryline.sales_order_id).order_by('-create_date')
+            queries['dryline_line_between_scans'] = DryLine.objects.filter(
+                line_no=dryline.line_no, create_date__gte=dryline.create_date, create_date__lte=dryline.create_date + datetime.timedelta(days=1)
+            )
+        if lot_roll:
+            queries['dryline_lot'] = DryLine.objects.filter(pd_lot=lot_roll.pd_lot)
+        if delamination:
+            queries['delamination_lot'] = Delamination.objects.filter(dlami_lot=delamination.dlami_lot)
+        return queries
+
+    def benchmark(self, repeat):
+        results = {}
+        for name, queryset in self.queries().items():
+            plan = queryset.explain()
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                list(queryset.all()) # .all() so each run hits the database
+                timings.append((time.perf_counter() - started) * 1000)
+            results[name] = {
+                'plan': plan,
+                'full_scan': self.has_full_scan(plan),
+                'median_ms': round(statistics.median(timings), 3),
+                'max_ms': round(max(timings), 3),
+            }
+            flag = ' FULL SCAN' if results[name]['full_scan'] else ''
+            self.stdout.write(f"{name:<30} {results[name]['median_ms']:>10.3f} ms{flag}")
+            self.stdout.write('    ' + plan.replace('\n', '\n    '))
+        return results
+
+    def has_full_scan(self, plan):
+        if connection.vendor == 'postgresql':
+            return 'Seq Scan' in plan
+        # SQLite: "SCAN <table>" without "USING ... INDEX"; scans of subqueries and constant rows are fine
+        tables = set(connection.introspection.table_names())
+        for line in plan.splitlines():
+            step = line.split(' ', 3)[-1].split(' ')
+            if step[0] == 'SCAN' and len(step) > 1 and step[1] in tables and 'USING' not in step:
+                return True
+        return False
+
+    def compare(self, results, baseline_path, threshold):
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+
+        regressions = 0
+        for name, result in results.items():
+            previous = baseline.get(name)
+            if previous is None:
+                continue
+            slower = previous['median_ms'] and result['median_ms'] / previous['median_ms'] > threshold
+            new_scan = result['full_scan'] and not previous['full_scan']
+            if slower or new_scan:
+                regressions += 1
+                reason = 'new full scan' if new_scan else f"{previous['median_ms']} -> {result['median_ms']} ms"
+                self.stdout.write(self.style.ERROR(f'REGRESSION {name}: {reason}'))
+
+        if regressions:
+            self.stdout.write(self.style.ERROR(f'{regressions} regressions against {baseline_path}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'No regression against {baseline_path}'))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from production_management.models import SalesOrder
+from data_monitoring.status import rebuild_order_status
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the OrderStatus table from the ProductionEvent timeline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        count = 0
+        batch = []
+        for sales_order_id in SalesOrder.objects.order_by('id').values_list('id', flat=True).iterator(chunk_size=batch_size):
+            batch.append(sales_order_id)
+            if len(batch) == batch_size:
+                count += self.write(batch)
+                batch = []
+        if batch:
+            count += self.write(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'Order status rebuilt for {count} orders'))
+
+    def write(self, batch):
+        with transaction.atomic():
+            return len(rebuild_order_status(batch))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from production_management.models import ProductionPlan
+from data_monitoring.trace import refresh_trace_links
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the lot genealogy links (TraceLink) of every production plan'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        count = 0
+        batch = []
+        for plan_id in ProductionPlan.objects.order_by('id').values_list('id', flat=True).iterator(chunk_size=batch_size):
+            batch.append(plan_id)
+            if len(batch) == batch_size:
+                count += self.write(batch)
+                batch = []
+        if batch:
+            count += self.write(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'{count} trace links rebuilt'))
+
+    def write(self, batch):
+        with transaction.atomic():
+            return len(refresh_trace_links(batch))
@@ -0,0 +1,29 @@
+# Generated by Django 5.1 on 2026-10-18 02:14
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_monitoring', '0007_printing'),
+        ('data_monitoring', '0007_remove_inspection_next_step_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KioskSubmission',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('idempotency_key', models.CharField(max_length=64, unique=True)),
+                ('phase', models.CharField(max_length=20)),
+                ('payload', models.JSONField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('saved_count', models.IntegerField(null=True)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('create_date', models.DateTimeField(default=django.utils.timezone.now)),
+                ('processed_date', models.DateTimeField(null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1 on 2026-10-18 10:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_monitoring', '0008_kiosksubmission'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='kiosksubmission',
+            name='kiosk_id',
+            field=models.CharField(max_length=30, null=True),
+        ),
+        migrations.AddField(
+            model_name='kiosksubmission',
+            name='seq_no',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='kiosksubmission',
+            constraint=models.UniqueConstraint(fields=('kiosk_id', 'seq_no'), name='unique_kiosk_event'),
+        ),
+    ]
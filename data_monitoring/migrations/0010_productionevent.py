@@ -0,0 +1,32 @@
+# Generated by Django 5.1 on 2026-10-18 10:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_monitoring', '0009_kiosksubmission_kiosk_id_seq_no'),
+        ('production_management', '0007_alter_developmentcomment_development'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductionEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('process', models.CharField(choices=[('DryPlan', 'DryPlan'), ('DryMix', 'DryMix'), ('DryLine', 'DryLine'), ('RP', 'RP'), ('Inspection', 'Inspection'), ('Printing', 'Printing')], max_length=20)),
+                ('source_id', models.BigIntegerField()),
+                ('machine', models.CharField(max_length=10, null=True)),
+                ('qty', models.IntegerField(null=True)),
+                ('payload', models.JSONField(null=True)),
+                ('create_date', models.DateTimeField()),
+                ('sales_order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='production_management.salesorder')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['sales_order', 'create_date'], name='event_order_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('process', 'source_id'), name='unique_event_source')],
+            },
+        ),
+    ]
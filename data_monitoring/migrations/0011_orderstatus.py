@@ -0,0 +1,32 @@
+# Generated by Django 5.1 on 2026-10-18 10:06
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_monitoring', '0010_productionevent'),
+        ('production_management', '0007_alter_developmentcomment_development'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderStatus',
+            fields=[
+                ('sales_order', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='production_status', serialize=False, to='production_management.salesorder')),
+                ('bal_qty', models.IntegerField()),
+                ('line_shortage', models.IntegerField()),
+                ('latest_process', models.CharField(max_length=20, null=True)),
+                ('latest_create_date', models.DateTimeField(null=True)),
+                ('latest_machine', models.CharField(max_length=10, null=True)),
+                ('qty_to_printing', models.IntegerField(null=True)),
+                ('modify_date', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['latest_process', 'latest_create_date'], name='status_process_date_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1 on 2026-10-18 10:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_monitoring', '0011_orderstatus'),
+        ('production_management', '0008_salesorder_salesorder_etd_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='productionevent',
+            index=models.Index(fields=['sales_order', 'process', 'machine'], name='event_order_process_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1 on 2026-10-18 10:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_monitoring', '0012_productionevent_event_order_process_idx'),
+        ('production_management', '0008_salesorder_salesorder_etd_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='productionevent',
+            index=models.Index(fields=['process', 'sales_order', 'create_date'], name='event_process_order_date_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1 on 2026-10-18 10:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_monitoring', '0013_productionevent_event_process_order_date_idx'),
+        ('production_management', '0009_salesorder_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dryline',
+            index=models.Index(fields=['production_plan', 'create_date'], name='dryline_plan_date_idx'),
+        ),
+    ]
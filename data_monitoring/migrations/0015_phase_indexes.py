@@ -0,0 +1,78 @@
+# Generated by Django 5.1 on 2026-10-18 10:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_monitoring', '0014_dryline_dryline_plan_date_idx'),
+        ('production_management', '0010_productionplan_plan_group_date_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='delamination',
+            index=models.Index(fields=['create_date'], name='delamination_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='delamination',
+            index=models.Index(fields=['production_plan', 'create_date'], name='delamination_plan_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='delamination',
+            index=models.Index(fields=['line_no', 'create_date'], name='delamination_line_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='delamination',
+            index=models.Index(condition=models.Q(('dlami_lot__isnull', False)), fields=['dlami_lot'], name='delamination_lot_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dryline',
+            index=models.Index(fields=['create_date'], name='dryline_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dryline',
+            index=models.Index(fields=['line_no', 'create_date'], name='dryline_line_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dryline',
+            index=models.Index(condition=models.Q(('pd_lot__isnull', False)), fields=['pd_lot'], name='dryline_lot_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='drymix',
+            index=models.Index(fields=['create_date'], name='drymix_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='drymix',
+            index=models.Index(fields=['production_plan', 'create_date'], name='drymix_plan_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inspection',
+            index=models.Index(fields=['create_date'], name='inspection_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inspection',
+            index=models.Index(fields=['production_plan', 'create_date'], name='inspection_plan_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inspection',
+            index=models.Index(fields=['line_no', 'create_date'], name='inspection_line_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inspection',
+            index=models.Index(condition=models.Q(('qty_to_printing__gt', 0)), fields=['create_date'], name='inspection_to_printing_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='printing',
+            index=models.Index(fields=['create_date'], name='printing_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='printing',
+            index=models.Index(fields=['production_plan', 'create_date'], name='printing_plan_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='printing',
+            index=models.Index(fields=['line_no', 'create_date'], name='printing_line_date_idx'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.1 on 2026-10-18 10:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_monitoring', '0015_phase_indexes'),
+        ('production_management', '0010_productionplan_plan_group_date_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='delamination',
+            name='sales_order',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='production_management.salesorder'),
+        ),
+        migrations.AddField(
+            model_name='dryline',
+            name='sales_order',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='production_management.salesorder'),
+        ),
+        migrations.AddField(
+            model_name='drymix',
+            name='sales_order',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='production_management.salesorder'),
+        ),
+        migrations.AlterField(
+            model_name='inspection',
+            name='sales_order',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='production_management.salesorder'),
+        ),
+        migrations.AlterField(
+            model_name='printing',
+            name='sales_order',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='production_management.salesorder'),
+        ),
+        migrations.AddIndex(
+            model_name='delamination',
+            index=models.Index(fields=['sales_order', 'create_date'], name='delamination_order_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dryline',
+            index=models.Index(fields=['sales_order', 'create_date'], name='dryline_order_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='drymix',
+            index=models.Index(fields=['sales_order', 'create_date'], name='drymix_order_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inspection',
+            index=models.Index(fields=['sales_order', 'create_date'], name='inspection_order_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='printing',
+            index=models.Index(fields=['sales_order', 'create_date'], name='printing_order_date_idx'),
+        ),
+    ]
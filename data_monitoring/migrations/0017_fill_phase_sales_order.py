@@ -0,0 +1,24 @@
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+PHASE_MODELS = ['DryMix', 'DryLine', 'Delamination', 'Inspection', 'Printing']
+
+
+def fill_sales_order(apps, schema_editor):
+    # One UPDATE per table: sales_order of the row's plan
+    ProductionPlan = apps.get_model('production_management', 'ProductionPlan')
+    plan_order = ProductionPlan.objects.filter(id=OuterRef('production_plan_id')).values('sales_order_id')[:1]
+    for model_name in PHASE_MODELS:
+        model = apps.get_model('data_monitoring', model_name)
+        model.objects.filter(sales_order__isnull=True, production_plan__isnull=False).update(sales_order_id=Subquery(plan_order))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_monitoring', '0016_phase_sales_order'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_sales_order, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1 on 2026-10-18 10:22
+
+import django.core.serializers.json
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_monitoring', '0017_fill_phase_sales_order'),
+        ('production_management', '0010_productionplan_plan_group_date_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedPhase',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('process', models.CharField(choices=[('DryPlan', 'DryPlan'), ('DryMix', 'DryMix'), ('DryLine', 'DryLine'), ('RP', 'RP'), ('Inspection', 'Inspection'), ('Printing', 'Printing')], max_length=20)),
+                ('source_id', models.BigIntegerField()),
+                ('machine', models.CharField(max_length=10, null=True)),
+                ('qty', models.IntegerField(null=True)),
+                ('payload', models.JSONField(null=True)),
+                ('data', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('create_date', models.DateTimeField()),
+                ('archive_date', models.DateTimeField(default=django.utils.timezone.now)),
+                ('sales_order', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='production_management.salesorder')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['sales_order', 'create_date'], name='archive_order_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('process', 'source_id'), name='unique_archived_phase')],
+            },
+        ),
+    ]
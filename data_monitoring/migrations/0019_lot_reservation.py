@@ -0,0 +1,37 @@
+# Generated by Django 5.1 on 2026-10-18 10:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_monitoring', '0018_archivedphase'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LotSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefix', models.CharField(max_length=10, unique=True)),
+                ('last_no', models.IntegerField(default=0)),
+                ('modify_date', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='productionlot',
+            name='expire_date',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name='productionlot',
+            name='reservation_key',
+            field=models.CharField(max_length=32, null=True),
+        ),
+        migrations.AddField(
+            model_name='productionlot',
+            name='status',
+            field=models.CharField(choices=[('reserved', 'reserved'), ('registered', 'registered'), ('released', 'released')], default='registered', max_length=10),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1 on 2026-10-18 10:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_monitoring', '0019_lot_reservation'),
+        ('production_management', '0010_productionplan_plan_group_date_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TraceLink',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('parent_kind', models.CharField(max_length=20)),
+                ('parent_key', models.CharField(max_length=64)),
+                ('child_kind', models.CharField(max_length=20)),
+                ('child_key', models.CharField(max_length=64)),
+                ('production_plan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='production_management.productionplan')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['parent_kind', 'parent_key'], name='trace_parent_idx'), models.Index(fields=['child_kind', 'child_key'], name='trace_child_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.1 on 2026-10-18 10:30
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_monitoring', '0020_tracelink'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AgingPosition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=50, unique=True)),
+                ('roll_count', models.IntegerField(default=0)),
+                ('pd_qty', models.IntegerField(default=0)),
+                ('first_entry_date', models.DateTimeField(null=True)),
+                ('last_entry_date', models.DateTimeField(null=True)),
+                ('modify_date', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['roll_count', 'first_entry_date'], name='aging_occupancy_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='AgingMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entry_date', models.DateTimeField()),
+                ('exit_date', models.DateTimeField(null=True)),
+                ('dryline', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='aging_movements', to='data_monitoring.dryline')),
+                ('position', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='data_monitoring.agingposition')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['dryline', 'entry_date'], name='aging_roll_idx'), models.Index(condition=models.Q(('exit_date__isnull', True)), fields=['position', 'entry_date'], name='aging_open_position_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('exit_date__isnull', True)), fields=('dryline',), name='unique_open_aging_movement')],
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+from django.db import migrations
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import Coalesce
+
+
+def position_code(aging_position):
+    # Same as data_monitoring.aging.position_code: codes are stored without spaces, upper case
+    return aging_position.replace(" ", "").upper()
+
+
+def fill_aging_occupancy(apps, schema_editor):
+    # Rolls stamped with an aging position are taken as still in it since their last modification
+    DryLine = apps.get_model('data_monitoring', 'DryLine')
+    AgingPosition = apps.get_model('data_monitoring', 'AgingPosition')
+    AgingMovement = apps.get_model('data_monitoring', 'AgingMovement')
+
+    rolls = DryLine.objects.filter(ag_position__isnull=False).exclude(ag_position='')
+    codes = {position_code(code) for code in rolls.values_list('ag_position', flat=True).distinct()} - {''}
+    AgingPosition.objects.bulk_create([AgingPosition(code=code) for code in codes], ignore_conflicts=True)
+    positions = dict(AgingPosition.objects.values_list('code', 'id'))
+
+    movements = []
+    for roll_id, code, entry_date in rolls.annotate(entry_date=Coalesce('modify_date', 'create_date')).values_list('id', 'ag_position', 'entry_date').iterator(chunk_size=2000):
+        code = position_code(code)
+        if not code:
+            continue
+        movements.append(AgingMovement(position_id=positions[code], dryline_id=roll_id, entry_date=entry_date))
+        if len(movements) == 2000:
+            AgingMovement.objects.bulk_create(movements)
+            movements = []
+    AgingMovement.objects.bulk_create(movements)
+
+    for row in AgingMovement.objects.values('position_id').annotate(
+        roll_count=Count('id'), pd_qty=Sum('dryline__pd_qty'), first_entry_date=Min('entry_date'), last_entry_date=Max('entry_date')
+    ):
+        AgingPosition.objects.filter(id=row.pop('position_id')).update(**row)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_monitoring', '0021_aging_occupancy'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_aging_occupancy, migrations.RunPython.noop),
+    ]
@@ -1,16 +1,24 @@
 from django.db import models
 from django.utils import timezone
-from production_management.models import SalesOrder, ProductionPlan
+from django.core.serializers.json import DjangoJSONEncoder
+from production_management.models import SalesOrder, ProductionPlan, AtomicSaveModel
 from itertools import chain
-from datetime import datetime, timedelta
 
-class DryMix(models.Model):
+class DryMix(AtomicSaveModel):
     production_plan = models.ForeignKey(ProductionPlan, on_delete=models.CASCADE)
+    sales_order = models.ForeignKey(SalesOrder, null=True, on_delete=models.CASCADE, db_index=False) # Order of production_plan, indexed with create_date below
     mixing_information = models.JSONField(null=True)
     worker_code = models.CharField(max_length=10)
     create_date = models.DateTimeField(default=timezone.now)
     modify_date = models.DateTimeField(null=True, auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['sales_order', 'create_date'], name='drymix_order_date_idx'), # Order history
+            models.Index(fields=['create_date'], name='drymix_date_idx'), # Monitoring list window
+            models.Index(fields=['production_plan', 'create_date'], name='drymix_plan_date_idx'),
+        ]
+
     def __str__(self):
         return f"{self.production_plan.sales_order.order_no}-{self.production_plan.plan_date}"
 
@@ -24,8 +32,9 @@ class WetMix(models.Model):
     def __str__(self):
         return f"{self.production_plan.sales_order.order_no}-{self.production_plan.plan_date}"
     
-class DryLine(models.Model):
+class DryLine(AtomicSaveModel):
     production_plan = models.ForeignKey(ProductionPlan, on_delete=models.CASCADE)
+    sales_order = models.ForeignKey(SalesOrder, null=True, on_delete=models.CASCADE, db_index=False) # Order of production_plan, indexed with create_date below
     pd_qty = models.IntegerField()
     pd_information = models.JSONField(null=True)
     line_no = models.CharField(max_length=10)
@@ -34,6 +43,15 @@ class DryLine(models.Model):
     create_date = models.DateTimeField(default=timezone.now)
     modify_date = models.DateTimeField(null=True, auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['sales_order', 'create_date'], name='dryline_order_date_idx'), # Order history
+            models.Index(fields=['production_plan', 'create_date'], name='dryline_plan_date_idx'), # First roll of a plan
+            models.Index(fields=['create_date'], name='dryline_date_idx'), # Monitoring list window
+            models.Index(fields=['line_no', 'create_date'], name='dryline_line_date_idx'), # Rolls of a line between two scans
+            models.Index(fields=['pd_lot'], name='dryline_lot_idx', condition=models.Q(pd_lot__isnull=False)),
+        ]
+
     def __str__(self):
         return f"{self.production_plan.sales_order.order_no}-{self.production_plan.plan_date}"
 
@@ -49,8 +67,9 @@ class WetLine(models.Model):
     def __str__(self):
         return f"{self.production_plan.sales_order.order_no}-{self.production_plan.plan_date}"
     
-class Delamination(models.Model):
+class Delamination(AtomicSaveModel):
     production_plan = models.ForeignKey(ProductionPlan, on_delete=models.CASCADE)
+    sales_order = models.ForeignKey(SalesOrder, null=True, on_delete=models.CASCADE, db_index=False) # Order of production_plan, indexed with create_date below
     dlami_qty = models.IntegerField()
     dlami_information = models.JSONField(null=True)
     line_no = models.CharField(max_length=10)
@@ -58,11 +77,20 @@ class Delamination(models.Model):
     create_date = models.DateTimeField(default=timezone.now)
     modify_date = models.DateTimeField(null=True, auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['sales_order', 'create_date'], name='delamination_order_date_idx'), # Order history
+            models.Index(fields=['create_date'], name='delamination_date_idx'),
+            models.Index(fields=['production_plan', 'create_date'], name='delamination_plan_date_idx'),
+            models.Index(fields=['line_no', 'create_date'], name='delamination_line_date_idx'),
+            models.Index(fields=['dlami_lot'], name='delamination_lot_idx', condition=models.Q(dlami_lot__isnull=False)),
+        ]
+
     def __str__(self):
         return f"{self.production_plan.sales_order.order_no}-{self.production_plan.plan_date}"
 
-class Inspection(models.Model):
-    sales_order = models.ForeignKey(SalesOrder, null=True, on_delete=models.CASCADE)
+class Inspection(AtomicSaveModel):
+    sales_order = models.ForeignKey(SalesOrder, null=True, on_delete=models.CASCADE, db_index=False) # Order of production_plan, indexed with create_date below
     production_plan = models.ForeignKey(ProductionPlan, null=True, on_delete=models.CASCADE)
     ins_qty = models.IntegerField()
     ins_information = models.JSONField(null=True)
@@ -72,11 +100,20 @@ class Inspection(models.Model):
     create_date = models.DateTimeField(default=timezone.now)
     modify_date = models.DateTimeField(null=True, auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['sales_order', 'create_date'], name='inspection_order_date_idx'), # Order history
+            models.Index(fields=['create_date'], name='inspection_date_idx'),
+            models.Index(fields=['production_plan', 'create_date'], name='inspection_plan_date_idx'),
+            models.Index(fields=['line_no', 'create_date'], name='inspection_line_date_idx'),
+            models.Index(fields=['create_date'], name='inspection_to_printing_idx', condition=models.Q(qty_to_printing__gt=0)), # Rolls sent to printing
+        ]
+
     def __str__(self):
         return f"{self.production_plan.sales_order.order_no}-{self.production_plan.plan_date}"
 
-class Printing(models.Model):
-    sales_order = models.ForeignKey(SalesOrder, null=True, on_delete=models.CASCADE)
+class Printing(AtomicSaveModel):
+    sales_order = models.ForeignKey(SalesOrder, null=True, on_delete=models.CASCADE, db_index=False) # Order of production_plan, indexed with create_date below
     production_plan = models.ForeignKey(ProductionPlan, null=True, on_delete=models.CASCADE)
     print_qty = models.IntegerField()
     print_information = models.JSONField(null=True)
@@ -84,32 +121,194 @@ class Printing(models.Model):
     create_date = models.DateTimeField(default=timezone.now)
     modify_date = models.DateTimeField(null=True, auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['sales_order', 'create_date'], name='printing_order_date_idx'), # Order history
+            models.Index(fields=['create_date'], name='printing_date_idx'),
+            models.Index(fields=['production_plan', 'create_date'], name='printing_plan_date_idx'),
+            models.Index(fields=['line_no', 'create_date'], name='printing_line_date_idx'),
+        ]
+
     def __str__(self):
         return f"{self.production_plan.sales_order.order_no}-{self.production_plan.plan_date}"
 
 class ProductionLot(models.Model):
+    # Lot numbers are handed out by data_monitoring/lots.py: reserved when the rolls are searched,
+    # registered with them, released (and reused) when the reservation is dropped or expires.
+    STATUS_CHOICES = [
+        ('reserved', 'reserved'),
+        ('registered', 'registered'),
+        ('released', 'released'),
+    ]
+
     lot_no = models.CharField(max_length=20, unique=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='registered')
+    reservation_key = models.CharField(max_length=32, null=True) # Proves the reservation when registering
+    expire_date = models.DateTimeField(null=True) # End of the reservation
     create_date = models.DateTimeField(default=timezone.now)
 
-    @classmethod
-    def generate_lot(cls):
-        today = datetime.now().strftime('%m%d')
-        
-        # Find missing numbers in lot_no from ProductionLot model
-        existing_lots = ProductionLot.objects.filter(lot_no__startswith=today)
-        
-        existing_counts = sorted(
-            int(lot.lot_no.split('-')[-1][:-1]) if lot.lot_no.split('-')[-1][-1] in 'AB'
-            else int(lot.lot_no.split('-')[-1])
-            for lot in existing_lots
-            if '-' in lot.lot_no
-        )
-        
-        count = 1
-        for existing_count in existing_counts:
-            if existing_count != count:
-                break
-            count += 1
-        
-        new_lot_no = f"{today}-{count}"
-        return new_lot_no
\ No newline at end of file
+    def __str__(self):
+        return self.lot_no
+
+class LotSequence(models.Model):
+    # Last lot number handed out for a lot prefix (MMDD)
+    prefix = models.CharField(max_length=10, unique=True)
+    last_no = models.IntegerField(default=0)
+    modify_date = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.prefix}-{self.last_no}"
+
+class KioskSubmission(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    idempotency_key = models.CharField(max_length=64, unique=True) # Generated by the kiosk, identical on every retry
+    kiosk_id = models.CharField(max_length=30, null=True) # Set for events uploaded by the offline sync
+    seq_no = models.IntegerField(null=True) # Sequence number of the event on its kiosk
+    phase = models.CharField(max_length=20)
+    payload = models.JSONField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    saved_count = models.IntegerField(null=True)
+    error = models.TextField(null=True, blank=True)
+    create_date = models.DateTimeField(default=timezone.now)
+    processed_date = models.DateTimeField(null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kiosk_id', 'seq_no'], name='unique_kiosk_event'),
+        ]
+
+    def __str__(self):
+        return f"{self.phase}-{self.idempotency_key}"
+
+class ProductionEvent(models.Model):
+    PROCESS_CHOICES = [
+        ('DryPlan', 'DryPlan'),
+        ('DryMix', 'DryMix'),
+        ('DryLine', 'DryLine'),
+        ('RP', 'RP'),
+        ('Inspection', 'Inspection'),
+        ('Printing', 'Printing'),
+    ]
+
+    sales_order = models.ForeignKey(SalesOrder, on_delete=models.CASCADE)
+    process = models.CharField(max_length=20, choices=PROCESS_CHOICES)
+    source_id = models.BigIntegerField() # id of the ProductionPlan / phase row the event was written for
+    machine = models.CharField(max_length=10, null=True)
+    qty = models.IntegerField(null=True) # plan_qty, pd_qty, dlami_qty, ins_qty or print_qty
+    payload = models.JSONField(null=True) # Process specific details (chemicals, defects, ...)
+    create_date = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['sales_order', 'create_date'], name='event_order_date_idx'),
+            models.Index(fields=['sales_order', 'process', 'machine'], name='event_order_process_idx'), # Waitlist EXISTS checks
+            models.Index(fields=['process', 'sales_order', 'create_date'], name='event_process_order_date_idx'), # Latest event of a process per order
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['process', 'source_id'], name='unique_event_source'),
+        ]
+
+    def __str__(self):
+        return f"{self.sales_order_id}-{self.process}-{self.create_date}"
+
+class OrderStatus(models.Model):
+    # Persisted summary of the ProductionEvent timeline of an order, see data_monitoring/status.py
+    sales_order = models.OneToOneField(SalesOrder, on_delete=models.CASCADE, primary_key=True, related_name='production_status')
+    bal_qty = models.IntegerField() # order_qty minus the inspected A grade quantity
+    line_shortage = models.IntegerField() # Produced since the last inspection minus bal_qty
+    latest_process = models.CharField(max_length=20, null=True)
+    latest_create_date = models.DateTimeField(null=True)
+    latest_machine = models.CharField(max_length=10, null=True)
+    qty_to_printing = models.IntegerField(null=True) # Waiting for printing since the last inspection
+    modify_date = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['latest_process', 'latest_create_date'], name='status_process_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.sales_order_id}-{self.latest_process}"
+
+class ArchivedPhase(models.Model):
+    # Phase row of a shipped order moved out of the hot tables, see data_monitoring/archive.py.
+    # The event columns keep the row in the order timeline; `data` is the whole row.
+    sales_order = models.ForeignKey(SalesOrder, on_delete=models.CASCADE, db_index=False)
+    process = models.CharField(max_length=20, choices=ProductionEvent.PROCESS_CHOICES)
+    source_id = models.BigIntegerField() # id of the archived phase row
+    machine = models.CharField(max_length=10, null=True)
+    qty = models.IntegerField(null=True)
+    payload = models.JSONField(null=True)
+    data = models.JSONField(encoder=DjangoJSONEncoder)
+    create_date = models.DateTimeField()
+    archive_date = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['sales_order', 'create_date'], name='archive_order_date_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['process', 'source_id'], name='unique_archived_phase'),
+        ]
+
+    def __str__(self):
+        return f"{self.sales_order_id}-{self.process}-{self.source_id}"
+
+class TraceLink(models.Model):
+    # Edge of the lot genealogy graph (mix batch -> plan -> rolls -> lots -> inspections), see data_monitoring/trace.py.
+    # Nodes are (kind, key); each write replaces the edges of the rows it wrote.
+    production_plan = models.ForeignKey(ProductionPlan, on_delete=models.CASCADE)
+    parent_kind = models.CharField(max_length=20)
+    parent_key = models.CharField(max_length=64)
+    child_kind = models.CharField(max_length=20)
+    child_key = models.CharField(max_length=64)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['parent_kind', 'parent_key'], name='trace_parent_idx'), # Forward traces
+            models.Index(fields=['child_kind', 'child_key'], name='trace_child_idx'), # Backward traces
+        ]
+
+    def __str__(self):
+        return f"{self.parent_kind}:{self.parent_key}->{self.child_kind}:{self.child_key}"
+
+class AgingPosition(models.Model):
+    # Aging room rack and its occupancy, kept up to date by data_monitoring/aging.py on every entry / exit
+    code = models.CharField(max_length=50, unique=True) # As typed on the aging room page, without spaces, upper case
+    roll_count = models.IntegerField(default=0) # DryLine rolls in the position
+    pd_qty = models.IntegerField(default=0) # Their P/D quantity
+    first_entry_date = models.DateTimeField(null=True) # Entry of the roll in the position for the longest time
+    last_entry_date = models.DateTimeField(null=True)
+    modify_date = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['roll_count', 'first_entry_date'], name='aging_occupancy_idx'),
+        ]
+
+    def __str__(self):
+        return self.code
+
+class AgingMovement(models.Model):
+    # Stay of a DryLine roll in an aging position; exit_date is null while the roll is in it
+    position = models.ForeignKey(AgingPosition, on_delete=models.CASCADE, related_name='movements', db_index=False)
+    dryline = models.ForeignKey(DryLine, on_delete=models.CASCADE, related_name='aging_movements', db_index=False)
+    entry_date = models.DateTimeField()
+    exit_date = models.DateTimeField(null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['dryline', 'entry_date'], name='aging_roll_idx'),
+            models.Index(fields=['position', 'entry_date'], name='aging_open_position_idx', condition=models.Q(exit_date__isnull=True)),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['dryline'], condition=models.Q(exit_date__isnull=True), name='unique_open_aging_movement'),
+        ]
+
+    def __str__(self):
+        return f"{self.position_id}-{self.dryline_id}-{self.entry_date}"
@@ -0,0 +1,50 @@
+from django.db import transaction
+from django.utils import timezone
+from .models import DryLine
+from .lots import register_lot
+from .trace import link_rows
+from .aging import enter_position, exit_positions
+
+# Roll ranges of the aging room and lot registration pages: the rolls a line produced between the latest roll
+# of a first (inside) order and the latest roll of a last (outside) order. The range is selected in SQL on
+# (line_no, create_date) and registered with one UPDATE / bulk_update of the registered column only.
+# Aging room entries and exits are recorded by data_monitoring/aging.py.
+
+def latest_roll(model, order_no):
+    """Newest DryLine / Delamination roll of an order, or None."""
+    return model.objects.filter(sales_order__order_no=order_no).order_by('-create_date', '-id').first()
+
+def rolls_between(model, inside_roll, outside_roll):
+    """Rolls of the inside roll's line produced from the inside roll up to the outside roll, oldest first."""
+    return model.objects.filter(
+        line_no=inside_roll.line_no,
+        create_date__gte=inside_roll.create_date,
+        create_date__lte=outside_roll.create_date
+    ).order_by('create_date', 'id')
+
+def register_aging_position(inside_roll, outside_roll, aging_position):
+    """Put the DryLine rolls of the range in an aging room position. Returns the number of rolls."""
+    return enter_position(rolls_between(DryLine, inside_roll, outside_roll), aging_position)
+
+def release_aging_position(inside_roll, outside_roll):
+    """Take the DryLine rolls of the range out of the aging room. Returns the number of rolls."""
+    return exit_positions(rolls_between(DryLine, inside_roll, outside_roll))
+
+def register_roll_lots(model, inside_roll, outside_roll, lot_no, reservation_key, selections):
+    """
+    Give the rolls of the range the reserved lot number followed by their selection (A / B) and register the lot.
+    Raises LotReservationError when the reservation was lost; nothing is written then.
+    `selections` maps roll id -> selection; rolls added since the page was shown have none and are left as they are.
+    """
+    lot_field = 'pd_lot' if model is DryLine else 'dlami_lot'
+    now = timezone.now()
+
+    with transaction.atomic():
+        register_lot(lot_no, reservation_key)
+        rolls = list(rolls_between(model, inside_roll, outside_roll).filter(id__in=selections).only('id', 'production_plan_id'))
+        for roll in rolls:
+            setattr(roll, lot_field, lot_no + selections[roll.id])
+            roll.modify_date = now
+        model.objects.bulk_update(rolls, [lot_field, 'modify_date'])
+        link_rows(rolls)
+    return rolls
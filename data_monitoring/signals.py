@@ -0,0 +1,70 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from workforce_management.models import Worker
+from inventory_management.models import RawMaterial, Category
+from production_management.models import SalesOrder, ProductionPlan
+from .models import DryMix, DryLine, Delamination, Inspection, Printing, AgingMovement
+from .kiosk import invalidate_reference_data
+from .events import PHASE_PROCESSES, record_production_events, delete_production_events
+from .status import create_order_statuses, change_order_qtys
+from .aging import refresh_positions
+
+# Kiosk reference data (workers, categories -> materials) is rebuilt on the next request after any change
+@receiver([post_save, post_delete], sender=Worker)
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=RawMaterial)
+def reference_data_changed(sender, **kwargs):
+    invalidate_reference_data()
+
+# Rows saved one by one (admin, plan import, lot registration, ...) keep their ProductionEvent in sync,
+# in the transaction of the save (AtomicSaveModel) or of the delete.
+# The batched kiosk writes record their events themselves.
+def phase_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        record_production_events([instance])
+
+def phase_deleted(sender, instance, **kwargs):
+    delete_production_events(instance)
+
+for phase_model in PHASE_PROCESSES:
+    post_save.connect(phase_saved, sender=phase_model, dispatch_uid=f'production_event_save_{phase_model.__name__}')
+    post_delete.connect(phase_deleted, sender=phase_model, dispatch_uid=f'production_event_delete_{phase_model.__name__}')
+
+# Phase rows carry the order of their plan. The batched kiosk writes set it themselves.
+PHASE_MODELS = [DryMix, DryLine, Delamination, Inspection, Printing]
+
+def phase_order(sender, instance, raw=False, **kwargs):
+    if not raw and instance.production_plan_id:
+        instance.sales_order_id = instance.production_plan.sales_order_id
+
+for phase_model in PHASE_MODELS:
+    pre_save.connect(phase_order, sender=phase_model, dispatch_uid=f'phase_order_{phase_model.__name__}')
+
+@receiver(post_save, sender=ProductionPlan)
+def plan_order_changed(sender, instance, created=False, raw=False, **kwargs):
+    # A plan moved to another order takes its phase rows along
+    if not (created or raw):
+        for phase_model in PHASE_MODELS:
+            phase_model.objects.filter(production_plan=instance).exclude(sales_order_id=instance.sales_order_id).update(sales_order_id=instance.sales_order_id)
+
+# bal_qty depends on the ordered quantity: a new order starts with a blank status, a changed quantity shifts it
+@receiver(pre_save, sender=SalesOrder)
+def sales_order_saving(sender, instance, raw=False, **kwargs):
+    if not raw and instance.pk is not None:
+        instance._stored_order_qty = SalesOrder.objects.filter(pk=instance.pk).values_list('order_qty', flat=True).first()
+
+@receiver(post_save, sender=SalesOrder)
+def sales_order_saved(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    stored_order_qty = getattr(instance, '_stored_order_qty', None)
+    if created or stored_order_qty is None:
+        create_order_statuses([instance])
+    elif instance.order_qty != stored_order_qty:
+        change_order_qtys({instance.id: instance.order_qty - stored_order_qty})
+
+# A deleted roll leaves its aging position
+@receiver(post_delete, sender=AgingMovement)
+def aging_movement_deleted(sender, instance, **kwargs):
+    if instance.exit_date is None:
+        refresh_positions([instance.position_id])
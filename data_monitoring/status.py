@@ -0,0 +1,391 @@
+from collections import defaultdict
+import pytz
+from django.db.models import F, Q, Max, Sum, Value, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+from production_management.models import SalesOrder
+from .models import ProductionEvent, OrderStatus, ArchivedPhase
+
+# The production status of an order (balance, line shortage, latest process, quantity waiting for printing)
+# is derived from its ProductionEvent timeline. OrderStatus keeps the summary part of it persisted per order
+# and is updated by difference in the same transaction that writes the events, without reading the timeline;
+# the order search and the waitlists read it with one query per page. rebuild_order_status recomputes it from
+# the whole timeline (management command rebuild_order_status).
+
+LOCAL_TIMEZONE = pytz.timezone('Asia/Ho_Chi_Minh')
+
+# Hot and archived events of the order timelines
+TIMELINE_MODELS = [ProductionEvent, ArchivedPhase]
+
+STATUS_FIELDS = ['bal_qty', 'line_shortage', 'latest_process', 'latest_create_date', 'latest_machine', 'qty_to_printing', 'modify_date']
+
+def timeline_status(order_qty, events):
+    """
+    Build the status of one order from its events ordered by create_date.
+    Returns the status dict rendered by the pages and the event of the latest process.
+    """
+    process = []
+    bal_qty = int(order_qty)
+    sub_pd_qty = 0
+    defect, chemical = {}, {}
+
+    for event in events:
+        create_date = event.create_date.astimezone(LOCAL_TIMEZONE).strftime('%Y-%m-%d %H:%M:%S')
+
+        if event.process == 'DryPlan':
+            phase_info = dict(event.payload)
+            phase_info.update({
+                'process': 'DryPlan',
+                'create_date': create_date,
+                'machine': event.machine,
+                'plan_qty': event.qty,
+                'plan_date': event.payload['plan_date'],
+            })
+            process.append(phase_info)
+
+        elif event.process == 'DryMix':
+            for info in event.payload['mixing_information']: # Check the information of phase_information in json format
+                if info.get('item', ''):
+                    chemical[info.get('item')] = str(info.get('quantity')) + info.get('unit')
+            process.append({
+                'process': 'DryMix',
+                'chemical': chemical,
+                'machine': '',
+                'create_date': create_date
+            })
+
+        elif event.process == 'DryLine':
+            sub_pd_qty = sub_pd_qty + event.qty
+            process.append({
+                'process': 'DryLine',
+                'pd_qty': event.qty,
+                'machine': event.machine,
+                'create_date': create_date
+            })
+
+        elif event.process == 'RP':
+            process.append({
+                'process': 'RP',
+                'delami_qty': event.qty,
+                'create_date': create_date,
+                'machine': event.machine
+            })
+
+        elif event.process == 'Inspection':
+            # The rolls produced before an inspection are covered by it
+            sub_pd_qty = 0
+            for info in event.payload['defect']:
+                defect[info.get('defectCause')] = info.get('quantity')
+            bal_qty = bal_qty - event.qty
+            process.append({
+                'process': 'Inspection',
+                'agrade_qty': event.qty,
+                'defect': defect,
+                'machine': event.machine,
+                'create_date': create_date,
+                'qty_to_printing': event.payload['qty_to_printing']
+            })
+
+        elif event.process == 'Printing':
+            process.append({
+                'process': 'Printing',
+                'print_qty': event.qty,
+                'machine': event.machine,
+                'create_date': create_date
+            })
+
+    status = {
+        'bal_qty': bal_qty,
+        'line_shortage': sub_pd_qty - bal_qty,
+        'process': process,
+        'latest_process': None,
+        'latest_create_date': None,
+        'latest_machine': None,
+        'qty_to_printing': None
+    }
+    if not process:
+        return status, None
+
+    # The latest process is the first one recorded in the last second of the timeline
+    latest_index = next(i for i, proc in enumerate(process) if proc['create_date'] == process[-1]['create_date'])
+    latest = process[latest_index]
+    status.update({
+        'latest_process': latest['process'],
+        'latest_create_date': latest['create_date'],
+        'latest_machine': latest['machine'],
+    })
+
+    # Quantity sent to printing by the last inspection, unless a printing was recorded after it
+    latest_inspection = next((proc for proc in reversed(process) if proc['process'] == 'Inspection'), None)
+    latest_printing = next((proc for proc in reversed(process) if proc['process'] == 'Printing'), None)
+    if latest_inspection:
+        if not latest_printing or latest_inspection['create_date'] > latest_printing['create_date']:
+            status['qty_to_printing'] = latest_inspection['qty_to_printing']
+
+    return status, events[latest_index]
+
+def order_timelines(sales_order_ids, include_archive=False):
+    """
+    Load the events of a batch of orders with one query, grouped by sales_order_id.
+    `include_archive` adds the events of their archived phase rows (one more query).
+    """
+    events_by_order = defaultdict(list)
+    for event in ProductionEvent.objects.filter(sales_order_id__in=sales_order_ids).order_by('create_date', 'id'):
+        events_by_order[event.sales_order_id].append(event)
+
+    if include_archive:
+        archived = defaultdict(list)
+        for phase in ArchivedPhase.objects.filter(sales_order_id__in=sales_order_ids).order_by('create_date', 'id'):
+            archived[phase.sales_order_id].append(ProductionEvent(
+                sales_order_id=phase.sales_order_id,
+                process=phase.process,
+                source_id=phase.source_id,
+                machine=phase.machine,
+                qty=phase.qty,
+                payload=phase.payload,
+                create_date=phase.create_date
+            ))
+        for sales_order_id, events in archived.items():
+            # Archived rows are older than the hot ones except the plans; the stable sort keeps ties in order
+            events_by_order[sales_order_id] = sorted(events + events_by_order[sales_order_id], key=lambda event: event.create_date)
+    return events_by_order
+
+def order_statuses(sales_orders, include_archive=False):
+    """
+    Status dicts of a batch of SalesOrder, in the given order.
+    The query count is constant whatever the number of orders on screen.
+    """
+    events_by_order = order_timelines([order.id for order in sales_orders], include_archive)
+    return [timeline_status(order.order_qty, events_by_order[order.id])[0] for order in sales_orders]
+
+def persisted_status(order_status):
+    """Status dict of an OrderStatus row, as timeline_status builds it without the process list."""
+    latest_create_date = order_status.latest_create_date
+    return {
+        'bal_qty': order_status.bal_qty,
+        'line_shortage': order_status.line_shortage,
+        'latest_process': order_status.latest_process,
+        'latest_create_date': latest_create_date.astimezone(LOCAL_TIMEZONE).strftime('%Y-%m-%d %H:%M:%S') if latest_create_date else None,
+        'latest_machine': order_status.latest_machine,
+        'qty_to_printing': order_status.qty_to_printing
+    }
+
+def stored_order_statuses(sales_orders):
+    """
+    Status dicts of a batch of SalesOrder read from their OrderStatus rows, in the given order.
+    Orders without a row yet (not rebuilt since they were loaded) are computed from their timeline.
+    """
+    stored = OrderStatus.objects.in_bulk([order.id for order in sales_orders])
+    missing = [order for order in sales_orders if order.id not in stored]
+    computed = dict(zip((order.id for order in missing), order_statuses(missing, include_archive=True)))
+    return [persisted_status(stored[order.id]) if order.id in stored else computed[order.id] for order in sales_orders]
+
+def order_histories(sales_orders, include_archive=False):
+    """
+    Status dicts of a batch of SalesOrder with their process list, for the pages showing the order history.
+    The quantities come from OrderStatus and always count the archived rows; the process list only shows
+    the archived rows with `include_archive` (one more query).
+    """
+    histories = order_statuses(sales_orders, include_archive)
+    return [{**status, 'process': history['process']} for status, history in zip(stored_order_statuses(sales_orders), histories)]
+
+def rebuild_order_status(sales_order_ids):
+    """
+    Recompute and upsert the OrderStatus of the given orders from their whole timeline, with one query per table.
+    Used by the rebuild_order_status command; the writes update the rows by difference (apply_event_changes).
+    """
+    sales_order_ids = {sales_order_id for sales_order_id in sales_order_ids if sales_order_id is not None}
+    if not sales_order_ids:
+        return []
+
+    order_qtys = dict(SalesOrder.objects.filter(id__in=sales_order_ids).values_list('id', 'order_qty'))
+    events_by_order = order_timelines(order_qtys, include_archive=True)
+
+    now = timezone.now()
+    order_statuses = []
+    for sales_order_id, order_qty in order_qtys.items():
+        status, latest_event = timeline_status(order_qty, events_by_order[sales_order_id])
+        order_statuses.append(OrderStatus(
+            sales_order_id=sales_order_id,
+            bal_qty=status['bal_qty'],
+            line_shortage=status['line_shortage'],
+            latest_process=status['latest_process'],
+            latest_create_date=latest_event.create_date if latest_event else None,
+            latest_machine=status['latest_machine'],
+            qty_to_printing=status['qty_to_printing'],
+            modify_date=now
+        ))
+
+    OrderStatus.objects.bulk_create(
+        order_statuses,
+        update_conflicts=True,
+        unique_fields=['sales_order'],
+        update_fields=STATUS_FIELDS
+    )
+    return order_statuses
+
+def create_order_statuses(sales_orders):
+    """Blank OrderStatus rows of new orders: nothing produced or inspected yet."""
+    OrderStatus.objects.bulk_create(
+        [OrderStatus(sales_order_id=order.id, bal_qty=order.order_qty, line_shortage=-order.order_qty) for order in sales_orders],
+        ignore_conflicts=True
+    )
+
+def change_order_qtys(qty_changes):
+    """Shift bal_qty (and line_shortage with it) by the {sales_order_id: order_qty difference} of changed orders."""
+    now = timezone.now()
+    order_statuses = [
+        OrderStatus(sales_order_id=sales_order_id, bal_qty=F('bal_qty') + change, line_shortage=F('line_shortage') - change, modify_date=now)
+        for sales_order_id, change in qty_changes.items() if change
+    ]
+    # Orders without a row are left to rebuild_order_status
+    OrderStatus.objects.bulk_update(order_statuses, ['bal_qty', 'line_shortage', 'modify_date'])
+
+def event_second(event):
+    # The pages show the timeline to the second: the latest process is the first one of the last second
+    return event.create_date.replace(microsecond=0)
+
+def status_changed(old, new):
+    return (old.sales_order_id, old.qty, old.machine, old.payload, old.create_date) != (new.sales_order_id, new.qty, new.machine, new.payload, new.create_date)
+
+def apply_event_changes(changes):
+    """
+    Update the OrderStatus of the orders touched by a batch of event writes, by difference.
+    `changes` are (old event, new event) pairs: old is None for an added event, new is None for a deleted one.
+
+    bal_qty moves by the inspected quantity difference. Events added in a later second than every event of
+    their order (the kiosk scans) are applied to the stored row: DryLine quantities add up until the next
+    inspection, which sends its quantity to printing until a printing follows, and the latest process moves on.
+    For other changes (edits, deletes, events recorded late by an offline kiosk) the end of the timeline is
+    re-read with indexed queries: the last inspection, the rolls after it and the events of the last second.
+    Orders without an OrderStatus row are left to rebuild_order_status; the pages compute them meanwhile.
+    Call it inside the transaction that wrote the events.
+    """
+    changes_by_order = defaultdict(list)
+    for old, new in changes:
+        if old is not None and new is not None:
+            if not status_changed(old, new):
+                continue
+            if old.sales_order_id != new.sales_order_id:
+                changes_by_order[old.sales_order_id].append((old, None))
+                changes_by_order[new.sales_order_id].append((None, new))
+                continue
+        changes_by_order[(new or old).sales_order_id].append((old, new))
+    if not changes_by_order:
+        return []
+
+    stored = OrderStatus.objects.select_for_update().in_bulk(list(changes_by_order))
+    now = timezone.now()
+    updates = {}
+    tail_orders = []
+    for sales_order_id, order_changes in changes_by_order.items():
+        order_status = stored.get(sales_order_id)
+        if order_status is None:
+            continue
+        inspected = sum(new.qty or 0 for _, new in order_changes if new is not None and new.process == 'Inspection')
+        inspected -= sum(old.qty or 0 for old, _ in order_changes if old is not None and old.process == 'Inspection')
+        updates[sales_order_id] = (order_status, inspected)
+
+        added = sorted((new for old, new in order_changes if old is None), key=lambda event: event.create_date)
+        latest_second = order_status.latest_create_date.replace(microsecond=0) if order_status.latest_create_date else None
+        if len(added) < len(order_changes) or (latest_second and event_second(added[0]) <= latest_second):
+            tail_orders.append(sales_order_id)
+            continue
+
+        # Appended events: the rolls produced since the last inspection are line_shortage + bal_qty
+        produced = None  # None while the last inspection is the stored one
+        produced_added = 0
+        latest_inspection = latest_printing = None
+        for event in added:
+            if event.process == 'DryLine':
+                produced_added += event.qty or 0
+            elif event.process == 'Inspection':
+                produced, produced_added = 0, 0
+                latest_inspection = event
+            elif event.process == 'Printing':
+                latest_printing = event
+        set_produced(order_status, inspected, produced, produced_added)
+
+        if latest_printing and not (latest_inspection and event_second(latest_inspection) > event_second(latest_printing)):
+            order_status.qty_to_printing = None
+        elif latest_inspection:
+            order_status.qty_to_printing = latest_inspection.payload['qty_to_printing']
+        set_latest(order_status, next(event for event in added if event_second(event) == event_second(added[-1])))
+
+    for sales_order_id, tail in timeline_tails(tail_orders).items():
+        order_status, inspected = updates[sales_order_id]
+        set_produced(order_status, inspected, tail['produced'], 0)
+        order_status.qty_to_printing = tail['qty_to_printing']
+        set_latest(order_status, tail['latest'])
+
+    order_statuses = [order_status for order_status, _ in updates.values()]
+    for order_status, inspected in updates.values():
+        order_status.bal_qty = F('bal_qty') - inspected
+        order_status.modify_date = now
+    OrderStatus.objects.bulk_update(order_statuses, STATUS_FIELDS)
+    return order_statuses
+
+def set_produced(order_status, inspected, produced, produced_added):
+    """line_shortage = rolls produced since the last inspection - bal_qty, with bal_qty lowered by `inspected`."""
+    if produced is None:
+        order_status.line_shortage = F('line_shortage') + produced_added + inspected
+    else:
+        order_status.line_shortage = Value(produced + produced_added) - F('bal_qty') + inspected
+
+def set_latest(order_status, event):
+    order_status.latest_process = event.process if event else None
+    order_status.latest_create_date = event.create_date if event else None
+    order_status.latest_machine = event.machine if event else None
+
+def timeline_tails(sales_order_ids):
+    """
+    The end of the timeline of the given orders, with a constant number of indexed queries per timeline table:
+    {sales_order_id: {'produced': DryLine quantity since the last inspection, 'qty_to_printing', 'latest': event}}.
+    """
+    if not sales_order_ids:
+        return {}
+
+    last_inspections, last_printings, last_dates = {}, {}, {}
+    for model in TIMELINE_MODELS:
+        events = model.objects.filter(sales_order_id__in=sales_order_ids)
+        for event in events.filter(process='Inspection').annotate(row_number=Window(
+            expression=RowNumber(),
+            partition_by=[F('sales_order_id')],
+            order_by=[F('create_date').desc(), F('id').desc()]
+        )).filter(row_number=1):
+            if event.sales_order_id not in last_inspections or event.create_date > last_inspections[event.sales_order_id].create_date:
+                last_inspections[event.sales_order_id] = event
+        for sales_order_id, create_date in events.filter(process='Printing').values('sales_order_id').annotate(last=Max('create_date')).values_list('sales_order_id', 'last'):
+            last_printings[sales_order_id] = max(create_date, last_printings.get(sales_order_id, create_date))
+        for sales_order_id, create_date in events.values('sales_order_id').annotate(last=Max('create_date')).values_list('sales_order_id', 'last'):
+            last_dates[sales_order_id] = max(create_date, last_dates.get(sales_order_id, create_date))
+
+    # Rolls after the last inspection, and the events of the last second
+    after_inspection = Q()
+    last_second = Q()
+    for sales_order_id in sales_order_ids:
+        inspection = last_inspections.get(sales_order_id)
+        after_inspection |= Q(sales_order_id=sales_order_id, create_date__gt=inspection.create_date) if inspection else Q(sales_order_id=sales_order_id)
+        if sales_order_id in last_dates:
+            last_second |= Q(sales_order_id=sales_order_id, create_date__gte=last_dates[sales_order_id].replace(microsecond=0))
+
+    produced = defaultdict(int)
+    latest = {}
+    for model in TIMELINE_MODELS:
+        for sales_order_id, qty in model.objects.filter(after_inspection, process='DryLine').values('sales_order_id').annotate(qty=Sum('qty')).values_list('sales_order_id', 'qty'):
+            produced[sales_order_id] += qty or 0
+        if last_dates:
+            for event in model.objects.filter(last_second).order_by('create_date', 'id'):
+                if event.sales_order_id not in latest or event.create_date < latest[event.sales_order_id].create_date:
+                    latest[event.sales_order_id] = event
+
+    tails = {}
+    for sales_order_id in sales_order_ids:
+        inspection = last_inspections.get(sales_order_id)
+        printing_date = last_printings.get(sales_order_id)
+        qty_to_printing = None
+        # Waiting for printing unless a printing was recorded after the last inspection (to the second)
+        if inspection and not (printing_date and printing_date.replace(microsecond=0) >= event_second(inspection)):
+            qty_to_printing = inspection.payload['qty_to_printing']
+        tails[sales_order_id] = {'produced': produced[sales_order_id], 'qty_to_printing': qty_to_printing, 'latest': latest.get(sales_order_id)}
+    return tails
@@ -2,6 +2,8 @@ import openpyxl
 from copy import copy
 import pandas as pd
 from .models import SalesOrder, ProductionPlan
+from .kiosk import drain_kiosk_submissions
+from .archive import archive_phases
 from datetime import datetime
 from django.http import HttpResponse, JsonResponse
 from django.conf import settings
@@ -28,6 +30,16 @@ def get_s3_file(key):
 def index2(request):
     pass
 
+@shared_task
+def process_kiosk_submissions():
+    """Drain the queued kiosk submissions into the phase tables."""
+    return drain_kiosk_submissions(batch_size=getattr(settings, 'KIOSK_SUBMISSION_BATCH_SIZE', 100))
+
+@shared_task
+def archive_phase_records():
+    """Move the old phase rows of shipped orders to the archive (schedule it nightly)."""
+    return archive_phases()
+
 def copy_sheet_attributes(source_sheet, target_sheet):
     if isinstance(source_sheet, openpyxl.worksheet._read_only.ReadOnlyWorksheet):
         return
@@ -0,0 +1,49 @@
+import importlib
+from django.apps import apps
+from django.test import TestCase, override_settings
+from data_monitoring.aging import enter_position, exit_positions, occupancy
+from data_monitoring.models import DryLine, AgingPosition, AgingMovement
+from .utils import LOCAL_CACHE, make_order, make_plan
+
+fill_aging_occupancy = importlib.import_module('data_monitoring.migrations.0022_fill_aging_occupancy').fill_aging_occupancy
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class AgingTests(TestCase):
+    def setUp(self):
+        self.plan = make_plan(make_order(1))
+
+    def rolls(self, count, **fields):
+        ids = [DryLine.objects.create(production_plan=self.plan, pd_qty=100, line_no='bsvdl01', **fields).id for _ in range(count)]
+        return DryLine.objects.filter(id__in=ids)
+
+    def test_backfill_normalises_position_codes(self):
+        self.rolls(2, ag_position='a 1')
+        self.rolls(1, ag_position='A1')
+        self.rolls(1, ag_position=' ')
+
+        fill_aging_occupancy(apps, None)
+        self.assertEqual(list(AgingPosition.objects.values_list('code', 'roll_count', 'pd_qty')), [('A1', 3, 300)])
+
+    def test_entering_the_same_position_again_keeps_the_entry(self):
+        rolls = self.rolls(2)
+        enter_position(rolls, 'a1')
+        entries = list(AgingMovement.objects.values_list('id', 'entry_date'))
+
+        self.assertEqual(enter_position(rolls, 'A 1'), 2)
+        self.assertEqual(list(AgingMovement.objects.values_list('id', 'entry_date')), entries)
+        self.assertEqual(AgingPosition.objects.get(code='A1').roll_count, 2)
+
+    def test_enter_move_exit_occupancy(self):
+        rolls = self.rolls(3)
+        moved = rolls.filter(id__in=list(rolls.values_list('id', flat=True)[:1]))
+
+        self.assertEqual(enter_position(rolls, 'A1'), 3)
+        self.assertEqual(enter_position(moved, 'b2'), 1)
+        self.assertEqual([(position.code, position.roll_count, position.pd_qty) for position in occupancy()], [('A1', 2, 200), ('B2', 1, 100)])
+        self.assertEqual(set(rolls.values_list('ag_position', flat=True)), {'A1', 'B2'})
+
+        self.assertEqual(exit_positions(rolls), 3)
+        self.assertEqual(occupancy(), [])
+        self.assertEqual(AgingMovement.objects.filter(exit_date__isnull=True).count(), 0)
+        self.assertEqual(AgingMovement.objects.count(), 4)
@@ -0,0 +1,84 @@
+import base64
+import datetime
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from data_monitoring.models import DryLine
+from .utils import LOCAL_CACHE, make_order, make_plan
+
+def basic_auth(username, password):
+    return {'HTTP_AUTHORIZATION': 'Basic ' + base64.b64encode(f'{username}:{password}'.encode()).decode()}
+
+
+@override_settings(CACHES=LOCAL_CACHE, API_DEFAULT_DAYS=7)
+class APIListTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('bi-client', password='password')
+        plan = make_plan(make_order(1))
+        start = timezone.now() - datetime.timedelta(hours=1)
+        self.rolls = [
+            DryLine.objects.create(production_plan=plan, pd_qty=100 + index, line_no='bsvdl01', create_date=start + datetime.timedelta(minutes=index))
+            for index in range(3)
+        ]
+
+    def get(self, name='dryline', headers=None, **params):
+        return self.client.get(f'/data_monitoring/api/{name}/', params, **(headers or basic_auth('bi-client', 'password')))
+
+    def test_machine_clients_use_basic_auth(self):
+        response = self.client.get('/data_monitoring/api/dryline/')
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('Basic', response['WWW-Authenticate'])
+        self.assertEqual(self.get(headers=basic_auth('bi-client', 'wrong')).status_code, 401)
+
+        self.assertEqual(self.get().status_code, 200)
+        self.assertNotIn('sessionid', self.client.cookies)
+        # Browsers keep using their session
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/data_monitoring/api/dryline/').status_code, 200)
+
+    def test_unchanged_data_is_not_modified(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertEqual(self.get(headers={**basic_auth('bi-client', 'password'), 'HTTP_IF_NONE_MATCH': etag}).status_code, 304)
+
+        # An edit and a deletion both change the ETag
+        self.rolls[0].pd_qty = 90
+        self.rolls[0].save()
+        response = self.get(headers={**basic_auth('bi-client', 'password'), 'HTTP_IF_NONE_MATCH': etag})
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.rolls[1].delete()
+        self.assertEqual(self.get(headers={**basic_auth('bi-client', 'password'), 'HTTP_IF_NONE_MATCH': etag}).status_code, 200)
+
+    def test_cursor_pages_every_row_once(self):
+        ids, params = [], {'page_size': 2}
+        while True:
+            data = self.get(**params).json()
+            ids += [row['id'] for row in data['results']]
+            if not data['next_cursor']:
+                break
+            params['cursor'] = data['next_cursor']
+        self.assertEqual(ids, [roll.id for roll in reversed(self.rolls)])
+
+    def test_fields_select_the_columns(self):
+        data = self.get(fields='id,order_no,pd_qty').json()
+        self.assertEqual(data['results'][0], {'id': self.rolls[2].id, 'order_no': 'SOV0000001-1', 'pd_qty': 102})
+        response = self.get(fields='id,password')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', response.json()['message'])
+
+    def test_window_is_explicit(self):
+        plan = make_plan(make_order(2))
+        old = DryLine.objects.create(production_plan=plan, pd_qty=50, line_no='bsvdl01', create_date=timezone.now() - datetime.timedelta(days=10))
+
+        # The production plans use the API window too, not the 3 days of the plan export
+        data = self.get('productionplan').json()
+        today = timezone.localdate()
+        self.assertEqual(data['window'], {'start_date': str(today - datetime.timedelta(days=7)), 'end_date': str(today)})
+        self.assertNotIn(old.id, [row['id'] for row in self.get().json()['results']])
+
+        # An order list is read whatever its dates
+        data = self.get(order_numbers='SOV0000001-2').json()
+        self.assertIsNone(data['window'])
+        self.assertEqual([row['id'] for row in data['results']], [old.id])
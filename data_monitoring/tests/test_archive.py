@@ -0,0 +1,69 @@
+import datetime
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from data_monitoring.aging import enter_position
+from data_monitoring.archive import archive_phases
+from data_monitoring.models import DryLine, Inspection, ArchivedPhase, ProductionEvent, TraceLink, AgingMovement, AgingPosition
+from data_monitoring.status import stored_order_statuses
+from data_monitoring.trace import plan_links
+from .utils import LOCAL_CACHE, make_order, make_plan
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.order = make_order(1)
+        self.plan = make_plan(self.order)
+        old = timezone.now() - datetime.timedelta(days=400)
+        self.roll = DryLine.objects.create(production_plan=self.plan, pd_qty=100, line_no='bsvdl03', pd_lot='0101-1A', create_date=old)
+        self.inspection = Inspection.objects.create(production_plan=self.plan, ins_qty=60, line_no='bsvdl03', qty_to_printing=0, create_date=old)
+
+    def edges(self, links):
+        return sorted((link.parent_kind, link.parent_key, link.child_kind, link.child_key) for link in links)
+
+    def test_open_orders_are_not_archived(self):
+        self.assertEqual(archive_phases(age_days=365), {'DryMix': 0, 'DryLine': 0, 'Delamination': 0, 'Inspection': 0, 'Printing': 0})
+        self.assertEqual(DryLine.objects.count(), 1)
+
+    def test_shipped_order_rows_move_to_the_archive(self):
+        self.order.status = True
+        self.order.save()
+        status_before = stored_order_statuses([self.order])
+
+        counts = archive_phases(age_days=365, batch_size=1)
+        self.assertEqual((counts['DryLine'], counts['Inspection']), (1, 1))
+        self.assertFalse(DryLine.objects.exists() or Inspection.objects.exists())
+        self.assertEqual(ArchivedPhase.objects.count(), 2)
+        self.assertEqual(set(ProductionEvent.objects.values_list('process', flat=True)), {'DryPlan'})
+
+        # The archived rows still count in the order status, and no trace edge points at them
+        self.assertEqual(stored_order_statuses([self.order]), status_before)
+        self.assertEqual(self.edges(TraceLink.objects.all()), self.edges(plan_links([self.plan.id])))
+        self.assertFalse(TraceLink.objects.filter(child_kind__in=['dryline', 'inspection']).exists())
+
+    def test_archived_rolls_leave_the_aging_room(self):
+        enter_position(DryLine.objects.filter(id=self.roll.id), 'A1')
+        self.order.status = True
+        self.order.save()
+
+        archive_phases(age_days=365)
+        self.assertFalse(AgingMovement.objects.exists())
+        self.assertEqual(AgingPosition.objects.get(code='A1').roll_count, 0)
+
+    def test_order_history_shows_the_archive_when_asked(self):
+        self.order.status = True
+        self.order.save()
+        archive_phases(age_days=365)
+        self.client.force_login(User.objects.create_user('monitor', password='password'))
+
+        def search(**params):
+            (order, status), = self.client.post('/data_monitoring/order_search/', {'order_number': self.order.order_no, **params}).context['order_and_status']
+            return status
+
+        hot, archived = search(), search(include_archive='1')
+        self.assertEqual([proc['process'] for proc in hot['process']], ['DryPlan'])
+        self.assertEqual([proc['process'] for proc in archived['process']], ['DryLine', 'Inspection', 'DryPlan'])
+        # The quantities count the archived rows either way
+        self.assertEqual(hot['bal_qty'], 40)
+        self.assertEqual({**hot, 'process': None}, {**archived, 'process': None})
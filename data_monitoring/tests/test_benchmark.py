@@ -0,0 +1,32 @@
+import io
+import json
+import os
+import tempfile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from production_management.models import SalesOrder
+from data_monitoring.models import DryLine
+from .utils import LOCAL_CACHE
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class BenchmarkQueriesTests(TestCase):
+    def test_seeded_run_is_rolled_back(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'benchmark.json')
+            stdout = io.StringIO()
+            call_command('benchmark_queries', orders=20, rolls=2, days=3, repeat=1, output=output, stdout=stdout)
+            with open(output) as f:
+                results = json.load(f)
+
+            self.assertIn('Seeded 20 / 20 orders', stdout.getvalue())
+            self.assertIn('dryline_lot', results)
+            for result in results.values():
+                self.assertEqual(set(result), {'plan', 'full_scan', 'median_ms', 'max_ms'})
+            self.assertFalse(SalesOrder.objects.exists())
+            self.assertFalse(DryLine.objects.exists())
+
+            # A run over the existing (empty) data compares with the previous one
+            stdout = io.StringIO()
+            call_command('benchmark_queries', orders=0, repeat=1, baseline=output, stdout=stdout)
+            self.assertIn(output, stdout.getvalue())
@@ -0,0 +1,22 @@
+from unittest import mock
+from django.test import TransactionTestCase, override_settings
+from data_monitoring.models import DryLine, ProductionEvent
+from .utils import LOCAL_CACHE, make_order, make_plan
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class PhaseSaveTests(TransactionTestCase):
+    def setUp(self):
+        self.plan = make_plan(make_order(1))
+
+    def test_row_is_saved_with_its_event(self):
+        roll = DryLine.objects.create(production_plan=self.plan, pd_qty=100, line_no='bsvdl01')
+        event = ProductionEvent.objects.get(process='DryLine', source_id=roll.id)
+        self.assertEqual((event.sales_order_id, event.qty), (self.plan.sales_order_id, 100))
+
+    def test_failed_event_write_rolls_back_the_row(self):
+        # No transaction around the save: the row must not be committed without its event
+        with mock.patch('data_monitoring.signals.record_production_events', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                DryLine.objects.create(production_plan=self.plan, pd_qty=100, line_no='bsvdl01')
+        self.assertFalse(DryLine.objects.exists())
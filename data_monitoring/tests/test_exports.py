@@ -0,0 +1,53 @@
+import csv
+import datetime
+import io
+import openpyxl
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from data_monitoring.models import DryMix, Inspection
+from .utils import LOCAL_CACHE, make_order, make_plan
+
+ORDER_HEADERS = ['OrderNo', 'OrderType', 'OrderDate', 'RTD', 'ETD', 'Brand', 'Customer', 'Item', 'ColorCode', 'Pattern', 'Spec', 'OrderQty']
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class ExportTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('monitor', password='password'))
+        self.plan = make_plan(make_order(1))
+        self.mixed = timezone.now() - datetime.timedelta(hours=1)
+        DryMix.objects.create(production_plan=self.plan, worker_code='W001', create_date=self.mixed, mixing_information=[
+            {'item': 'BASE', 'unit': 'KG', 'quantity': '12'}])
+        DryMix.objects.create(production_plan=self.plan, worker_code='W002', create_date=self.mixed - datetime.timedelta(minutes=5), mixing_information=[
+            {'item': 'SKIN', 'unit': 'KG', 'quantity': '3'}, {'item': 'BASE', 'unit': 'KG', 'quantity': '10'}])
+
+    def export(self, name, **params):
+        return self.client.get(f'/data_monitoring/export/{name}/', params)
+
+    def test_csv_has_one_column_per_json_key(self):
+        response = self.export('drymix')
+        content = b''.join(response.streaming_content).decode('utf-8-sig')
+        rows = list(csv.reader(io.StringIO(content)))
+
+        self.assertEqual(rows[0], ORDER_HEADERS + ['DateTime', 'WorkerCode', 'BASE', 'SKIN'])
+        mixed = timezone.localtime(self.mixed).replace(tzinfo=None, microsecond=0)
+        self.assertEqual(rows[1][0], 'SOV0000001-1')
+        self.assertEqual(rows[1][-4:], [str(mixed), 'W001', '12KG', ''])
+        self.assertEqual(rows[2][-3:], ['W002', '10KG', '3KG'])
+        self.assertEqual(len(rows), 3)
+
+    def test_xlsx_rows(self):
+        Inspection.objects.create(production_plan=self.plan, ins_qty=90, qty_to_printing=10, line_no='bsvin01',
+                                  ins_information=[{'defectCause': 'Hole', 'quantity': 2}])
+        response = self.export('inspection', format='xlsx')
+        workbook = openpyxl.load_workbook(io.BytesIO(b''.join(response.streaming_content)))
+        rows = list(workbook.active.values)
+
+        # The defect causes are always listed, the others follow as found
+        self.assertEqual(rows[0][:15], tuple(['Line'] + ORDER_HEADERS + ['A Grade Qty', 'Qty To Printing']))
+        self.assertIn('Hole', rows[0])
+        self.assertEqual(len(rows), 2)
+        self.assertEqual((rows[1][0], rows[1][1], rows[1][13], rows[1][14]), ('bsvin01', 'SOV0000001-1', 90, 10))
+        self.assertEqual(rows[1][rows[0].index('Hole')], 2)
+        self.assertIsInstance(rows[1][15], datetime.datetime)
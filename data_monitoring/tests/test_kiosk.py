@@ -0,0 +1,189 @@
+import datetime
+import json
+from unittest import mock
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from data_monitoring.models import DryLine, Inspection, KioskSubmission
+from data_monitoring.kiosk import drain_kiosk_submissions, apply_kiosk_events, ingest_dryline, ingest_inspection
+from data_monitoring.tasks import process_kiosk_submissions
+from workforce_management.models import Worker
+from inventory_management.models import Category, Supplier, RawMaterial
+from .utils import LOCAL_CACHE, make_order, make_plan, dryline_payload
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class KioskIngestTests(TestCase):
+    def setUp(self):
+        self.orders = [make_order(seq_no) for seq_no in range(1, 9)]
+        for order in self.orders:
+            make_plan(order)
+
+    def test_scan_query_count_does_not_depend_on_the_rolls(self):
+        # Scans come after the plans, as on the floor
+        scanned = timezone.now() + datetime.timedelta(minutes=1)
+        with CaptureQueriesContext(connection) as small_scan:
+            ingest_dryline(dryline_payload(*self.orders[:2]), create_date=scanned)
+        with CaptureQueriesContext(connection) as large_scan:
+            ingest_dryline(dryline_payload(*self.orders[2:]), create_date=scanned)
+        self.assertEqual(len(large_scan), len(small_scan))
+        self.assertEqual(DryLine.objects.count(), 8)
+
+    def test_unconfirmed_roll_is_updated(self):
+        order = self.orders[0]
+        ingest_dryline(dryline_payload(order, qty=100))
+        ingest_dryline(dryline_payload(order, qty=120))
+        self.assertEqual(list(DryLine.objects.values_list('pd_qty', flat=True)), [120])
+
+        # A roll with a lot is confirmed: the next scan adds a roll
+        DryLine.objects.update(pd_lot='0101-1A')
+        ingest_dryline(dryline_payload(order, qty=80))
+        self.assertEqual(sorted(DryLine.objects.values_list('pd_qty', flat=True)), [80, 120])
+
+    def test_inspection_follows_the_latest_roll(self):
+        order = self.orders[0]
+        ingest_dryline(dryline_payload(order))
+        roll = DryLine.objects.get()
+        ingest_inspection({
+            'scannedOrders': [{'order_number': order.order_no}, {'order_number': 'SOV9999999-1'}],
+            'machine': 'bsvin01',
+            'quantityInput': [{'Grade': 'A', 'quantity': '80'}, {'Grade': 'Printing', 'quantity': '20'}, {'defectCause': 'Hole', 'quantity': '5'}],
+        })
+
+        inspection = Inspection.objects.get()
+        self.assertEqual((inspection.production_plan_id, inspection.ins_qty, inspection.qty_to_printing), (roll.production_plan_id, 80, 20))
+        self.assertEqual(inspection.ins_information, [{'quantity': 5, 'defectCause': 'Hole'}])
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class KioskQueueTests(TestCase):
+    def setUp(self):
+        self.order = make_order(1)
+        make_plan(self.order)
+
+    def test_drained_rows_keep_submission_time(self):
+        submitted = timezone.now() - datetime.timedelta(hours=3)
+        KioskSubmission.objects.create(idempotency_key='key-1', phase='dryline', payload=dryline_payload(self.order), create_date=submitted)
+
+        self.assertEqual(drain_kiosk_submissions(), 1)
+        self.assertEqual(DryLine.objects.get().create_date, submitted)
+        self.assertEqual(KioskSubmission.objects.get().status, 'done')
+
+    def test_duplicate_submit_is_queued_once(self):
+        for _ in range(2):
+            response = self.client.post(
+                '/data_monitoring/input_dryline/', json.dumps({**dryline_payload(self.order), 'idempotencyKey': 'key-1'}),
+                content_type='application/json'
+            )
+            self.assertEqual(response.status_code, 202)
+        self.assertEqual(KioskSubmission.objects.count(), 1)
+
+        drain_kiosk_submissions()
+        drain_kiosk_submissions()
+        self.assertEqual(DryLine.objects.count(), 1)
+
+    def submit(self, phase, data):
+        return self.client.post(f'/data_monitoring/input_{phase}/', json.dumps(data), content_type='application/json')
+
+    def test_non_string_key_is_rejected(self):
+        response = self.submit('dryline', {**dryline_payload(self.order), 'idempotencyKey': 12345})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(KioskSubmission.objects.exists())
+
+    def test_invalid_drymix_is_not_queued(self):
+        scanned = [{'order_number': self.order.order_no}]
+        for data in (
+            {'scannedOrders': scanned, 'quantityInput': {'item': 'BASE'}},
+            {'scannedOrders': scanned, 'quantityInput': [{'item': 'BASE', 'quantity': 'many'}]},
+            {'scannedOrders': scanned, 'quantityInput': [], 'staffNumber': 'S' * 11},
+        ):
+            response = self.submit('drymix', {**data, 'idempotencyKey': 'key-1'})
+            self.assertEqual(response.status_code, 400)
+        self.assertFalse(KioskSubmission.objects.exists())
+
+        response = self.submit('drymix', {'scannedOrders': scanned, 'quantityInput': [{'item': 'BASE', 'unit': 'KG', 'quantity': '12.5'}], 'staffNumber': 'S001', 'idempotencyKey': 'key-1'})
+        self.assertEqual(response.status_code, 202)
+
+    def test_submission_left_by_a_broker_error_is_drained_periodically(self):
+        with mock.patch('data_monitoring.views.process_kiosk_submissions.delay', side_effect=ConnectionError('broker down')):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.submit('dryline', {**dryline_payload(self.order), 'idempotencyKey': 'key-1'})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(KioskSubmission.objects.get().status, 'pending')
+
+        scheduled = settings.CELERY_BEAT_SCHEDULE['drain-kiosk-submissions']['task']
+        self.assertEqual(scheduled, process_kiosk_submissions.name)
+        process_kiosk_submissions()
+        self.assertEqual(KioskSubmission.objects.get().status, 'done')
+        self.assertEqual(DryLine.objects.count(), 1)
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class KioskSyncTests(TestCase):
+    def setUp(self):
+        self.order = make_order(1)
+        make_plan(self.order)
+
+    def sync(self, kiosk_id, events):
+        return self.client.post('/data_monitoring/kiosk_sync/', json.dumps({'kioskId': kiosk_id, 'events': events}), content_type='application/json')
+
+    def test_resend_skips_applied_events(self):
+        events = [
+            {'seq': 1, 'phase': 'dryline', 'createDate': '2024-01-02T08:00:00+00:00', 'payload': dryline_payload(self.order)},
+            {'seq': 2, 'phase': 'unknown', 'createDate': '2024-01-02T08:01:00+00:00', 'payload': {}},
+        ]
+        first = self.sync('kiosk-1', events).json()
+        self.assertEqual((first['applied'], first['failed'], first['skipped']), ([1], [2], []))
+
+        second = self.sync('kiosk-1', events).json()
+        self.assertEqual((second['applied'], second['skipped'], second['highWaterMark']), ([], [1, 2], 2))
+        self.assertEqual(DryLine.objects.count(), 1)
+
+    def test_concurrently_claimed_event_is_skipped(self):
+        # The other sync inserted the event between the pre-check and the claim
+        event = {'seq': 1, 'phase': 'dryline', 'create_date': timezone.now(), 'payload': dryline_payload(self.order)}
+        original_filter = KioskSubmission.objects.filter
+
+        def filter_without_claims(*args, **kwargs):
+            if 'seq_no__in' in kwargs:
+                return KioskSubmission.objects.none()
+            return original_filter(*args, **kwargs)
+
+        KioskSubmission.objects.create(idempotency_key='kiosk-1:1', kiosk_id='kiosk-1', seq_no=1, phase='dryline', payload={}, status='done')
+        with mock.patch.object(KioskSubmission.objects, 'filter', side_effect=filter_without_claims):
+            result = apply_kiosk_events('kiosk-1', [event])
+        self.assertEqual((result['applied'], result['skipped']), ([], [1]))
+        self.assertEqual(DryLine.objects.count(), 0)
+
+    def test_long_kiosk_id_is_rejected(self):
+        response = self.sync('k' * 31, [])
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class KioskReferenceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        Worker.objects.create(worker_code='W001', name='WORKER', department='DM', join_date=datetime.date(2024, 1, 1))
+        self.category = Category.objects.create(category_name='SKIN RESIN')
+
+    def test_unchanged_bundle_is_not_modified(self):
+        response = self.client.get('/data_monitoring/kiosk_reference/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['workers']['DM'][0]['worker_code'], 'W001')
+
+        etag = response['ETag']
+        self.assertEqual(self.client.get('/data_monitoring/kiosk_reference/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_change_invalidates_the_bundle(self):
+        etag = self.client.get('/data_monitoring/kiosk_reference/')['ETag']
+
+        supplier = Supplier.objects.create(supplier_name='SUPPLIER')
+        RawMaterial.objects.create(material_name='RESIN-1', supplier=supplier, category=self.category)
+        response = self.client.get('/data_monitoring/kiosk_reference/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['materials'], {'SKIN RESIN': ['RESIN-1']})
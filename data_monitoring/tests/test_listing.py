@@ -0,0 +1,77 @@
+import datetime
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from data_monitoring.listing import keyset_page
+from data_monitoring.models import DryLine, Inspection
+from .utils import LOCAL_CACHE, make_order, make_plan
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class KeysetPageTests(TestCase):
+    def setUp(self):
+        plan = make_plan(make_order(1))
+        start = timezone.now()
+        # Two rolls per second: pages end between rows of the same create_date
+        self.rolls = [
+            DryLine.objects.create(production_plan=plan, pd_qty=100, line_no='bsvdl01', create_date=start + datetime.timedelta(seconds=index // 2))
+            for index in range(6)
+        ]
+
+    def pages(self, page_size, descending):
+        pages, cursor = [], ''
+        while True:
+            rows, cursor = keyset_page(DryLine.objects.all(), 'create_date', cursor, page_size, descending=descending)
+            pages.append([row.id for row in rows])
+            if cursor is None:
+                return pages
+
+    def test_pages_cover_every_row_once(self):
+        ids = [roll.id for roll in self.rolls]
+        self.assertEqual(self.pages(4, descending=False), [ids[:4], ids[4:]])
+        self.assertEqual(self.pages(4, descending=True), [ids[::-1][:4], ids[::-1][4:]])
+
+    def test_full_last_page_has_no_next_cursor(self):
+        ids = [roll.id for roll in self.rolls]
+        self.assertEqual(self.pages(3, descending=False), [ids[:3], ids[3:]])
+        self.assertEqual(self.pages(6, descending=False), [ids])
+
+    def test_invalid_cursor_starts_over(self):
+        rows, _ = keyset_page(DryLine.objects.all(), 'create_date', 'garbage_x', 2)
+        self.assertEqual([row.id for row in rows], [roll.id for roll in self.rolls[:2]])
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class InspectionListTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('monitor', password='password'))
+
+    def inspect(self, plan, count=1):
+        for _ in range(count):
+            Inspection.objects.create(production_plan=plan, ins_qty=90, ins_information=[], line_no='bsvin01')
+
+    def test_rows_show_the_first_roll_of_their_plan(self):
+        produced, unproduced = make_plan(make_order(1)), make_plan(make_order(2))
+        start = timezone.now() - datetime.timedelta(hours=1)
+        DryLine.objects.create(production_plan=produced, pd_qty=150, line_no='bsvdl01', create_date=start + datetime.timedelta(minutes=10))
+        DryLine.objects.create(production_plan=produced, pd_qty=100, line_no='bsvdl01', create_date=start)
+        self.inspect(produced)
+        self.inspect(unproduced)
+
+        response = self.client.get('/data_monitoring/inspection/')
+        quantities = {inspection.production_plan_id: quantity for inspection, quantity in response.context['list']}
+        self.assertEqual(quantities, {produced.id: 100, unproduced.id: 0})
+
+    def test_query_count_does_not_depend_on_the_rows(self):
+        plan = make_plan(make_order(1))
+        DryLine.objects.create(production_plan=plan, pd_qty=100, line_no='bsvdl01')
+        self.inspect(plan)
+        with CaptureQueriesContext(connection) as one_row:
+            self.client.get('/data_monitoring/inspection/')
+        self.inspect(plan, count=5)
+        with CaptureQueriesContext(connection) as six_rows:
+            response = self.client.get('/data_monitoring/inspection/')
+        self.assertEqual(len(response.context['list']), 6)
+        self.assertEqual(len(six_rows), len(one_row))
@@ -0,0 +1,40 @@
+import datetime
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from data_monitoring.lots import reserve_lot, register_lot, release_lot, LotReservationError
+from data_monitoring.models import ProductionLot
+from .utils import LOCAL_CACHE
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class LotTests(TestCase):
+    def test_reservation_is_registered(self):
+        lot = reserve_lot()
+        register_lot(lot.lot_no, lot.reservation_key)
+        self.assertEqual(ProductionLot.objects.get(lot_no=lot.lot_no).status, 'registered')
+
+        # A registered number is not handed out again
+        self.assertNotEqual(reserve_lot().lot_no, lot.lot_no)
+
+    def test_expired_reservation_taken_by_another_session_is_rejected(self):
+        expired = reserve_lot()
+        ProductionLot.objects.filter(id=expired.id).update(expire_date=timezone.now() - datetime.timedelta(minutes=1))
+
+        taken = reserve_lot()
+        self.assertEqual(taken.lot_no, expired.lot_no)
+        with self.assertRaises(LotReservationError):
+            register_lot(expired.lot_no, expired.reservation_key)
+        register_lot(taken.lot_no, taken.reservation_key)
+
+    def test_expired_reservation_is_honoured_until_taken(self):
+        lot = reserve_lot()
+        ProductionLot.objects.filter(id=lot.id).update(expire_date=timezone.now() - datetime.timedelta(minutes=1))
+        register_lot(lot.lot_no, lot.reservation_key)
+        self.assertEqual(ProductionLot.objects.get(id=lot.id).status, 'registered')
+
+    def test_released_number_is_reused(self):
+        first = reserve_lot()
+        second = reserve_lot()
+        self.assertTrue(release_lot(first.lot_no, first.reservation_key))
+        self.assertFalse(release_lot(second.lot_no, 'other-session'))
+        self.assertEqual(reserve_lot().lot_no, first.lot_no)
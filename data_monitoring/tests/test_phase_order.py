@@ -0,0 +1,43 @@
+import importlib
+from django.apps import apps
+from django.test import TestCase, override_settings
+from data_monitoring.models import DryMix, DryLine, Delamination, Inspection, Printing
+from .utils import LOCAL_CACHE, make_order, make_plan
+
+fill_phase_sales_order = importlib.import_module('data_monitoring.migrations.0017_fill_phase_sales_order')
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class PhaseOrderTests(TestCase):
+    def setUp(self):
+        self.order = make_order(1)
+        self.plan = make_plan(self.order)
+
+    def create_phases(self):
+        return [
+            DryMix.objects.create(production_plan=self.plan, worker_code='W001', mixing_information=[]),
+            DryLine.objects.create(production_plan=self.plan, pd_qty=100, line_no='bsvdl01'),
+            Delamination.objects.create(production_plan=self.plan, dlami_qty=90, line_no='bsvrp01'),
+            Inspection.objects.create(production_plan=self.plan, ins_qty=80, qty_to_printing=0, line_no='bsvin01', ins_information=[]),
+            Printing.objects.create(production_plan=self.plan, print_qty=10, line_no='bsvpr01'),
+        ]
+
+    def test_saved_rows_take_the_order_of_their_plan(self):
+        for phase in self.create_phases():
+            self.assertEqual(type(phase).objects.get(id=phase.id).sales_order_id, self.order.id)
+
+        # A plan moved to another order takes its rows along
+        other = make_order(2)
+        self.plan.sales_order = other
+        self.plan.save()
+        for phase in self.create_phases():
+            self.assertEqual(type(phase).objects.filter(sales_order=other).count(), 2)
+
+    def test_migration_fills_the_existing_rows(self):
+        phases = self.create_phases()
+        for model in fill_phase_sales_order.PHASE_MODELS:
+            apps.get_model('data_monitoring', model).objects.update(sales_order=None)
+
+        fill_phase_sales_order.fill_sales_order(apps, None)
+        for phase in phases:
+            self.assertEqual(type(phase).objects.get(id=phase.id).sales_order_id, self.order.id)
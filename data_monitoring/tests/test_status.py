@@ -0,0 +1,146 @@
+import datetime
+import pytz
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from production_management.models import SalesOrder
+from data_monitoring.kiosk import ingest_drymix, ingest_dryline, ingest_rp, ingest_inspection, ingest_printing
+from data_monitoring.models import DryLine, Printing, OrderStatus, ProductionEvent
+from data_monitoring.status import persisted_status, order_statuses
+from .utils import LOCAL_CACHE, make_order, make_plan, dryline_payload
+
+def scan(order, **fields):
+    return {'scannedOrders': [{'order_number': order.order_no}], **fields}
+
+def inspection_payload(order, qty, to_printing):
+    return scan(order, machine='bsvin01', quantityInput=[{'Grade': 'A', 'quantity': str(qty)}, {'Grade': 'Printing', 'quantity': str(to_printing)}])
+
+def per_order_status(order):
+    """The status loop order_search ran for each order before the batch engine, kept as the reference."""
+    process = []
+    bal_qty = int(order.order_qty)
+    sub_pd_qty = 0
+    defect, chemical = {}, {}
+    for event in ProductionEvent.objects.filter(sales_order=order).order_by('create_date', 'id'):
+        create_date = event.create_date.astimezone(pytz.timezone('Asia/Ho_Chi_Minh')).strftime('%Y-%m-%d %H:%M:%S')
+        if event.process == 'DryPlan':
+            process.append({**event.payload, 'process': 'DryPlan', 'create_date': create_date, 'machine': event.machine, 'plan_qty': event.qty, 'plan_date': event.payload['plan_date']})
+        elif event.process == 'DryMix':
+            for info in event.payload['mixing_information']:
+                if info.get('item', ''):
+                    chemical[info.get('item')] = str(info.get('quantity')) + info.get('unit')
+            process.append({'process': 'DryMix', 'chemical': chemical, 'machine': '', 'create_date': create_date})
+        elif event.process == 'DryLine':
+            sub_pd_qty = sub_pd_qty + event.qty
+            process.append({'process': 'DryLine', 'pd_qty': event.qty, 'machine': event.machine, 'create_date': create_date})
+        elif event.process == 'RP':
+            process.append({'process': 'RP', 'delami_qty': event.qty, 'create_date': create_date, 'machine': event.machine})
+        elif event.process == 'Inspection':
+            sub_pd_qty = 0
+            for info in event.payload['defect']:
+                defect[info.get('defectCause')] = info.get('quantity')
+            bal_qty = bal_qty - event.qty
+            process.append({
+                'process': 'Inspection', 'agrade_qty': event.qty, 'defect': defect, 'machine': event.machine,
+                'create_date': create_date, 'qty_to_printing': event.payload['qty_to_printing']
+            })
+        elif event.process == 'Printing':
+            process.append({'process': 'Printing', 'print_qty': event.qty, 'machine': event.machine, 'create_date': create_date})
+
+    process = sorted(process, key=lambda x: x['create_date'])
+    latest_process = latest_create_date = latest_machine = None
+    for proc in process:
+        if not latest_create_date or proc['create_date'] > latest_create_date:
+            latest_create_date, latest_process, latest_machine = proc['create_date'], proc['process'], proc['machine']
+
+    latest_inspection = next((proc for proc in reversed(process) if proc['process'] == 'Inspection'), None)
+    latest_printing = next((proc for proc in reversed(process) if proc['process'] == 'Printing'), None)
+    qty_to_printing = None
+    if latest_inspection and (not latest_printing or latest_inspection['create_date'] > latest_printing['create_date']):
+        qty_to_printing = latest_inspection['qty_to_printing']
+    return {
+        'bal_qty': bal_qty, 'line_shortage': sub_pd_qty - bal_qty, 'process': process, 'latest_process': latest_process,
+        'latest_create_date': latest_create_date, 'latest_machine': latest_machine, 'qty_to_printing': qty_to_printing
+    }
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class BatchStatusTests(TestCase):
+    def test_batch_matches_the_per_order_status(self):
+        orders = [make_order(seq_no, order_qty=100 * seq_no) for seq_no in range(1, 6)]
+        for order in orders:
+            make_plan(order)
+        start = timezone.now() + datetime.timedelta(minutes=1)
+        at = lambda minutes: start + datetime.timedelta(minutes=minutes)
+
+        # No production yet / mixed and produced / inspected twice / printed / inspected after printing
+        ingest_drymix(scan(orders[1], quantityInput=[{'item': 'BASE', 'unit': 'KG', 'quantity': '12'}]), create_date=at(1))
+        for order in orders[1:]:
+            ingest_dryline(dryline_payload(order, qty=150), create_date=at(2))
+        ingest_rp(scan(orders[2], machine='bsvrp01', quantityInput=140), create_date=at(3))
+        for order in orders[2:]:
+            ingest_inspection(inspection_payload(order, 120, 30), create_date=at(4))
+        DryLine.objects.update(pd_lot='0101-1A')
+        ingest_dryline(dryline_payload(orders[2], qty=60), create_date=at(5))
+        ingest_inspection(inspection_payload(orders[2], 50, 0), create_date=at(6))
+        for order in orders[3:]:
+            ingest_printing(scan(order, machine='bsvpr01', quantityInput=30), create_date=at(7))
+        ingest_inspection(inspection_payload(orders[4], 40, 10), create_date=at(8))
+
+        self.assertEqual(order_statuses(orders), [per_order_status(order) for order in orders])
+        # The persisted summaries agree as well
+        stored = [persisted_status(status) for status in OrderStatus.objects.filter(sales_order__in=orders).order_by('sales_order_id')]
+        self.assertEqual(stored, [{key: value for key, value in per_order_status(order).items() if key != 'process'} for order in orders])
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class OrderStatusTests(TestCase):
+    def setUp(self):
+        self.order = make_order(1)
+        make_plan(self.order)
+        self.start = timezone.now() + datetime.timedelta(minutes=1)
+
+    def at(self, minutes):
+        return self.start + datetime.timedelta(minutes=minutes)
+
+    def assertStatusMatchesTimeline(self):
+        order = SalesOrder.objects.get(id=self.order.id)
+        rebuilt = order_statuses([order], include_archive=True)[0]
+        del rebuilt['process']
+        self.assertEqual(persisted_status(OrderStatus.objects.get(sales_order=order)), rebuilt)
+
+    def test_status_follows_the_writes_without_a_rebuild(self):
+        ingest_dryline(dryline_payload(self.order, qty=100), create_date=self.at(1))
+        self.assertStatusMatchesTimeline()
+        # The unconfirmed roll is rewritten
+        ingest_dryline(dryline_payload(self.order, qty=120), create_date=self.at(2))
+        self.assertStatusMatchesTimeline()
+        ingest_inspection(inspection_payload(self.order, 80, 20), create_date=self.at(3))
+        self.assertStatusMatchesTimeline()
+
+        DryLine.objects.update(pd_lot='0101-1A')
+        ingest_dryline(dryline_payload(self.order, qty=50), create_date=self.at(4))
+        ingest_printing(scan(self.order, machine='bsvpr01', quantityInput=20), create_date=self.at(5))
+        self.assertStatusMatchesTimeline()
+        self.assertIsNone(OrderStatus.objects.get(sales_order=self.order).qty_to_printing)
+
+        # An inspection synced late by an offline kiosk lands before the printing
+        ingest_inspection(inspection_payload(self.order, 10, 5), create_date=self.at(3.5))
+        self.assertStatusMatchesTimeline()
+
+        Printing.objects.get().delete()
+        self.assertStatusMatchesTimeline()
+        self.assertEqual(OrderStatus.objects.get(sales_order=self.order).qty_to_printing, 5)
+
+        self.order.order_qty = 300
+        self.order.save()
+        self.assertStatusMatchesTimeline()
+        self.assertEqual(OrderStatus.objects.get(sales_order=self.order).bal_qty, 210)
+
+    def test_scan_does_not_read_the_timeline(self):
+        ingest_dryline(dryline_payload(self.order), create_date=self.at(1))
+        with CaptureQueriesContext(connection) as queries:
+            ingest_inspection(inspection_payload(self.order, 90, 10), create_date=self.at(2))
+        self.assertFalse([query for query in queries if 'data_monitoring_archivedphase' in query['sql']])
+        self.assertStatusMatchesTimeline()
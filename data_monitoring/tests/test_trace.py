@@ -0,0 +1,91 @@
+from django.test import TestCase, override_settings
+from data_monitoring.models import DryMix, DryLine, Delamination, Inspection, Printing, ProductionLot, TraceLink
+from data_monitoring.trace import plan_links, trace
+from .utils import LOCAL_CACHE, make_order, make_plan
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class TraceTests(TestCase):
+    def setUp(self):
+        self.order = make_order(1)
+        self.plan = make_plan(self.order)
+
+    def roll(self, lot=None, **fields):
+        return DryLine.objects.create(production_plan=self.plan, pd_qty=100, line_no='bsvdl01', pd_lot=lot, **fields)
+
+    def test_lot_rolls_share_the_registered_lot(self):
+        self.roll('0101-1A')
+        self.roll('0101-1B')
+        ProductionLot.objects.create(lot_no='0101-1', status='registered')
+
+        lots = {node['key']: node for node in trace('lot', '0101-1')['nodes'] if node['kind'] == 'lot'}
+        self.assertEqual(set(lots), {'0101-1', '0101-1A', '0101-1B'})
+        self.assertEqual({node['lot_no'] for node in lots.values()}, {'0101-1'})
+        self.assertTrue(all(node['registered'] for node in lots.values()))
+
+    def test_reserved_lot_is_not_registered(self):
+        self.roll('0101-2A')
+        ProductionLot.objects.create(lot_no='0101-2', status='reserved')
+
+        lot = next(node for node in trace('lot', '0101-2A')['nodes'] if node['kind'] == 'lot')
+        self.assertIsNone(lot['registered'])
+
+    def edges(self):
+        return sorted((link.parent_kind, link.parent_key, link.child_kind, link.child_key) for link in TraceLink.objects.all())
+
+    def rebuilt_edges(self):
+        return sorted((link.parent_kind, link.parent_key, link.child_kind, link.child_key) for link in plan_links([self.plan.id]))
+
+    def test_row_writes_keep_the_plan_links(self):
+        DryMix.objects.create(production_plan=self.plan, worker_code='W01', mixing_information=[])
+        first = self.roll('0101-3A')
+        second = self.roll()
+        Delamination.objects.create(production_plan=self.plan, dlami_qty=50, line_no='bsvdl01', dlami_lot='0101-4A')
+        inspection = Inspection.objects.create(production_plan=self.plan, ins_qty=90, line_no='bsvdl03', qty_to_printing=0)
+        Printing.objects.create(production_plan=self.plan, print_qty=90, line_no='bsvpr01')
+        self.assertEqual(self.edges(), self.rebuilt_edges())
+        self.assertIn(('lot', '0101-3A', 'inspection', str(inspection.id)), self.edges())
+
+        # A roll relabelled to another lot moves the lot -> inspection edges along
+        first.pd_lot = '0101-5A'
+        first.save()
+        second.pd_lot = '0101-5B'
+        second.save()
+        self.assertEqual(self.edges(), self.rebuilt_edges())
+        self.assertNotIn(('lot', '0101-3A', 'inspection', str(inspection.id)), self.edges())
+
+        first.delete()
+        inspection.delete()
+        self.assertEqual(self.edges(), self.rebuilt_edges())
+
+    def test_single_roll_write_does_not_rebuild_the_plan(self):
+        self.roll('0101-6A')
+        # Not an edge of any row of the plan: only a rebuild of the whole plan drops it
+        TraceLink.objects.create(production_plan=self.plan, parent_kind='mixbatch', parent_key='W01@old', child_kind='drymix', child_key='0')
+
+        roll = self.roll('0101-6B')
+        self.assertTrue(TraceLink.objects.filter(parent_key='W01@old').exists())
+        self.assertIn(('dryline', str(roll.id), 'lot', '0101-6B'), self.edges())
+
+    def test_lot_edges_change_one_by_one(self):
+        first = self.roll('0101-7A')
+        inspection = Inspection.objects.create(production_plan=self.plan, ins_qty=90, line_no='bsvdl03', qty_to_printing=0)
+        lot_edge = TraceLink.objects.get(parent_key='0101-7A', child_kind='inspection')
+
+        # Another lot links to the existing inspection, the edges of the first lot are left as they are
+        other = self.roll('0101-7B')
+        second = self.roll('0101-7A')
+        printing = Printing.objects.create(production_plan=self.plan, print_qty=90, line_no='bsvpr01')
+        self.assertEqual(self.edges(), self.rebuilt_edges())
+        self.assertIn(('lot', '0101-7B', 'inspection', str(inspection.id)), self.edges())
+        self.assertIn(('lot', '0101-7A', 'printing', str(printing.id)), self.edges())
+        self.assertTrue(TraceLink.objects.filter(id=lot_edge.id).exists())
+
+        # The lot edges go with the last roll carrying the lot
+        first.delete()
+        self.assertTrue(TraceLink.objects.filter(id=lot_edge.id).exists())
+        second.delete()
+        other.pd_lot = None
+        other.save()
+        self.assertEqual(self.edges(), self.rebuilt_edges())
+        self.assertFalse(TraceLink.objects.filter(parent_kind='lot').exists())
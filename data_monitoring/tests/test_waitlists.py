@@ -0,0 +1,54 @@
+import datetime
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from data_monitoring.kiosk import ingest_dryline, ingest_rp, ingest_inspection, ingest_printing
+from data_monitoring.models import DryLine, Delamination
+from data_monitoring.waitlists import inspection_waitlist_orders, printing_waitlist_events
+from .utils import LOCAL_CACHE, make_order, make_plan, dryline_payload
+
+def scan(*orders, **fields):
+    return {'scannedOrders': [{'order_number': order.order_no} for order in orders], **fields}
+
+def inspection_payload(*orders, to_printing=0):
+    return scan(*orders, machine='bsvin01', quantityInput=[{'Grade': 'A', 'quantity': '90'}, {'Grade': 'Printing', 'quantity': str(to_printing)}])
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class WaitlistTests(TestCase):
+    def setUp(self):
+        self.orders = [make_order(seq_no) for seq_no in range(1, 5)]
+        for order in self.orders:
+            make_plan(order)
+
+    def test_inspection_waitlist(self):
+        direct, rp_pending, rp_done, inspected = self.orders
+        ingest_dryline(dryline_payload(direct, inspected, machine='bsvdl03'))
+        ingest_dryline(dryline_payload(rp_pending, rp_done, machine='bsvdl01'))
+        ingest_rp(scan(rp_done, machine='bsvrp01', quantityInput=100))
+        ingest_inspection(inspection_payload(inspected))
+
+        self.assertEqual(set(inspection_waitlist_orders()), {direct, rp_done})
+        self.assertEqual(set(inspection_waitlist_orders(line='bsvdl01')), {rp_done})
+
+    def test_rp_is_checked_per_plan(self):
+        order = self.orders[0]
+        ingest_dryline(dryline_payload(order, machine='bsvdl01'))
+        # RP recorded for another plan of the same order does not release this roll
+        other_plan = make_plan(order, plan_date=datetime.date(2024, 1, 3))
+        Delamination.objects.create(production_plan=other_plan, dlami_qty=100, line_no='bsvrp01')
+        self.assertEqual(list(inspection_waitlist_orders()), [])
+
+        Delamination.objects.create(production_plan=DryLine.objects.get().production_plan, dlami_qty=100, line_no='bsvrp01')
+        self.assertEqual(list(inspection_waitlist_orders()), [order])
+
+    def test_printing_waitlist(self):
+        waiting, printed, reinspected, _ = self.orders
+        now = timezone.now()
+        earlier = now - datetime.timedelta(hours=2)
+        ingest_dryline(dryline_payload(waiting, printed, reinspected, machine='bsvdl03'), create_date=earlier)
+        ingest_inspection(inspection_payload(waiting, printed, reinspected, to_printing=20), create_date=earlier)
+        ingest_printing(scan(printed, machine='bsvpr01', quantityInput=20), create_date=now)
+        # The latest inspection sends nothing to printing
+        ingest_inspection(inspection_payload(reinspected), create_date=now)
+
+        self.assertEqual([event.sales_order for event in printing_waitlist_events()], [waiting])
@@ -0,0 +1,26 @@
+import datetime
+from production_management.models import SalesOrder, ProductionPlan
+
+LOCAL_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+def make_order(seq_no, **fields):
+    data = {
+        'order_id': 'SOV0000001', 'seq_no': seq_no, 'customer_name': 'CUSTOMER', 'order_type': 'NO',
+        'order_date': datetime.date(2024, 1, 1), 'rtd': datetime.date(2024, 1, 10), 'etd': datetime.date(2024, 1, 10),
+        'brand': 'BRAND', 'item_name': 'ITEM', 'color_code': 'COLOR', 'pattern': 'PATTERN', 'spec': '1.0',
+        'order_qty': 100, 'qty_unit': 'M', 'unit_price': 1.0, 'currency': 'USD', 'production_location': 'BSV',
+        'product_group': 'D', 'product_type': 'T',
+    }
+    data.update(fields)
+    return SalesOrder.objects.create(**data)
+
+def make_plan(sales_order, **fields):
+    data = {
+        'sales_order': sales_order, 'plan_date': datetime.date(2024, 1, 2), 'plan_qty': 100, 'pd_line': '1',
+        'item_group': 'Dry', 'pd_information': {'base': 'BASE', 'skin_resin': 'SKIN', 'binder_resin': 'BINDER'},
+    }
+    data.update(fields)
+    return ProductionPlan.objects.create(**data)
+
+def dryline_payload(*orders, qty=100, machine='bsvdl01'):
+    return {'scannedOrders': [{'order_number': order.order_no} for order in orders], 'quantityInput': qty, 'machine': machine}
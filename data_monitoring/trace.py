@@ -0,0 +1,277 @@
+from collections import defaultdict
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from production_management.models import SalesOrder, ProductionPlan
+from .models import DryMix, DryLine, Delamination, Inspection, Printing, ProductionLot, TraceLink
+
+# Lot genealogy. TraceLink stores the production graph as parent -> child edges following the material:
+#   mixbatch -> drymix -> plan -> order
+#   plan -> dryline / delamination roll -> lot -> inspection / printing
+#   plan -> inspection / printing
+# A trace walks the edges forward (what did this go into) or backward (where did this come from) with one
+# recursive CTE over the two edge indexes. A write replaces the edges of the rows it wrote and adds or drops
+# the lot -> inspection / printing edges they change; rebuild_trace_links rebuilds the edges of whole plans.
+# Nodes are (kind, key): key is the row id, the roll lot as written on the roll, or worker@time for a mix batch.
+
+TRACE_KINDS = ['mixbatch', 'drymix', 'plan', 'order', 'dryline', 'delamination', 'lot', 'inspection', 'printing']
+
+# A lot can hold rolls of several orders, so the inspections reached through it may belong to other orders:
+# the orders of a trace are those of the production it reached
+PRODUCTION_KINDS = ['order', 'plan', 'drymix', 'dryline', 'delamination']
+
+def mix_batch_key(drymix):
+    # The DryMix rows of one kiosk scan share the worker and the time: they are one batch
+    return f"{drymix.worker_code}@{drymix.create_date.isoformat()}"
+
+# Plan / phase row model -> node kind
+ROW_KINDS = {ProductionPlan: 'plan', DryMix: 'drymix', DryLine: 'dryline', Delamination: 'delamination', Inspection: 'inspection', Printing: 'printing'}
+ROLL_LOT_FIELDS = {DryLine: 'pd_lot', Delamination: 'dlami_lot'}
+
+def trace_link(plan_id, parent_kind, parent_key, child_kind, child_key):
+    return TraceLink(
+        production_plan_id=plan_id,
+        parent_kind=parent_kind, parent_key=str(parent_key),
+        child_kind=child_kind, child_key=str(child_key)
+    )
+
+def plan_links(plan_ids):
+    """The edges of the given plans, built with one query per table."""
+    links = []
+
+    def link(*edge):
+        links.append(trace_link(*edge))
+
+    for plan_id, sales_order_id in ProductionPlan.objects.filter(id__in=plan_ids).values_list('id', 'sales_order_id'):
+        link(plan_id, 'plan', plan_id, 'order', sales_order_id)
+
+    for drymix in DryMix.objects.filter(production_plan_id__in=plan_ids).only('id', 'production_plan_id', 'worker_code', 'create_date'):
+        link(drymix.production_plan_id, 'mixbatch', mix_batch_key(drymix), 'drymix', drymix.id)
+        link(drymix.production_plan_id, 'drymix', drymix.id, 'plan', drymix.production_plan_id)
+
+    plan_lots = defaultdict(set)
+    for kind, model, lot_field in (('dryline', DryLine, 'pd_lot'), ('delamination', Delamination, 'dlami_lot')):
+        for roll_id, plan_id, lot in model.objects.filter(production_plan_id__in=plan_ids).values_list('id', 'production_plan_id', lot_field):
+            link(plan_id, 'plan', plan_id, kind, roll_id)
+            if lot:
+                link(plan_id, kind, roll_id, 'lot', lot)
+                plan_lots[plan_id].add(lot)
+
+    # Inspections and printings check the rolls of their plan: they follow the plan and its lots
+    for kind, model in (('inspection', Inspection), ('printing', Printing)):
+        for row_id, plan_id in model.objects.filter(production_plan_id__in=plan_ids).values_list('id', 'production_plan_id'):
+            link(plan_id, 'plan', plan_id, kind, row_id)
+            for lot in plan_lots[plan_id]:
+                link(plan_id, 'lot', lot, kind, row_id)
+    return links
+
+def refresh_trace_links(plan_ids):
+    """Rebuild the edges of the given plans. Call it inside the transaction that changed their rows."""
+    plan_ids = {plan_id for plan_id in plan_ids if plan_id is not None}
+    if not plan_ids:
+        return []
+    TraceLink.objects.filter(production_plan_id__in=plan_ids).delete()
+    return TraceLink.objects.bulk_create(plan_links(plan_ids))
+
+def row_links(row):
+    """The edges a plan / phase row brings itself. The lot -> inspection / printing edges belong to its plan."""
+    kind = ROW_KINDS[type(row)]
+    if kind == 'plan':
+        return [trace_link(row.id, 'plan', row.id, 'order', row.sales_order_id)]
+    plan_id = row.production_plan_id
+    if plan_id is None:
+        return []
+    if kind == 'drymix':
+        return [trace_link(plan_id, 'mixbatch', mix_batch_key(row), 'drymix', row.id), trace_link(plan_id, 'drymix', row.id, 'plan', plan_id)]
+
+    links = [trace_link(plan_id, 'plan', plan_id, kind, row.id)]
+    lot = getattr(row, ROLL_LOT_FIELDS[type(row)]) if type(row) in ROLL_LOT_FIELDS else None
+    if lot:
+        links.append(trace_link(plan_id, kind, row.id, 'lot', lot))
+    return links
+
+def owned_links(rows):
+    """TraceLink filter of the edges brought by the given rows: the edges into them and out of them, but a plan only owns plan -> order."""
+    keys_by_kind = defaultdict(list)
+    for row in rows:
+        keys_by_kind[ROW_KINDS[type(row)]].append(str(row.id))
+
+    owned = Q()
+    for kind, keys in keys_by_kind.items():
+        if kind == 'plan':
+            owned |= Q(parent_kind='plan', parent_key__in=keys, child_kind='order')
+        else:
+            owned |= Q(child_kind=kind, child_key__in=keys) | Q(parent_kind=kind, parent_key__in=keys)
+    return owned
+
+def plan_lots(plan_ids):
+    """{plan id: lots of its current rolls}, one query per roll table."""
+    lots = defaultdict(set)
+    for model, lot_field in ROLL_LOT_FIELDS.items():
+        for plan_id, lot in model.objects.filter(production_plan_id__in=plan_ids).exclude(**{lot_field: None}).values_list('production_plan_id', lot_field).distinct():
+            if lot:
+                lots[plan_id].add(lot)
+    return lots
+
+def unlink_rows(rows):
+    """
+    Drop the edges of the given plan / phase rows. The lot -> inspection / printing edges of a lot the rolls
+    carried go too when no other roll of the plan carries it any more; the edges into the inspections and
+    printings are theirs. Call it inside the transaction that changed or deleted the rows.
+    """
+    rows = [row for row in rows if row.id is not None]
+    if not rows:
+        return
+
+    # The lots the rolls were linked to, read before their edges go (a relabelled roll already has its new lot)
+    roll_edges = Q()
+    for row in rows:
+        if type(row) in ROLL_LOT_FIELDS:
+            roll_edges |= Q(parent_kind=ROW_KINDS[type(row)], parent_key=str(row.id), child_kind='lot')
+    old_lots = set(TraceLink.objects.filter(roll_edges).values_list('production_plan_id', 'child_key')) if roll_edges else set()
+
+    TraceLink.objects.filter(owned_links(rows)).delete()
+
+    if old_lots:
+        carried = plan_lots({plan_id for plan_id, _ in old_lots})
+        dropped = Q()
+        for plan_id, lot in old_lots:
+            if lot not in carried[plan_id]:
+                dropped |= Q(production_plan_id=plan_id, parent_kind='lot', parent_key=lot)
+        if dropped:
+            TraceLink.objects.filter(dropped).delete()
+
+def lot_links(rows):
+    """
+    The lot -> inspection / printing edges the written rows add: a lot new to its plan links to the plan's
+    inspections and printings, a written inspection or printing links to the lots of its plan.
+    """
+    rolls = [row for row in rows if type(row) in ROLL_LOT_FIELDS and row.production_plan_id and getattr(row, ROLL_LOT_FIELDS[type(row)])]
+    checks = [row for row in rows if type(row) in (Inspection, Printing) and row.production_plan_id]
+    if not (rolls or checks):
+        return []
+
+    plan_ids = {row.production_plan_id for row in rolls + checks}
+    existing = set(TraceLink.objects.filter(production_plan_id__in=plan_ids, parent_kind='lot').values_list('production_plan_id', 'parent_key', 'child_kind', 'child_key'))
+    edges = {}
+
+    new_lots = defaultdict(set)
+    for roll in rolls:
+        new_lots[roll.production_plan_id].add(getattr(roll, ROLL_LOT_FIELDS[type(roll)]))
+    if new_lots:
+        for kind, model in (('inspection', Inspection), ('printing', Printing)):
+            for row_id, plan_id in model.objects.filter(production_plan_id__in=new_lots).values_list('id', 'production_plan_id'):
+                for lot in new_lots[plan_id]:
+                    edges[(plan_id, lot, kind, str(row_id))] = None
+
+    if checks:
+        lots = plan_lots({row.production_plan_id for row in checks})
+        for row in checks:
+            for lot in lots[row.production_plan_id]:
+                edges[(row.production_plan_id, lot, ROW_KINDS[type(row)], str(row.id))] = None
+
+    return [trace_link(plan_id, 'lot', lot, kind, key) for plan_id, lot, kind, key in edges if (plan_id, lot, kind, key) not in existing]
+
+def link_rows(rows):
+    """
+    Replace the edges of the given plan / phase rows, written one by one or in a batch, adding or dropping
+    only the lot edges they change, without rebuilding their plans. Call it inside the transaction that wrote the rows.
+    """
+    unlink_rows(rows)
+    rows = [row for row in rows if row.id is not None]
+    return TraceLink.objects.bulk_create([link for row in rows for link in row_links(row)] + lot_links(rows))
+
+def trace_seeds(kind, key):
+    """Start nodes of a trace; a lot number without grade also starts from its A and B rolls."""
+    if kind == 'mixbatch':
+        drymix = DryMix.objects.filter(id=key).only('worker_code', 'create_date').first() if str(key).isdigit() else None
+        return [('mixbatch', mix_batch_key(drymix) if drymix else key)]
+    if kind == 'lot' and key[-1:] not in ('A', 'B'):
+        return [('lot', key), ('lot', f'{key}A'), ('lot', f'{key}B')]
+    return [(kind, str(key))]
+
+def trace_nodes(seeds, direction, max_depth):
+    """
+    {(kind, key): depth} of the nodes reached from the seeds, seeds included (depth 0).
+    forward follows parent -> child, backward child -> parent.
+    """
+    source, target = ('parent', 'child') if direction == 'forward' else ('child', 'parent')
+    table = TraceLink._meta.db_table
+    seed_sql = ' UNION ALL '.join(['SELECT CAST(%s AS TEXT), CAST(%s AS TEXT), 0'] * len(seeds))
+    sql = f"""
+        WITH RECURSIVE trace(kind, node_key, depth) AS (
+            {seed_sql}
+            UNION
+            SELECT CAST(l.{target}_kind AS TEXT), CAST(l.{target}_key AS TEXT), t.depth + 1
+            FROM trace t
+            JOIN {table} l ON l.{source}_kind = t.kind AND l.{source}_key = t.node_key
+            WHERE t.depth < %s
+        )
+        SELECT kind, node_key, MIN(depth) FROM trace GROUP BY kind, node_key
+    """
+    params = [value for seed in seeds for value in seed] + [max_depth]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return {(kind, node_key): depth for kind, node_key, depth in cursor.fetchall()}
+
+# kind -> (model, columns) of the node details
+NODE_DETAILS = {
+    'order': (SalesOrder, ['order_no', 'customer_name', 'item_name', 'color_code', 'pattern', 'order_qty']),
+    'plan': (ProductionPlan, ['sales_order__order_no', 'plan_no', 'plan_date', 'pd_line', 'plan_qty']),
+    'drymix': (DryMix, ['sales_order__order_no', 'worker_code', 'mixing_information', 'create_date']),
+    'dryline': (DryLine, ['sales_order__order_no', 'line_no', 'pd_qty', 'pd_lot', 'ag_position', 'create_date']),
+    'delamination': (Delamination, ['sales_order__order_no', 'line_no', 'dlami_qty', 'dlami_lot', 'create_date']),
+    'inspection': (Inspection, ['sales_order__order_no', 'line_no', 'ins_qty', 'qty_to_printing', 'ins_information', 'create_date']),
+    'printing': (Printing, ['sales_order__order_no', 'line_no', 'print_qty', 'create_date']),
+}
+
+def node_details(nodes):
+    """Details of the reached nodes, one query per kind. Rows archived since the trace was linked have none."""
+    keys_by_kind = defaultdict(list)
+    for kind, key in nodes:
+        keys_by_kind[kind].append(key)
+
+    details = {}
+    for kind, keys in keys_by_kind.items():
+        if kind in NODE_DETAILS:
+            model, columns = NODE_DETAILS[kind]
+            for row in model.objects.filter(id__in=[int(key) for key in keys if key.isdigit()]).values('id', *columns):
+                row_id = row.pop('id')
+                if 'sales_order__order_no' in row:
+                    row['order_no'] = row.pop('sales_order__order_no')
+                details[(kind, str(row_id))] = row
+        elif kind == 'lot':
+            # The A and B rolls of a lot are separate nodes of the same lot number
+            base_lots = {key: key.rstrip('AB') for key in keys}
+            registered = dict(
+                ProductionLot.objects.filter(lot_no__in=set(base_lots.values()), status='registered').values_list('lot_no', 'create_date')
+            )
+            for key, base_lot in base_lots.items():
+                details[(kind, key)] = {'lot_no': base_lot, 'registered': registered.get(base_lot)}
+        elif kind == 'mixbatch':
+            for key in keys:
+                worker_code, _, create_date = key.partition('@')
+                details[(kind, key)] = {'worker_code': worker_code, 'create_date': create_date}
+    return details
+
+def trace(kind, key, direction='backward', max_depth=None):
+    """
+    Trace a node forward, backward or both ways. Returns the reached nodes with their depth and details,
+    and the order numbers of the production reached.
+    """
+    max_depth = max_depth or settings.TRACE_MAX_DEPTH
+    seeds = trace_seeds(kind, key)
+    directions = ['forward', 'backward'] if direction == 'both' else [direction]
+
+    reached = {}
+    for trace_direction in directions:
+        for node, depth in trace_nodes(seeds, trace_direction, max_depth).items():
+            reached[node] = min(depth, reached.get(node, depth))
+
+    details = node_details(reached)
+    nodes = [
+        {'kind': node_kind, 'key': node_key, 'depth': depth, **details.get((node_kind, node_key), {})}
+        for (node_kind, node_key), depth in sorted(reached.items(), key=lambda item: (item[1], TRACE_KINDS.index(item[0][0]), item[0][1]))
+    ]
+    orders = sorted({node['order_no'] for node in nodes if node['kind'] in PRODUCTION_KINDS and node.get('order_no')})
+    return {'nodes': nodes, 'orders': orders}
@@ -9,8 +9,13 @@ urlpatterns = [
     path('input_rp/', views.input_rp, name='input_rp'),
     path('input_inspection/', views.input_inspection, name='input_inspection'),
     path('input_printing/', views.input_printing, name='input_printing'),
+    path('kiosk_submission/<str:idempotency_key>/', views.kiosk_submission_status, name='kiosk_submission_status'),
+    path('kiosk_sync/', views.kiosk_sync, name='kiosk_sync'),
+    path('kiosk_reference/', views.kiosk_reference, name='kiosk_reference'),
 
     path('aging_room/', views.aging_room, name='aging_room'),
+    path('aging_occupancy/', views.aging_occupancy, name='aging_occupancy'),
+    path('aging_occupancy/api/', views.aging_occupancy_api, name='aging_occupancy_api'),
     path('create_lot_no/', views.create_lot_no, name='create_lot_no'),
     
     path('order_search/', views.order_search, name='order_search'),
@@ -21,5 +26,8 @@ urlpatterns = [
     path('inspection/', views.inspection, name='inspection'),
     path('inspection_waitlist/', views.inspection_waitlist, name='inspection_waitlist'),
     path('printing_waitlist/', views.printing_waitlist, name='printing_waitlist'),
+    path('export/<str:name>/', views.export_list, name='export_list'),
+    path('api/<str:name>/', views.api_list, name='api_list'),
+    path('trace/', views.trace_lot, name='trace_lot'),
     path('debug/export-counts/', views.debug_export_counts, name='debug_export_counts'),
 ]
\ No newline at end of file
@@ -1,24 +1,37 @@
 from django.shortcuts import render, get_object_or_404
 from django.views.decorators.csrf import csrf_exempt, csrf_protect
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.http import JsonResponse, Http404
 from django.utils import timezone
-from django.core.paginator import Paginator
 import json
-from collections import defaultdict
-from django.db.models import Q
-from .models import DryMix, DryLine, Delamination, Inspection, ProductionLot, Printing
+from django.db.models import Q, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from .models import DryMix, DryLine, Delamination, Inspection, Printing, KioskSubmission
 from production_management.models import SalesOrder, ProductionPlan
-from workforce_management.models import Worker
-from inventory_management.models import RawMaterial, Category
+from production_management.order_cache import get_order_summary
+from production_management.search import search_terms, search_sales_orders, search_filter
 from django.contrib.admin.views.decorators import staff_member_required
 
 
-from django.utils.dateparse import parse_date
+from django.utils.dateparse import parse_date, parse_datetime
 from itertools import chain
 import datetime
-import pytz
-from .tasks import order_convert_to_qrcard
+from .tasks import order_convert_to_qrcard, process_kiosk_submissions
+from .kiosk import ingest_drymix, ingest_dryline, ingest_rp, ingest_inspection, ingest_printing, validate_kiosk_payload, apply_kiosk_events
+from .kiosk import DEFECT_CAUSES, get_reference_data
+from .status import stored_order_statuses, order_histories
+from .waitlists import DRYLINE_LINES, WAITLIST_PAGE_SIZE, PRINTING_WAITLIST_PAGE_SIZE, inspection_waitlist_orders, printing_waitlist_events
+from .listing import keyset_page, list_page
+from .rolls import latest_roll, rolls_between, register_aging_position, release_aging_position, register_roll_lots
+from .aging import occupancy, position_rolls, position_code
+from .lots import LotReservationError, reserve_lot, release_lot
+from .exports import EXPORTS, export_response
+from .api import API_RESOURCES, APIError, api_login_required, api_page, api_validators, api_window
+from .trace import TRACE_KINDS, trace
+from django.views.decorators.http import condition, require_GET
+from django.views.decorators.gzip import gzip_page
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
 
 import logging
 logger = logging.getLogger('data_monitoring')
@@ -26,54 +39,167 @@ logger = logging.getLogger('data_monitoring')
 from django.core.cache import cache
 from django.conf import settings
 import hashlib
+import gzip
+
+def queue_kiosk_submission(request, phase, data):
+    """
+    Write-behind mode for kiosk POSTs that carry an idempotency key.
+    The payload is validated and queued, and the kiosk gets an answer without waiting for the phase writes.
+    Returns None when the request has no idempotency key and must be saved synchronously.
+    """
+    idempotency_key = data.get('idempotencyKey') or request.headers.get('Idempotency-Key')
+    if not idempotency_key:
+        return None
+
+    if not isinstance(idempotency_key, str) or len(idempotency_key) > 64:
+        return JsonResponse({"status": "fail", "message": "Idempotency key must be a string of at most 64 characters"}, status=400)
+    try:
+        validate_kiosk_payload(phase, data)
+    except (ValueError, TypeError) as e:
+        logger.info(f"[KIOSK] {phase.upper()} INVALID: {idempotency_key} {e}")
+        return JsonResponse({"status": "fail", "message": str(e)}, status=400)
+
+    # A retried request finds the submission of its first attempt and is not queued twice
+    submission, created = KioskSubmission.objects.get_or_create(
+        idempotency_key=idempotency_key,
+        defaults={'phase': phase, 'payload': data}
+    )
+    if created:
+        transaction.on_commit(lambda: start_kiosk_worker(submission))
+        logger.info(f"[KIOSK] {phase.upper()} QUEUED: {idempotency_key}")
+
+    return JsonResponse({
+        "status": submission.status,
+        "idempotencyKey": submission.idempotency_key,
+        "message": "Data queued" if created else "Data already received"
+    }, status=202)
+
+def start_kiosk_worker(submission):
+    try:
+        process_kiosk_submissions.delay()
+    except Exception as e:
+        # The submission stays pending and is picked up by the periodic drain (CELERY_BEAT_SCHEDULE)
+        logger.info(f"[KIOSK] WORKER NOT STARTED: {submission.idempotency_key} {e}")
+
+def kiosk_submission_status(request, idempotency_key):
+    try:
+        submission = KioskSubmission.objects.get(idempotency_key=idempotency_key)
+    except KioskSubmission.DoesNotExist:
+        return JsonResponse({"status": "fail", "message": "Submission not found"}, status=404)
+
+    return JsonResponse({
+        "status": submission.status,
+        "idempotencyKey": submission.idempotency_key,
+        "phase": submission.phase,
+        "savedCount": submission.saved_count,
+        "error": submission.error,
+        "createDate": submission.create_date,
+        "processedDate": submission.processed_date
+    })
+
+@csrf_exempt
+def kiosk_sync(request):
+    """
+    Upload of the scan events a kiosk recorded while it was offline, in one round trip.
+    Body (optionally gzip-compressed with Content-Encoding: gzip):
+        {"kioskId": "...", "events": [{"seq": 1, "phase": "dryline", "createDate": "...", "payload": {...}}, ...]}
+    """
+    if request.method != "POST":
+        return JsonResponse({"status": "fail", "message": "Only POST is possible"}, status=405)
+
+    try:
+        body = request.body
+        if request.headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        data = json.loads(body)
+        kiosk_id = str(data['kioskId'])
+        if not kiosk_id or len(kiosk_id) > KioskSubmission._meta.get_field('kiosk_id').max_length:
+            raise ValueError(f"Invalid kioskId: {kiosk_id[:40]}")
+        events = []
+        for event in data.get('events', []):
+            create_date = parse_datetime(event['createDate']) if event.get('createDate') else timezone.now()
+            if create_date is None:
+                raise ValueError(f"Invalid createDate: {event['createDate']}")
+            if timezone.is_naive(create_date):
+                create_date = timezone.make_aware(create_date)
+            events.append({
+                'seq': int(event['seq']),
+                'phase': event.get('phase'),
+                'payload': event.get('payload'),
+                'create_date': create_date
+            })
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        return JsonResponse({"status": "fail", "message": f"Invalid sync batch: {e}"}, status=400)
+
+    logger.info(f"[KIOSK] SYNC: {kiosk_id}, {len(events)} EVENTS")
+    result = apply_kiosk_events(kiosk_id, events)
+    logger.info(f"[KIOSK] SYNC SAVED: {kiosk_id}, APPLIED {len(result['applied'])}, SKIPPED {len(result['skipped'])}, FAILED {len(result['failed'])}")
+
+    return JsonResponse({
+        "status": "success",
+        "kioskId": kiosk_id,
+        "highWaterMark": result['high_water_mark'],
+        "applied": result['applied'],
+        "skipped": result['skipped'],
+        "failed": result['failed']
+    })
+
+def qr_order_response(qr_content, process):
+    """Resolve a scanned `!BSVPD!SOVxxxx!n!` QR code to the order summary shown on the kiosk."""
+    qr_parts = qr_content.split('!')
+    order_no = f"{qr_parts[2]}-{qr_parts[3]}" if len(qr_parts) > 3 else ''
+    logger.info(f"[KIOSK] {process} CONNECTED: {order_no}")
+
+    summary = get_order_summary(order_no) if order_no[:3] == "SOV" else None
+    if summary is None:
+        return JsonResponse({
+            'status': 'fail',
+            'message': 'Order not found'
+        })
+    return JsonResponse({
+        **summary,
+        'status': 'success',
+        'message': 'Order found'
+    })
+
+def reference_data_etag(request):
+    return get_reference_data()['version']
+
+@condition(etag_func=reference_data_etag)
+def kiosk_reference(request):
+    """
+    Versioned reference data for the kiosk pages (workers by department, categories -> materials, defect causes).
+    Served from the shared cache; kiosks sending If-None-Match get a 304 while the data is unchanged.
+    """
+    return JsonResponse(get_reference_data())
 
 @csrf_exempt
 def input_drymix(request):
     if request.method == "POST":
         # Get the necessary information from the POST data
         data = json.loads(request.body)
-        scanned_orders = data.get('scannedOrders', [])
-        quantity_data = data.get('quantityInput', [])
-        # machine_value = data.get('machine', '')  # The name of the kiosk machine        
-        worker_code = data.get('staffNumber', '')  # The employee number of the worker
         logger.info(f"[KIOSK] DRYMIX DATA: {data}")
-        # Save the DryMix result to the ProductionPhase model
-        for order in scanned_orders:
-            if order['order_number'][:3] == 'SOV':
-                try:
-                    sales_order = SalesOrder.objects.exclude(status=False).get(order_no=order['order_number'])
-                    production_plan = ProductionPlan.objects.filter(sales_order=sales_order).order_by('-create_date').first()
-                    # Create an instance of the ProductionPhase model
-                    production_phase = DryMix(
-                        production_plan = production_plan,
-                        mixing_information=quantity_data,
-                        worker_code=worker_code
-                    )
-                    production_phase.save()  # Save the instance
-                    logger.info(f"[KIOSK] DRYMIX SAVED: {order['order_number']}")
-                except SalesOrder.DoesNotExist:
-                    # If the order number does not exist, handle the error  
-                    logger.info(f"[KIOSK] DRYMIX ERROR: {order['order_number']}")
-            
+        response = queue_kiosk_submission(request, 'drymix', data)
+        if response is not None:
+            return response
+        # Save the DryMix result for all scanned orders in one batch
+        ingest_drymix(data)
 
         return JsonResponse({"status": "success", "message": "Data added successfully"})    
     
     qr_content = request.GET.get('qrContent')
 
-    # Get the list of staff in the DM department from the Worker model
-    dm_staff_list = list(Worker.objects.filter(department='DM').values('id', 'worker_code', 'name'))  # id and name
-
-    # Get the unique values of category from the RawMaterial model
-    categories = list(Category.objects.values_list('category_name', flat=True).distinct())
-    subitems = defaultdict(list)
-    for category in categories:
-        subitems[category] = list(RawMaterial.objects.filter(category__category_name=category).values_list('material_name', flat=True))
-
-    # Get the latest production record
-    latest_phase = DryMix.objects.select_related('production_plan').order_by('-create_date').first()
-
     # If the QR code content is empty, load the general page
     if not qr_content:
+        # Staff of the DM department and category -> materials come from the cached kiosk reference data
+        reference_data = get_reference_data()
+        dm_staff_list = reference_data['workers'].get('DM', [])
+        categories = list(reference_data['materials'].keys())
+        subitems = reference_data['materials']
+
+        # Get the latest production record
+        latest_phase = DryMix.objects.select_related('production_plan').order_by('-create_date').first()
+
         context = {
             'categories': json.dumps(categories),
             'subitems': json.dumps(subitems),
@@ -83,33 +209,7 @@ def input_drymix(request):
         return render(request, 'data_monitoring/input_drymix.html', context)
 
     # If the QR code content is not empty, search by order_number
-    try:
-        qr_content = f"{qr_content.split('!')[2]}-{qr_content.split('!')[3]}"
-        logger.info(f"[KIOSK] DRYMIX CONNECTED: {qr_content}")
-        if qr_content[:3] == "SOV":
-            order = SalesOrder.objects.exclude(status=False).get(order_no=qr_content)
-        #order = ProductionOrder.objects.filter(order_number=qr_content).latest('create_date')
-        data = {
-            'order_number': order.order_no,
-            'order_information': {
-                'item': order.item_name,
-                'pattern': order.pattern,
-                'color_code': order.color_code,
-                'customer': order.customer_name,
-                'order_qty': order.order_qty,
-                'order_type': order.order_type,
-                'brand': order.brand,
-                'qty_unit': order.qty_unit
-            },
-            'status': 'success',
-            'message': 'Order found'
-        }
-    except SalesOrder.DoesNotExist:
-        data = {
-            'status': 'fail',
-            'message': 'Order not found'
-        }
-    return JsonResponse(data)
+    return qr_order_response(qr_content, 'DRYMIX')
 
 @csrf_exempt
 def input_dryline(request):
@@ -118,44 +218,12 @@ def input_dryline(request):
     # When the production volume is entered
     if request.method == "POST":
         data = json.loads(request.body)
-        scanned_orders = data.get('scannedOrders', [])
-        quantity_data = data.get('quantityInput', [])
-        machine_value = data.get('machine', '')  # machine value 
-        
         logger.info(f"[KIOSK] DRYLINE DATA: {data}")
-        
-        # Save the DryLine result to the ProductionPhase model
-        for order in scanned_orders:
-            if order['order_number'][:3] == 'SOV':
-                try:
-                    sales_order = SalesOrder.objects.exclude(status=False).get(order_no=order['order_number'])
-                    production_plan = ProductionPlan.objects.filter(sales_order=sales_order).order_by('-create_date').first()
-                    
-                    # Find the most recent production history
-                    production_phase = DryLine.objects.filter(
-                            production_plan=production_plan
-                    ).order_by('-create_date').first()
-                    
-                    if production_phase is None or production_phase.pd_lot is not None or production_phase.ag_position is not None: # If the history is not found or the production roll is confirmed, add a new lot
-                        production_phase = DryLine.objects.create(
-                            production_plan=production_plan,
-                            pd_qty=quantity_data,
-                            line_no=machine_value,
-                            create_date=timezone.now()
-                        )
-                    elif production_phase is not None and (production_phase.pd_lot is None and production_phase.ag_position is None): # If the production history exists and the roll is not confirmed, update the existing lot
-                        production_phase = DryLine.objects.update_or_create(
-                            id=production_phase.id, # Update the most recent production lot
-                            production_plan=production_plan,
-                            defaults={
-                                'pd_qty' : quantity_data,
-                                'line_no' : machine_value,
-                                'create_date': timezone.now()
-                            }
-                        )                    
-                    logger.info(f"[KIOSK] DRYLINE SAVED: {order['order_number']}")
-                except SalesOrder.DoesNotExist:
-                    logger.info(f"[KIOSK] DRYLINE ERROR: {order['order_number']}")
+        response = queue_kiosk_submission(request, 'dryline', data)
+        if response is not None:
+            return response
+        # Save the DryLine result for all scanned orders in one batch
+        ingest_dryline(data)
 
         return JsonResponse({"status": "success", "message": "Data added successfully"})    
     
@@ -168,32 +236,7 @@ def input_dryline(request):
         return render(request, 'data_monitoring/input_dryline.html', context)
 
     # If the QR code content is not empty, search by order_number
-    try:
-        qr_content = f"{qr_content.split('!')[2]}-{qr_content.split('!')[3]}"
-        logger.info(f"[KIOSK] DRYLINE CONNECTED: {qr_content}")
-        if qr_content[:3] == "SOV":
-            order = SalesOrder.objects.exclude(status=False).get(order_no=qr_content)
-        data = {
-            'order_number': order.order_no,
-            'order_information': {
-                'item': order.item_name,
-                'pattern': order.pattern,
-                'color_code': order.color_code,
-                'customer': order.customer_name,
-                'order_qty': order.order_qty,
-                'order_type': order.order_type,
-                'brand': order.brand,
-                'qty_unit': order.qty_unit
-            },
-            'status': 'success',
-            'message': 'Order found'
-        }
-    except SalesOrder.DoesNotExist:
-        data = {
-            'status': 'fail',
-            'message': 'Order not found'
-        }
-    return JsonResponse(data)
+    return qr_order_response(qr_content, 'DRYLINE')
 
 @csrf_exempt
 def input_rp(request):
@@ -201,52 +244,12 @@ def input_rp(request):
     if request.method == "POST":
         # Get the necessary information from the POST data
         data = json.loads(request.body)
-        scanned_orders = data.get('scannedOrders', [])
-        quantity_data = data.get('quantityInput', [])
-        machine_value = data.get('machine', '')  # machine value
-
-        quantity_info = []
         logger.info(f"[KIOSK] RP DATA: {data}")
-        
-        # Save the RP result to the ProductionPhase model
-        for order in scanned_orders:
-            if order['order_number'][:3] == 'SOV':
-                try:
-                    production_order = SalesOrder.objects.exclude(status=False).get(order_no=order['order_number'])
-                    last_phase = DryLine.objects.filter(production_plan__sales_order=production_order).order_by('-create_date').first()
-                    
-                    if last_phase:
-                        last_phase_plan = last_phase.production_plan
-                    else:
-                        last_phase_plan = None
-                    
-                    # Find the most recent production history
-                    production_phase = Delamination.objects.filter(
-                            production_plan=last_phase_plan
-                    ).order_by('-create_date').first()
-                    
-                    if production_phase is None or production_phase.dlami_lot is not None: # If the history is not found or the production roll is confirmed, add a new lot
-                        production_phase = Delamination.objects.create(
-                            production_plan=last_phase_plan,
-                            dlami_qty=quantity_data,
-                            line_no=machine_value,
-                            create_date=timezone.now()
-                        )
-                    elif production_phase is not None and production_phase.dlami_lot is None: # If the production history exists and the roll is not confirmed, update the existing lot
-                        production_phase = Delamination.objects.update_or_create(
-                            id=production_phase.id, # Update the most recent production lot
-                            production_plan=last_phase_plan,
-                            defaults={
-                                'dlami_qty' : quantity_data,
-                                'line_no' : machine_value,
-                                'create_date': timezone.now()
-                            }
-                        )
-                    logger.info(f"[KIOSK] RP SAVED: {order['order_number']}")
-                except SalesOrder.DoesNotExist:
-                    # If the order number does not exist, handle the error
-                    logger.info(f"[KIOSK] RP ERROR: {order['order_number']}")
-                
+        response = queue_kiosk_submission(request, 'rp', data)
+        if response is not None:
+            return response
+        # Save the RP result for all scanned orders in one batch
+        ingest_rp(data)
 
         return JsonResponse({"status": "success", "message": "Data added successfully"})    
     
@@ -258,88 +261,19 @@ def input_rp(request):
         return render(request, 'data_monitoring/input_rp.html', context)
 
     # If the QR code content is not empty, search by order_number
-    try:
-        qr_content = f"{qr_content.split('!')[2]}-{qr_content.split('!')[3]}"
-        logger.info(f"[KIOSK] RP CONNECTED: {qr_content}")
-        if qr_content[:3] == "SOV":
-            order = SalesOrder.objects.exclude(status=False).get(order_no=qr_content)
-        data = {
-            'order_number': order.order_no,
-            'order_information': {
-                'item': order.item_name,
-                'pattern': order.pattern,
-                'color_code': order.color_code,
-                'customer': order.customer_name,
-                'order_qty': order.order_qty,
-                'order_type': order.order_type,
-                'brand': order.brand,
-                'qty_unit': order.qty_unit
-            },
-            'status': 'success',
-            'message': 'Order found'
-        }
-    except SalesOrder.DoesNotExist:
-        data = {
-            'status': 'fail',
-            'message': 'Order not found'
-        }
-    return JsonResponse(data)
+    return qr_order_response(qr_content, 'RP')
 
 @csrf_exempt
 def input_inspection(request):
     if request.method == "POST":
         # Get the necessary information from the POST data
         data = json.loads(request.body)
-        scanned_orders = data.get('scannedOrders', [])
-        quantity_data = data.get('quantityInput', [])
-        machine_value = data.get('machine', '')
-        
         logger.info(f"[KIOSK] INSPECTION DATA: {data}")
-        
-        # Khởi tạo các biến
-        a_qty = 0
-        qty_to_printing = 0
-        defect = []
-
-        # Xử lý dữ liệu đầu vào
-        for item in quantity_data:
-            if item.get('Grade') == 'A':
-                a_qty = int(item.get('quantity', 0))
-            elif item.get('Grade') == 'Printing':
-                qty_to_printing = int(item.get('quantity', 0))
-            elif item.get('defectCause'):  # Chỉ thêm vào defect nếu là lỗi
-                defect.append({
-                    'quantity': int(item.get('quantity', 0)),
-                    'defectCause': item.get('defectCause')
-                    # Do not save nextProcess into JSON anymore
-                })
-        
-        # Save inspection results to the ProductionPhase model
-        for order in scanned_orders:
-            if order['order_number'][:3] == 'SOV':
-                try:
-                    sales_order = SalesOrder.objects.exclude(status=False).get(order_no=order['order_number'])
-                    last_phase = DryLine.objects.filter(production_plan__sales_order=sales_order).order_by('-create_date').first()
-                    
-                    if last_phase:
-                        last_phase_plan = last_phase.production_plan
-                    else:
-                        last_phase_plan = None
-                    
-                    # Create an instance of the ProductionPhase model
-                    production_phase = Inspection(
-                        sales_order=sales_order,
-                        production_plan=last_phase_plan,
-                        ins_qty=a_qty,
-                        qty_to_printing=qty_to_printing,  # Sử dụng trường qty_to_printing mới
-                        line_no=machine_value,
-                        ins_information=defect,  # Luôn truyền vào mảng (rỗng hoặc có dữ liệu)
-                        create_date=timezone.now()
-                    )
-                    production_phase.save()
-                    logger.info(f"[KIOSK] INSPECTION SAVED: {order['order_number']}, A-GRADE: {a_qty}, TO PRINTING: {qty_to_printing}")
-                except SalesOrder.DoesNotExist:
-                    logger.info(f"[KIOSK] INSPECTION ERROR: {order['order_number']}")
+        response = queue_kiosk_submission(request, 'inspection', data)
+        if response is not None:
+            return response
+        # Save inspection results for all scanned orders in one batch
+        ingest_inspection(data)
 
         return JsonResponse({"status": "success", "message": "Data added successfully"})
     
@@ -347,24 +281,7 @@ def input_inspection(request):
 
     # Get the defect cause
     #defect_cause = Information.objects.filter(name='defect_cause').order_by('-modify_date').first()
-
-    defect_cause = {
-        "Shiny": "Bóng",
-        "Stain": "Loang Màu",
-        "Stock": "Stock",
-        "Folding": "Quấn Nhăn",
-        "Pinhole": "Lỗ Kim",
-        "RP Line": "R/P Xước",
-        "Shortage": "Số Lượng Thiếu",
-        "RP Overlap": "R/P Nhăn",
-        "Wrong Base": "Da Sai",
-        "Surface Line": "Xước",
-        "Air Expansion": "Phồng Hơi",
-        "Contamination": "Dơ",
-        "Color Mismatch": "Màu Sai",
-        "Fabric Overlap": "Da Nhăn",
-        "Base Transparency": "Đốm"
-    }
+    defect_cause = DEFECT_CAUSES
 
     # If the QR code content is empty, load the general page
     if not qr_content:
@@ -372,31 +289,7 @@ def input_inspection(request):
         return render(request, 'data_monitoring/input_inspection.html', context)
 
     # If the QR code content is not empty, search by order_number
-    try:
-        qr_content = f"{qr_content.split('!')[2]}-{qr_content.split('!')[3]}"
-        logger.info(f"[KIOSK] INSPECTION CONNECTED: {qr_content}")
-        order = SalesOrder.objects.exclude(status=False).get(order_no=qr_content)
-        data = {
-            'order_number': order.order_no,
-            'order_information': {
-                'item': order.item_name,
-                'pattern': order.pattern,
-                'color_code': order.color_code,
-                'customer': order.customer_name,
-                'order_qty': order.order_qty,
-                'order_type': order.order_type,
-                'brand': order.brand,
-                'qty_unit': order.qty_unit
-            },
-            'status': 'success',
-            'message': 'Order found'
-        }
-    except SalesOrder.DoesNotExist:
-        data = {
-            'status': 'fail',
-            'message': 'Order not found'
-        }
-    return JsonResponse(data)
+    return qr_order_response(qr_content, 'INSPECTION')
 
 @csrf_exempt
 def input_printing(request):
@@ -404,41 +297,12 @@ def input_printing(request):
     if request.method == "POST":
         # Lấy dữ liệu POST từ template mới
         data = json.loads(request.body)
-        scanned_orders = data.get('scannedOrders', [])
-        quantity_input = data.get('quantityInput', '')
-        machine = data.get('machine', '')
-        
-        logger.info(f"[KIOSK] PRINTING DATA: {scanned_orders}, QUANTITY: {quantity_input}, MACHINE: {machine}")
-        
+        logger.info(f"[KIOSK] PRINTING DATA: {data.get('scannedOrders', [])}, QUANTITY: {data.get('quantityInput', '')}, MACHINE: {data.get('machine', '')}")
+        response = queue_kiosk_submission(request, 'printing', data)
+        if response is not None:
+            return response
         # Lưu thông tin vào cơ sở dữ liệu
-        for qr_item in scanned_orders:
-            try:
-                order_number = qr_item['order_number']
-                
-                if order_number[:3] == 'SOV':
-                    sales_order = SalesOrder.objects.exclude(status=False).get(order_no=order_number)
-                    last_phase = DryLine.objects.filter(production_plan__sales_order=sales_order).order_by('-create_date').first()
-                    
-                    if last_phase:
-                        last_phase_plan = last_phase.production_plan
-                    else:
-                        last_phase_plan = None
-                    
-                    # Lưu dữ liệu vào model Printing với số lượng từ form nhập
-                    printing = Printing.objects.create(
-                        sales_order=sales_order,
-                        production_plan=last_phase_plan,
-                        print_qty=int(quantity_input),  # Sử dụng số lượng từ form nhập
-                        print_information=None,
-                        line_no=machine,
-                        create_date=timezone.now()
-                    )
-                    
-                    logger.info(f"[KIOSK] PRINTING SAVED: {order_number} - QTY: {quantity_input}")
-            except SalesOrder.DoesNotExist:
-                logger.info(f"[KIOSK] PRINTING ERROR: {order_number}")
-            except ValueError:
-                logger.info(f"[KIOSK] PRINTING QUANTITY ERROR: {quantity_input}")
+        ingest_printing(data)
 
         return JsonResponse({"status": "success", "message": "Data added successfully"})
     
@@ -451,32 +315,7 @@ def input_printing(request):
         return render(request, 'data_monitoring/input_printing.html', context)
 
     # Nếu có QR code, tìm thông tin đơn hàng
-    try:
-        qr_content = f"{qr_content.split('!')[2]}-{qr_content.split('!')[3]}"
-        logger.info(f"[KIOSK] PRINTING CONNECTED: {qr_content}")
-        if qr_content[:3] == "SOV":
-            order = SalesOrder.objects.exclude(status=False).get(order_no=qr_content)
-        data = {
-            'order_number': order.order_no,
-            'order_information': {
-                'item': order.item_name,
-                'pattern': order.pattern,
-                'color_code': order.color_code,
-                'customer': order.customer_name,
-                'order_qty': order.order_qty,
-                'order_type': order.order_type,
-                'brand': order.brand,
-                'qty_unit': order.qty_unit
-            },
-            'status': 'success',
-            'message': 'Order found'
-        }
-    except SalesOrder.DoesNotExist:
-        data = {
-            'status': 'fail',
-            'message': 'Order not found'
-        }
-    return JsonResponse(data)
+    return qr_order_response(qr_content, 'PRINTING')
 
 @login_required
 @csrf_protect
@@ -493,20 +332,11 @@ def aging_room(request):
 
             logger.info(f"[AGING ROOM] ORDER SEARCH: INSIDE {inside_order_no} / OUTSIDE {outside_order_no}")
 
-            inside_product = DryLine.objects.filter(Q(production_plan__sales_order__order_no=inside_order_no)).order_by('-create_date').first()
-            outside_product = DryLine.objects.filter(Q(production_plan__sales_order__order_no=outside_order_no)).order_by('-create_date').first()
+            inside_product = latest_roll(DryLine, inside_order_no)
+            outside_product = latest_roll(DryLine, outside_order_no)
 
-            if inside_product is not None and outside_product is not None:
-                if inside_product.line_no == outside_product.line_no:
-                    line = inside_product.line_no
-                    inside_product_time = inside_product.create_date
-                    outside_product_time = outside_product.create_date
-                    initial_list = DryLine.objects.filter(Q(create_date__gte=inside_product_time) & Q(create_date__lte=outside_product_time))
-
-                    # Perform additional filtering in Python
-                    filtered_list = [item for item in initial_list if item.line_no == line]
-                else:
-                    filtered_list = None
+            if inside_product is not None and outside_product is not None and inside_product.line_no == outside_product.line_no:
+                filtered_list = rolls_between(DryLine, inside_product, outside_product).select_related('sales_order', 'production_plan').defer('pd_information')
             else:
                 filtered_list = None
 
@@ -523,24 +353,29 @@ def aging_room(request):
             inside_order_no = request.POST.get('inside_order_number')
             outside_order_no = request.POST.get('outside_order_number')
 
-            inside_product = DryLine.objects.filter(Q(production_plan__sales_order__order_no=inside_order_no)).order_by('-create_date').first()
-            outside_product = DryLine.objects.filter(Q(production_plan__sales_order__order_no=outside_order_no)).order_by('-create_date').first()
+            inside_product = latest_roll(DryLine, inside_order_no)
+            outside_product = latest_roll(DryLine, outside_order_no)
+
+            if inside_product is not None and outside_product is not None:
+                # Entries of the whole range, the occupancy of the positions is refreshed with them
+                count = register_aging_position(inside_product, outside_product, formatted_aging_position)
+                logger.info(f"[AGING ROOM] SAVED: {formatted_aging_position} / {count} ROLLS")
+
+            context = {
+                'inside_order_number': inside_order_no,
+                'outside_order_number': outside_order_no
+            }
 
-            line = inside_product.line_no
-            inside_product_time = inside_product.create_date
-            outside_product_time = outside_product.create_date
-            initial_list = DryLine.objects.filter(Q(create_date__gte=inside_product_time) & Q(create_date__lte=outside_product_time))
+        elif action == 'exit':
+            inside_order_no = request.POST.get('inside_order_number')
+            outside_order_no = request.POST.get('outside_order_number')
 
-            # Perform additional filtering in Python
-            filtered_list = [item for item in initial_list if item.line_no == line]
+            inside_product = latest_roll(DryLine, inside_order_no)
+            outside_product = latest_roll(DryLine, outside_order_no)
 
-            # Add aging_position and input_time to each item in filtered_list
-            for item in filtered_list:
-                # Get the current phase_information list
-                item.ag_position = formatted_aging_position
-                
-                # Save the modified item to the database
-                item.save()
+            if inside_product is not None and outside_product is not None:
+                count = release_aging_position(inside_product, outside_product)
+                logger.info(f"[AGING ROOM] EXIT: {count} ROLLS")
 
             context = {
                 'inside_order_number': inside_order_no,
@@ -549,6 +384,53 @@ def aging_room(request):
         
     return render(request, 'data_monitoring/aging_room.html', context)
 
+@login_required
+def aging_occupancy(request):
+    """Occupied aging room positions with their dwell time, and the rolls of the selected position."""
+    position = request.GET.get('position', '')
+    context = {
+        'positions': occupancy(),
+        'position': position_code(position),
+        'rolls': position_rolls(position) if position else None,
+        'now': timezone.now()
+    }
+    return render(request, 'data_monitoring/aging_occupancy.html', context)
+
+@login_required
+@require_GET
+def aging_occupancy_api(request):
+    """Occupancy of the aging room positions as JSON; ?position=B3 adds the rolls in that position."""
+    now = timezone.now()
+    data = {
+        'positions': [
+            {
+                'position': position.code,
+                'roll_count': position.roll_count,
+                'pd_qty': position.pd_qty,
+                'first_entry_date': position.first_entry_date,
+                'last_entry_date': position.last_entry_date,
+                'max_dwell_hours': position.max_dwell_hours,
+                'min_dwell_hours': position.min_dwell_hours,
+            }
+            for position in occupancy(now)
+        ]
+    }
+    position = request.GET.get('position', '')
+    if position:
+        data['rolls'] = [
+            {
+                'dryline': movement.dryline_id,
+                'order_no': movement.dryline.sales_order.order_no if movement.dryline.sales_order else None,
+                'line_no': movement.dryline.line_no,
+                'pd_qty': movement.dryline.pd_qty,
+                'pd_lot': movement.dryline.pd_lot,
+                'entry_date': movement.entry_date,
+                'dwell_hours': round((now - movement.entry_date).total_seconds() / 3600, 1),
+            }
+            for movement in position_rolls(position)
+        ]
+    return JsonResponse(data, encoder=DjangoJSONEncoder)
+
 @login_required
 @csrf_protect
 def create_lot_no(request):
@@ -559,110 +441,85 @@ def create_lot_no(request):
 		action = request.POST.get('action')
 		
 		if action == 'search':
-			lot_no = ProductionLot.generate_lot()
+			# A new search drops the lot reserved by the previous one
+			if request.POST.get('roll_lot') and request.POST.get('lot_reservation'):
+				release_lot(request.POST['roll_lot'], request.POST['lot_reservation'])
+
 			inside_order_no = "SOV0" + request.POST.get('inside_order_number')
 			outside_order_no = "SOV0" + request.POST.get('outside_order_number')
 
 			logger.info(f"[ROLL LOT] ORDER SEARCH: INSIDE {inside_order_no} / OUTSIDE {outside_order_no}")
 			
-			inside_product_list = list(chain(
-				DryLine.objects.filter(production_plan__sales_order__order_no=inside_order_no),
-				Delamination.objects.filter(production_plan__sales_order__order_no=inside_order_no)
-			))
-			inside_product = sorted(inside_product_list, key=lambda x: x.create_date, reverse=True)[0] if inside_product_list else None
-
-			outside_product_list = list(chain(
-				DryLine.objects.filter(production_plan__sales_order__order_no=outside_order_no),
-				Delamination.objects.filter(production_plan__sales_order__order_no=outside_order_no)
-			))
-			outside_product = sorted(outside_product_list, key=lambda x: x.create_date, reverse=True)[0] if outside_product_list else None
+			# The newest roll of the inside order tells whether the lot is for DryLine or RP rolls
+			inside_rolls = [roll for roll in (latest_roll(DryLine, inside_order_no), latest_roll(Delamination, inside_order_no)) if roll]
+			inside_product = max(inside_rolls, key=lambda roll: roll.create_date) if inside_rolls else None
 			
 			if inside_product and inside_product.line_no[:5] == 'bsvdl':
-				inside_product = DryLine.objects.filter(Q(production_plan__sales_order__order_no=inside_order_no)).order_by('-create_date').first()
-				outside_product = DryLine.objects.filter(Q(production_plan__sales_order__order_no=outside_order_no)).order_by('-create_date').first()
+				inside_product = latest_roll(DryLine, inside_order_no)
+				outside_product = latest_roll(DryLine, outside_order_no)
 				dept = 'DryLine'
 			elif inside_product and inside_product.line_no[:5] == 'bsvrp':
-				inside_product = Delamination.objects.filter(Q(production_plan__sales_order__order_no=inside_order_no)).order_by('-create_date').first()
-				outside_product = Delamination.objects.filter(Q(production_plan__sales_order__order_no=outside_order_no)).order_by('-create_date').first()
+				inside_product = latest_roll(Delamination, inside_order_no)
+				outside_product = latest_roll(Delamination, outside_order_no)
 				dept = "RP"
 			else:
+				outside_product = None
 				dept = ""
 
-			if inside_product is not None and outside_product is not None:
-				if inside_product.line_no == outside_product.line_no:
-					line = inside_product.line_no
-					inside_product_time = inside_product.create_date
-					outside_product_time = outside_product.create_date
-
-					if dept == 'DryLine':
-						initial_list = DryLine.objects.filter(Q(create_date__gte=inside_product_time) & Q(create_date__lte=outside_product_time))
-					elif dept == 'RP':
-						initial_list = Delamination.objects.filter(Q(create_date__gte=inside_product_time) & Q(create_date__lte=outside_product_time))
-
-					# Perform additional filtering in Python
-					filtered_list = [item for item in initial_list if item.line_no == line]
-				else:
-					filtered_list = None
+			if inside_product is not None and outside_product is not None and inside_product.line_no == outside_product.line_no:
+				model = DryLine if dept == 'DryLine' else Delamination
+				filtered_list = rolls_between(model, inside_product, outside_product).select_related('sales_order', 'production_plan').defer(
+					'pd_information' if dept == 'DryLine' else 'dlami_information'
+				)
 			else:
 				filtered_list = None
 
+			# The lot number is reserved only when there are rolls to register
+			lot = reserve_lot() if filtered_list else None
+
 			context = {
 				'list': filtered_list,
 				'dept':dept,
 				'inside_order_number': inside_order_no,
 				'outside_order_number': outside_order_no,
-				'roll_lot':lot_no
+				'roll_lot': lot.lot_no if lot else '',
+				'lot_reservation': lot.reservation_key if lot else ''
 			}
 
 		elif action == 'register':
 			lot_no = request.POST.get('roll_lot')
+			lot_reservation = request.POST.get('lot_reservation', '')
 			dept = request.POST.get('dept')
 			inside_order_no = request.POST.get('inside_order_number')
 			outside_order_no = request.POST.get('outside_order_number')
 
-			if dept == 'DryLine':
-				inside_product = DryLine.objects.filter(Q(production_plan__sales_order__order_no=inside_order_no)).order_by('-create_date').first()
-				outside_product = DryLine.objects.filter(Q(production_plan__sales_order__order_no=outside_order_no)).order_by('-create_date').first()
-			elif dept == 'RP':
-				inside_product = Delamination.objects.filter(Q(production_plan__sales_order__order_no=inside_order_no)).order_by('-create_date').first()
-				outside_product = Delamination.objects.filter(Q(production_plan__sales_order__order_no=outside_order_no)).order_by('-create_date').first()
-
-			line = inside_product.line_no
-			inside_product_time = inside_product.create_date
-			outside_product_time = outside_product.create_date
-			if dept == 'DryLine':
-				initial_list = DryLine.objects.filter(Q(create_date__gte=inside_product_time) & Q(create_date__lte=outside_product_time))
-			elif dept == 'RP':
-				initial_list = Delamination.objects.filter(Q(create_date__gte=inside_product_time) & Q(create_date__lte=outside_product_time))
-
-			# Perform additional filtering in Python
-			filtered_list = [item for item in initial_list if item.line_no == line]
-			
+			model = DryLine if dept == 'DryLine' else Delamination if dept == 'RP' else None
+			inside_product = latest_roll(model, inside_order_no) if model else None
+			outside_product = latest_roll(model, outside_order_no) if model else None
+
 			# Process the radio button value based on the ID of each data in 'list'
 			selected_values = {}
 			for data in request.POST:
 				if data.startswith('selection_'):
 					data_id = int(data.split('_')[1])
 					selected_values[data_id] = request.POST[data]
-			
-			# Add roll_lot and input_time to each item in filtered_list
-			for item in filtered_list:
-				# Get the current phase_information list
-				if dept == 'DryLine':
-					item.pd_lot = lot_no + selected_values[item.id]
-				elif dept == 'RP':
-					item.dlami_lot = lot_no + selected_values[item.id]
-				
-				# Save the modified item to the database
-				item.save()
-            
-			ProductionLot.objects.create(lot_no=lot_no)
-			
-			logger.info(f"[ROLL LOT] SAVED: {lot_no}")
+
+			error = None
+			if inside_product is not None and outside_product is not None:
+				try:
+					# One bulk_update of the lot column for the whole range
+					rolls = register_roll_lots(model, inside_product, outside_product, lot_no, lot_reservation, selected_values)
+					logger.info(f"[ROLL LOT] SAVED: {lot_no} / {len(rolls)} ROLLS")
+				except LotReservationError as e:
+					logger.info(f"[ROLL LOT] ERROR: {e}")
+					error = str(e)
+			else:
+				release_lot(lot_no, lot_reservation)
 
 			context = {
 				'inside_order_number': inside_order_no,
-				'outside_order_number': outside_order_no
+				'outside_order_number': outside_order_no,
+				'error': error
 			}
 		
 	return render(request, 'data_monitoring/create_lot_no.html', context)
@@ -672,6 +529,7 @@ def order_search(request):
     order_and_status = []
     count = 0
     order_numbers = []
+    include_archive = request.GET.get('include_archive') == '1'
     if request.method == 'POST':
         # Check if request.body is empty
         if not request.body:
@@ -700,173 +558,25 @@ def order_search(request):
         order_number = order_number.replace('	', '')
         
         order_numbers = request.POST.get('order_numbers', '')
+        include_archive = include_archive or request.POST.get('include_archive') == '1'
         
         if order_numbers:
             order_numbers = order_numbers.split(',')
             order_list = SalesOrder.objects.exclude(status=False).filter(order_no__in=order_numbers)
         else:
-            order_list = SalesOrder.objects.exclude(status=False).filter(order_no__icontains=order_number)
+            order_list = search_sales_orders({'order_no': order_number}, SalesOrder.objects.exclude(status=False))
     
-        status = []
-       
-        # Search for the production history of each Order Number
-        for order in order_list:
-            process = []
-            
-            # Search in multiple models for sales_order
-            production_phases = sorted(chain(
-                ProductionPlan.objects.filter(sales_order=order),
-                DryMix.objects.filter(production_plan__sales_order=order),
-                DryLine.objects.filter(production_plan__sales_order=order),
-                Delamination.objects.filter(production_plan__sales_order=order),
-                Inspection.objects.filter(Q(production_plan__sales_order=order) | Q(sales_order=order)),
-                Printing.objects.filter(Q(production_plan__sales_order=order) | Q(sales_order=order))
-            ), key=lambda x: x.create_date)
-            
-            bal_qty = int(order.order_qty)
-            
-            agrade_qty, delami_qty, pd_qty = 0, 0, 0
-            sub_pd_qty = 0
-            defect, chemical = {}, {}
-            
-            # Find the latest process name and create_date in the process list
-            latest_process = latest_create_date = latest_machine = None
-
-            if production_phases:
-                for production_phase in production_phases:
-                    create_date = production_phase.create_date.astimezone(pytz.timezone('Asia/Ho_Chi_Minh')).strftime('%Y-%m-%d %H:%M:%S')
-                    
-                    if isinstance(production_phase, ProductionPlan):
-                        phase_info = production_phase.pd_information
-                        if production_phase.item_group == 'Dry':
-                            
-                            phase_info.update({
-                                'process':'DryPlan',
-                                'create_date': create_date,
-                                'machine':production_phase.pd_line,
-                                'plan_qty':production_phase.plan_qty,
-                                'plan_date': production_phase.plan_date.strftime('%Y-%m-%d'),
-                                })
-                            process.append(phase_info)
-                    
-                    elif isinstance(production_phase, DryMix):
-                        phase_info = production_phase.mixing_information
-
-                        for info in phase_info: # Check the information of phase_information in json format
-                            if info.get('item', ''):
-                                chemical[info.get('item')] = str(info.get('quantity')) + info.get('unit')
-                        
-                        process.append({
-                            'process': 'DryMix',
-                            'chemical':chemical,
-                            'machine': '',
-                            'create_date':create_date
-                        })
-                    
-                    elif isinstance(production_phase, DryLine):
-                        phase_info = production_phase.pd_information
-
-                        sub_pd_qty = sub_pd_qty + production_phase.pd_qty
-
-                        process.append({
-                            'process': 'DryLine',
-                            'pd_qty': production_phase.pd_qty,
-                            'machine': production_phase.line_no,
-                            'create_date': create_date
-                        })
-                    
-                    elif isinstance(production_phase, Delamination):
-                        phase_info = production_phase.dlami_information
-
-                        process.append({
-                            'process' : 'RP',
-                            'delami_qty': production_phase.dlami_qty,
-                            'create_date': create_date,
-                            'machine': production_phase.line_no
-                        })
-                    
-                    elif isinstance(production_phase, Inspection):
-                        phase_info = production_phase.ins_information
-                        
-                        sub_pd_qty = 0
-                       
-                        for info in phase_info:
-                            defect[info.get('defectCause')] = info.get('quantity')
-                        
-                        agrade_qty = production_phase.ins_qty
-                        bal_qty = bal_qty - agrade_qty
-                        
-                        # Lưu số lượng chuyển qua Printing nếu có
-                        if production_phase.qty_to_printing:
-                            qty_to_printing = production_phase.qty_to_printing
-                        
-                        process.append({
-                            'process' : 'Inspection',
-                            'agrade_qty': agrade_qty,
-                            'defect': defect,
-                            'machine': production_phase.line_no,
-                            'create_date': create_date,
-                            'qty_to_printing': production_phase.qty_to_printing
-                        })
-
-                    elif isinstance(production_phase, Printing):
-                        phase_info = production_phase.print_information
-                        process.append({
-                            'process': 'Printing',
-                            'print_qty': production_phase.print_qty,
-                            'machine': production_phase.line_no,
-                            'create_date': create_date
-                        })
-
-            # Sort the process list based on create_date
-            process = sorted(process, key=lambda x: x['create_date'])
-
-            # Find the latest process name and create_date in the process list
-            for proc in process:
-                if not latest_create_date or proc['create_date'] > latest_create_date:
-                    latest_create_date = proc['create_date']
-                    latest_process = proc['process']
-                    latest_machine = proc['machine']
-            
-            # Kiểm tra xem có bản ghi Printing nào sau bản ghi Inspection cuối cùng không
-            latest_inspection = None
-            latest_printing = None
-            for proc in reversed(process):
-                if proc['process'] == 'Inspection' and not latest_inspection:
-                    latest_inspection = proc
-                elif proc['process'] == 'Printing' and not latest_printing:
-                    latest_printing = proc
-                if latest_inspection and latest_printing:
-                    break
-
-            # Khởi tạo status với cấu trúc đúng
-            status_data = {
-                'bal_qty': bal_qty,
-                'line_shortage': sub_pd_qty - bal_qty,
-                'process': process,
-                'latest_process': latest_process,
-                'latest_create_date': latest_create_date,
-                'latest_machine': latest_machine,
-                'qty_to_printing': None  # Mặc định là None
-            }
-
-            # Chỉ set qty_to_printing nếu bản ghi Inspection cuối cùng không có bản ghi Printing sau nó
-            if latest_inspection:
-                inspection_date = latest_inspection.get('create_date')
-                printing_date = latest_printing.get('create_date') if latest_printing else None
-                
-                # Nếu không có bản ghi Printing hoặc Inspection mới hơn Printing
-                if not printing_date or (inspection_date and inspection_date > printing_date):
-                    status_data['qty_to_printing'] = latest_inspection.get('qty_to_printing')
-
-            status.append(status_data)
+        order_list = list(order_list)
+        # The history lists archived phase rows of shipped orders only when asked
+        status = order_histories(order_list, include_archive=include_archive)
         
-        order_and_status = zip(order_list, status)
+        order_and_status = list(zip(order_list, status))
         count = len(order_list)
 
     context = {
         'order_and_status': order_and_status,
-        'count': count
+        'count': count,
+        'include_archive': include_archive
     }
     return render(request, 'data_monitoring/order_search.html', context)
 
@@ -887,32 +597,13 @@ def dryplan(request):
 
         else:
             # Receive the POST request to search for OrderNo
-            order_no = request.POST.get('order_no', '')  # Get the OrderNo input from the form
-            item = request.POST.get('item', '')  # Get the Item input
-            color_code = request.POST.get('color_code', '')
-            pattern = request.POST.get('pattern', '')
+            terms = search_terms(request.POST)
             start_date_str = request.POST.get('start_date', '')
             end_date_str = request.POST.get('end_date', '')
-            customer = request.POST.get('customer', '')
-            order_type = request.POST.get('order_type', '')
-
-            # Combine OrderNo and Item to search for data
-            query = Q(item_group="Dry")
-            if order_no:
-                query &= Q(sales_order__order_no__icontains=order_no)
-            if item:
-                query &= Q(sales_order__item_name__icontains=item)
-            if color_code:
-                query &= Q(sales_order__color_code__icontains=color_code)
-            if pattern:
-                query &= Q(sales_order__pattern__icontains=pattern)
-            
-            if customer:
-                query &= Q(sales_order__customer_name__icontains=customer)
-            
-            if order_type:
-                query &= Q(sales_order__order_type__icontains=order_type)
-            
+
+            # Free-text fields go through the order search index
+            query = Q(item_group="Dry") & search_filter(terms, 'sales_order')
+
             if start_date_str and end_date_str:
                 start_date = parse_date(start_date_str)
                 end_date = parse_date(end_date_str)
@@ -928,7 +619,10 @@ def dryplan(request):
             item_group="Dry", create_date__range=(_3daysago, now)
         ).select_related('sales_order').order_by('-create_date')
 
-    context = {'list': list,
+    page = list_page(request, list, defer=['pd_information'], export='dryplan')
+
+    context = {'list': page['rows'],
+               'page': page,
                'today': today,  # Add today's date to the context
                '30daysago':_30daysago
                }
@@ -947,35 +641,16 @@ def drymix(request):
         order_numbers = request.POST.get('order_numbers', '')
         if order_numbers:
             order_numbers = order_numbers.split(',')
-            list = DryMix.objects.filter(Q(production_plan__sales_order__order_no__in=order_numbers)).select_related('production_plan__sales_order').order_by('-create_date')
+            list = DryMix.objects.filter(Q(sales_order__order_no__in=order_numbers)).select_related('sales_order').order_by('-create_date')
         else:
             # Receive the POST request to search for OrderNo
-            order_no = request.POST.get('order_no', '')  # Get the OrderNo input from the form
-            item = request.POST.get('item', '')  # Get the Item input
-            color_code = request.POST.get('color_code', '')
-            pattern = request.POST.get('pattern', '')
+            terms = search_terms(request.POST)
             start_date_str = request.POST.get('start_date', '')
             end_date_str = request.POST.get('end_date', '')
-            customer = request.POST.get('customer', '')
-            order_type = request.POST.get('order_type', '')
-
-            # Combine OrderNo and Item to search for data
-            query = Q()
-            if order_no:
-                query &= Q(production_plan__sales_order__order_no__icontains=order_no)
-            if item:
-                query &= Q(production_plan__sales_order__item_name__icontains=item)
-            if color_code:
-                query &= Q(production_plan__sales_order__color_code__icontains=color_code)
-            if pattern:
-                query &= Q(production_plan__sales_order__pattern__icontains=pattern)
-            
-            if customer:
-                query &= Q(production_plan__sales_order__customer_name__icontains=customer)
-            
-            if order_type:
-                query &= Q(production_plan__sales_order__order_type__icontains=order_type)
-            
+
+            # Free-text fields go through the order search index
+            query = search_filter(terms, 'sales_order')
+
             if start_date_str and end_date_str:
                 start_date = parse_date(start_date_str)
                 end_date = parse_date(end_date_str)
@@ -984,14 +659,17 @@ def drymix(request):
                     end_of_day = datetime.datetime.combine(end_date, datetime.time.max)
                     query &= Q(create_date__range=(start_of_day, end_of_day))
 
-            list = DryMix.objects.filter(query).select_related('production_plan__sales_order').order_by('-create_date')
+            list = DryMix.objects.filter(query).select_related('sales_order').order_by('-create_date')
     else:
         # In the case of GET request, display the DryLine data for the past 14 days
         list = DryMix.objects.filter(
             create_date__range=(_3daysago, now)
-        ).select_related('production_plan__sales_order').order_by('-create_date')
+        ).select_related('sales_order').order_by('-create_date')
+
+    page = list_page(request, list, defer=['mixing_information'], export='drymix')
 
-    context = {'list': list,
+    context = {'list': page['rows'],
+               'page': page,
                'today': today,  # Add today's date to the context
                '30daysago':_30daysago
                }
@@ -1020,34 +698,17 @@ def dryline(request):
         if order_numbers:
             order_numbers = order_numbers.split(',')
             list = DryLine.objects.filter(
-                Q(production_plan__sales_order__order_no__in=order_numbers)
-            ).select_related('production_plan__sales_order').order_by('-create_date')
+                Q(sales_order__order_no__in=order_numbers)
+            ).select_related('sales_order', 'production_plan').order_by('-create_date')
         else:
             # Receive the POST request to search for OrderNo
-            order_no = request.POST.get('order_no', '')  # Get the OrderNo input from the form
-            item = request.POST.get('item', '')  # Get the Item input
-            color_code = request.POST.get('color_code', '')
-            pattern = request.POST.get('pattern', '')
+            terms = search_terms(request.POST)
             start_date_str = request.POST.get('start_date', '')
             end_date_str = request.POST.get('end_date', '')
-            customer = request.POST.get('customer', '')
-            order_type = request.POST.get('order_type', '')
-
-            # Combine OrderNo and Item to search for data
-            query = Q()
-            if order_no:
-                query &= Q(production_plan__sales_order__order_no__icontains=order_no)
-            if item:
-                query &= Q(production_plan__sales_order__item_name__icontains=item)
-            if color_code:
-                query &= Q(production_plan__sales_order__color_code__icontains=color_code)
-            if pattern:
-                query &= Q(production_plan__sales_order__pattern__icontains=pattern)
-            if customer:
-                query &= Q(production_plan__sales_order__customer_name__icontains=customer)
-            if order_type:
-                query &= Q(production_plan__sales_order__order_type__icontains=order_type)
-            
+
+            # Free-text fields go through the order search index
+            query = search_filter(terms, 'sales_order')
+
             if start_date_str and end_date_str:
                 try:
                     start_date = parse_date(start_date_str)
@@ -1060,15 +721,18 @@ def dryline(request):
                 except ValueError:
                     pass  # Xử lý khi parse date thất bại
 
-            list = DryLine.objects.filter(query).select_related('production_plan__sales_order').order_by('-create_date')
+            list = DryLine.objects.filter(query).select_related('sales_order', 'production_plan').order_by('-create_date')
     else:
         # In the case of GET request, display the DryLine data for the past 3 days
         list = DryLine.objects.filter(
             create_date__range=(_3daysago, today_end)
-        ).select_related('production_plan__sales_order').order_by('-create_date')
+        ).select_related('sales_order', 'production_plan').order_by('-create_date')
+
+    page = list_page(request, list, defer=['pd_information'], export='dryline')
 
     context = {
-        'list': list,
+        'list': page['rows'],
+        'page': page,
         'today': now.date(),
         '30daysago': _30daysago.date()
     }
@@ -1087,35 +751,16 @@ def delamination(request):
         order_numbers = request.POST.get('order_numbers', '')
         if order_numbers:
             order_numbers = order_numbers.split(',')
-            list = Delamination.objects.filter(Q(production_plan__sales_order__order_no__in=order_numbers)).select_related('production_plan__sales_order').order_by('-create_date')
+            list = Delamination.objects.filter(Q(sales_order__order_no__in=order_numbers)).select_related('sales_order').order_by('-create_date')
         else:
             # Receive the POST request to search for OrderNo
-            order_no = request.POST.get('order_no', '')  # Get the OrderNo input from the form
-            item = request.POST.get('item', '')  # Get the Item input
-            color_code = request.POST.get('color_code', '')
-            pattern = request.POST.get('pattern', '')
+            terms = search_terms(request.POST)
             start_date_str = request.POST.get('start_date', '')
             end_date_str = request.POST.get('end_date', '')
-            customer = request.POST.get('customer', '')
-            order_type = request.POST.get('order_type', '')
-
-            # Combine OrderNo and Item to search for data
-            query = Q()
-            if order_no:
-                query &= Q(production_plan__sales_order__order_no__icontains=order_no)
-            if item:
-                query &= Q(production_plan__sales_order__item_name__icontains=item)
-            if color_code:
-                query &= Q(production_plan__sales_order__color_code__icontains=color_code)
-            if pattern:
-                query &= Q(production_plan__sales_order__pattern__icontains=pattern)
-            
-            if customer:
-                query &= Q(production_plan__sales_order__customer_name__icontains=customer)
-            
-            if order_type:
-                query &= Q(production_plan__sales_order__order_type__icontains=order_type)
-            
+
+            # Free-text fields go through the order search index
+            query = search_filter(terms, 'sales_order')
+
             if start_date_str and end_date_str:
                 start_date = parse_date(start_date_str)
                 end_date = parse_date(end_date_str)
@@ -1124,14 +769,17 @@ def delamination(request):
                     end_of_day = datetime.datetime.combine(end_date, datetime.time.max)
                     query &= Q(create_date__range=(start_of_day, end_of_day))
 
-            list = Delamination.objects.filter(query).select_related('production_plan__sales_order').order_by('-create_date')
+            list = Delamination.objects.filter(query).select_related('sales_order').order_by('-create_date')
     else:
         # In the case of GET request, display the DryLine data for the past 14 days
         list = Delamination.objects.filter(
             create_date__range=(_7daysago, now)
-        ).select_related('production_plan__sales_order').order_by('-create_date')
+        ).select_related('sales_order').order_by('-create_date')
+
+    page = list_page(request, list, defer=['dlami_information'], export='delamination')
 
-    context = {'list': list,
+    context = {'list': page['rows'],
+               'page': page,
                'today': today,  # Add today's date to the context
                '30daysago':_30daysago
                }
@@ -1150,35 +798,16 @@ def inspection(request):
         order_numbers = request.POST.get('order_numbers', '')
         if order_numbers:
             order_numbers = order_numbers.split(',')
-            list = Inspection.objects.filter(Q(production_plan__sales_order__order_no__in=order_numbers)).select_related('production_plan__sales_order').order_by('-create_date')
+            list = Inspection.objects.filter(Q(sales_order__order_no__in=order_numbers)).select_related('sales_order').order_by('-create_date')
         else:
             # Receive the POST request to search for OrderNo
-            order_no = request.POST.get('order_no', '')  # Get the OrderNo input from the form
-            item = request.POST.get('item', '')  # Get the Item input
-            color_code = request.POST.get('color_code', '')
-            pattern = request.POST.get('pattern', '')
+            terms = search_terms(request.POST)
             start_date_str = request.POST.get('start_date', '')
             end_date_str = request.POST.get('end_date', '')
-            customer = request.POST.get('customer', '')
-            order_type = request.POST.get('order_type', '')
-
-            # Combine OrderNo and Item to search for data
-            query = Q()
-            if order_no:
-                query &= Q(production_plan__sales_order__order_no__icontains=order_no)
-            if item:
-                query &= Q(production_plan__sales_order__item_name__icontains=item)
-            if color_code:
-                query &= Q(production_plan__sales_order__color_code__icontains=color_code)
-            if pattern:
-                query &= Q(production_plan__sales_order__pattern__icontains=pattern)
-            
-            if customer:
-                query &= Q(production_plan__sales_order__customer_name__icontains=customer)
-            
-            if order_type:
-                query &= Q(production_plan__sales_order__order_type__icontains=order_type)
-            
+
+            # Free-text fields go through the order search index
+            query = search_filter(terms, 'sales_order')
+
             if start_date_str and end_date_str:
                 start_date = parse_date(start_date_str)
                 end_date = parse_date(end_date_str)
@@ -1187,56 +816,109 @@ def inspection(request):
                     end_of_day = datetime.datetime.combine(end_date, datetime.time.max)
                     query &= Q(create_date__range=(start_of_day, end_of_day))
 
-            list = Inspection.objects.filter(query).select_related('production_plan__sales_order').order_by('-create_date')
+            list = Inspection.objects.filter(query).select_related('sales_order').order_by('-create_date')
     else:
         # In the case of GET request, display the DryLine data for the past 3 days
         list = Inspection.objects.filter(
             create_date__range=(_3daysago, now)
-        ).select_related('production_plan__sales_order').order_by('-create_date')
-    
-    # Calculate the sum of quantity for the DryLine phase
-    list_and_quantity = []
+        ).select_related('sales_order').order_by('-create_date')
     
-    for inspection in list:
-        sales_order = inspection.sales_order
-        production_plan = inspection.production_plan
-        
-        # Search for the entire production history for the corresponding plan_id
-        phases = Inspection.objects.filter(
-            production_plan__sales_order=sales_order,
-            production_plan=production_plan
-        ).order_by('create_date')
-
-        # Sum the quantity values
-        dryline_phases = DryLine.objects.filter(
-            production_plan=production_plan
-        ).order_by('create_date').first()
-
-        if dryline_phases:
-            quantity = dryline_phases.pd_qty
-        else:
-            quantity = 0                   
+    # Produced quantity of the plan = pd_qty of its first DryLine roll, read in the same query
+    first_pd_qty = DryLine.objects.filter(
+        production_plan=OuterRef('production_plan')
+    ).order_by('create_date', 'id').values('pd_qty')[:1]
+    list = list.annotate(quantity=Coalesce(Subquery(first_pd_qty), 0))
 
-        # Save the list and quantity values together
-        list_and_quantity.append((inspection, quantity))
+    page = list_page(request, list, export='inspection')
+
+    # Save the list and quantity values together
+    list_and_quantity = [(inspection, inspection.quantity) for inspection in page['rows']]
 
     context = {'list': list_and_quantity,
+               'page': page,
                'today': today,  # Add today's date to the context
                '30daysago':_30daysago
                }
     return render(request, 'data_monitoring/inspection.html', context)
 
 
+@login_required
+def export_list(request, name):
+    # ?format=xlsx for Excel, CSV otherwise; the other parameters are those of the list search
+    if name not in EXPORTS:
+        raise Http404
+    return export_response(name, request.GET, request.GET.get('format', 'csv'))
+
+def api_etag(request, name):
+    return api_validators(request, name)[0]
+
+def api_last_modified(request, name):
+    return api_validators(request, name)[1]
+
+@api_login_required
+@require_GET
+@gzip_page
+@condition(etag_func=api_etag, last_modified_func=api_last_modified)
+def api_list(request, name):
+    """
+    Read-only JSON rows of a phase table, newest first.
+    Filters: order_numbers, the search fields, start_date / end_date, line (and item_group for productionplan).
+    Without order_numbers the dates default to the last API_DEFAULT_DAYS days; the window is returned as `window`.
+    fields=a,b,... selects the columns, cursor / page_size page the rows.
+    """
+    if name not in API_RESOURCES:
+        return JsonResponse({"status": "fail", "message": "Unknown resource"}, status=404)
+    try:
+        rows, next_cursor = api_page(name, request.GET)
+    except APIError as e:
+        return JsonResponse({"status": "fail", "message": str(e)}, status=400)
+
+    next_url = None
+    if next_cursor:
+        params = request.GET.copy()
+        params['cursor'] = next_cursor
+        next_url = f"{request.path}?{params.urlencode()}"
+
+    window = api_window(name, request.GET)
+    return JsonResponse({
+        'results': rows,
+        'count': len(rows),
+        'window': window and {'start_date': window[0], 'end_date': window[1]},
+        'next_cursor': next_cursor,
+        'next': next_url,
+    }, encoder=DjangoJSONEncoder)
+
+@login_required
+@require_GET
+def trace_lot(request):
+    """
+    Lot genealogy of a node as JSON: kind (lot, mixbatch, drymix, plan, order, dryline, delamination, inspection,
+    printing) and key (lot number, or the row id; a DryMix id for mixbatch), direction forward / backward / both.
+    e.g. kind=mixbatch&direction=forward: the orders that used a mix batch,
+    kind=inspection&direction=backward: the lots, rolls and mix batches an inspection came from.
+    """
+    kind = request.GET.get('kind', '')
+    key = request.GET.get('key', '').strip()
+    direction = request.GET.get('direction', 'backward')
+    depth = request.GET.get('depth', '')
+    if kind not in TRACE_KINDS or not key or direction not in ('forward', 'backward', 'both'):
+        return JsonResponse({"status": "fail", "message": "kind, key and direction (forward, backward, both) are required"}, status=400)
+    max_depth = min(int(depth), settings.TRACE_MAX_DEPTH) if depth.isdigit() and int(depth) > 0 else None
+
+    result = trace(kind, key, direction, max_depth)
+    logger.info(f"[TRACE] {kind}:{key} {direction}: {len(result['nodes'])} nodes")
+    return JsonResponse({'kind': kind, 'key': key, 'direction': direction, **result}, encoder=DjangoJSONEncoder)
+
 @staff_member_required
 def debug_export_counts(request):
     # Get the orders from DryLine with line_no 'bsvdl03', 'bsvdl04'
     direct_orders = DryLine.objects.filter(
         line_no__in=['bsvdl03', 'bsvdl04']
-    ).values_list('production_plan__sales_order', flat=True).distinct()
+    ).values_list('sales_order', flat=True).distinct()
     direct_count = len(direct_orders)
     
     # Get the orders from Delamination
-    delamination_orders = Delamination.objects.values_list('production_plan__sales_order', flat=True).distinct()
+    delamination_orders = Delamination.objects.values_list('sales_order', flat=True).distinct()
     delamination_count = len(delamination_orders)
     
     # Combine the two lists above
@@ -1261,388 +943,56 @@ def debug_export_counts(request):
 
 @login_required
 def inspection_waitlist(request):
-    page = request.GET.get('page', '1')
-    
-    # Create cache key based on parameters
-    cache_params = f"export_page_{page}"
-    cache_key = f"order_export:{hashlib.md5(cache_params.encode()).hexdigest()}"
-    
-    # Check if there is data in the cache
-    cached_data = cache.get(cache_key)
-    if cached_data:
-        return render(request, 'data_monitoring/inspection_waitlist.html', cached_data)
-    
-    # Use efficient raw query
-    raw_query = """
-    WITH dryline_plans AS (
-        SELECT dl.production_plan_id, dl.line_no
-        FROM data_monitoring_dryline dl
-        WHERE dl.create_date >= '2025-01-01'
-    ),
-    delamination_plans AS (
-        SELECT d.production_plan_id
-        FROM data_monitoring_delamination d
-    ),
-    inspected_orders AS (
-        SELECT i.sales_order_id
-        FROM data_monitoring_inspection i
-    ),
-    plans_with_order AS (
-        SELECT p.id AS production_plan_id, p.sales_order_id
-        FROM production_management_productionplan p
-    )
-    SELECT DISTINCT s.id, s.etd
-    FROM production_management_salesorder s
-    JOIN plans_with_order pwo ON pwo.sales_order_id = s.id
-    JOIN dryline_plans dl ON dl.production_plan_id = pwo.production_plan_id
-    LEFT JOIN delamination_plans d ON d.production_plan_id = pwo.production_plan_id
-    LEFT JOIN inspected_orders i ON i.sales_order_id = s.id
-    WHERE (
-        (
-            dl.line_no IN ('bsvdl01', 'bsvdl02') 
-            AND d.production_plan_id IS NOT NULL
-        )
-        OR (
-            dl.line_no IN ('bsvdl03', 'bsvdl04')
-        )
-    )
-    AND i.sales_order_id IS NULL
-    LIMIT 5000;
-    """
-    
-    # Cache the list of IDs
-    all_order_ids_cache_key = "export_all_order_ids"
-    all_order_ids = cache.get(all_order_ids_cache_key)
-    
-    if not all_order_ids:
-        from django.db import connection
-        with connection.cursor() as cursor:
-            cursor.execute(raw_query)
-            all_order_ids = [row[0] for row in cursor.fetchall()]
-        
-        cache.set(all_order_ids_cache_key, all_order_ids, 300)
-    
-    # Pagination - reduce the number of items per page to avoid heavy data
-    paginator = Paginator(all_order_ids, 20)
-    page_obj = paginator.get_page(page)
-    current_page_ids = page_obj.object_list
-    
-    # Get order information
-    current_orders = list(SalesOrder.objects.filter(id__in=current_page_ids).order_by('-etd'))
-    
-    # Sort orders by id
-    id_to_order = {order.id: order for order in current_orders}
-    current_orders = [id_to_order[id] for id in current_page_ids if id in id_to_order]
-    
-    # Process status
-    status = []
-    
-    for order in current_orders:
-        # Cache key for order status
-        order_status_key = f"order_status:{order.id}"
-        order_status = cache.get(order_status_key)
-        
-        if not order_status:
-            # Calculate status if not in cache
-            process = []
-            
-            # Find production phases
-            production_phases = sorted(chain(
-                ProductionPlan.objects.filter(sales_order=order),
-                DryMix.objects.filter(production_plan__sales_order=order),
-                DryLine.objects.filter(production_plan__sales_order=order),
-                Delamination.objects.filter(production_plan__sales_order=order),
-                Inspection.objects.filter(Q(production_plan__sales_order=order) | Q(sales_order=order)),
-                Printing.objects.filter(Q(production_plan__sales_order=order) | Q(sales_order=order))
-            ), key=lambda x: x.create_date)
-            
-            bal_qty = int(order.order_qty)
-            agrade_qty, delami_qty, pd_qty = 0, 0, 0
-            sub_pd_qty = 0
-            defect, chemical = {}, {}
-            
-            # Khởi tạo status_data với giá trị mặc định
-            status_data = {
-                'bal_qty': bal_qty,
-                'line_shortage': 0,
-                'process': [],
-                'latest_process': None,
-                'latest_create_date': None,
-                'latest_machine': None,
-                'qty_to_printing': None
-            }
-            
-            # Find the latest process name and create_date in the process list
-            latest_process = latest_create_date = latest_machine = None
-
-            if production_phases:
-                for production_phase in production_phases:
-                    create_date = production_phase.create_date.astimezone(pytz.timezone('Asia/Ho_Chi_Minh')).strftime('%Y-%m-%d %H:%M:%S')
-                    
-                    if isinstance(production_phase, ProductionPlan):
-                        phase_info = production_phase.pd_information
-                        if production_phase.item_group == 'Dry':
-                            phase_info = {
-                                'process': 'DryPlan',
-                                'create_date': create_date,
-                                'machine': production_phase.pd_line,
-                                'plan_qty': production_phase.plan_qty,
-                                'plan_date': production_phase.plan_date.strftime('%Y-%m-%d')
-                            }
-                            process.append(phase_info)
-                    
-                    elif isinstance(production_phase, DryMix):
-                        phase_info = production_phase.mixing_information
-                        for info in phase_info:
-                            if info.get('item', ''):
-                                chemical[info.get('item')] = str(info.get('quantity')) + info.get('unit')
-                        process.append({
-                            'process': 'DryMix',
-                            'chemical': chemical,
-                            'machine': '',
-                            'create_date': create_date
-                        })
-                    
-                    elif isinstance(production_phase, DryLine):
-                        phase_info = production_phase.pd_information
-                        sub_pd_qty = sub_pd_qty + production_phase.pd_qty
-                        process.append({
-                            'process': 'DryLine',
-                            'pd_qty': production_phase.pd_qty,
-                            'machine': production_phase.line_no,
-                            'create_date': create_date
-                        })
-                    
-                    elif isinstance(production_phase, Delamination):
-                        phase_info = production_phase.dlami_information
-                        process.append({
-                            'process': 'RP',
-                            'delami_qty': production_phase.dlami_qty,
-                            'create_date': create_date,
-                            'machine': production_phase.line_no
-                        })
-                    
-                    elif isinstance(production_phase, Inspection):
-                        phase_info = production_phase.ins_information
-                        sub_pd_qty = 0
-                        for info in phase_info:
-                            defect[info.get('defectCause')] = info.get('quantity')
-                        agrade_qty = production_phase.ins_qty
-                        bal_qty = bal_qty - agrade_qty
-                        
-                        process.append({
-                            'process': 'Inspection',
-                            'agrade_qty': agrade_qty,
-                            'defect': defect,
-                            'machine': production_phase.line_no,
-                            'create_date': create_date,
-                            'qty_to_printing': production_phase.qty_to_printing
-                        })
-
-                    elif isinstance(production_phase, Printing):
-                        phase_info = production_phase.print_information
-                        process.append({
-                            'process': 'Printing',
-                            'print_qty': production_phase.print_qty,
-                            'machine': production_phase.line_no,
-                            'create_date': create_date
-                        })
-                
-                # Sort by time
-                process = sorted(process, key=lambda x: x['create_date'])
-                
-                # Find the latest phase
-                for proc in process:
-                    if not latest_create_date or proc['create_date'] > latest_create_date:
-                        latest_create_date = proc['create_date']
-                        latest_process = proc['process']
-                        latest_machine = proc['machine']
-            
-            # Khởi tạo status với cấu trúc đúng
-            status_data = {
-                'bal_qty': bal_qty,
-                'line_shortage': sub_pd_qty - bal_qty,
-                'process': process,
-                'latest_process': latest_process,
-                'latest_create_date': latest_create_date,
-                'latest_machine': latest_machine
-            }
+    line = request.GET.get('line', '')
+    if line not in DRYLINE_LINES:
+        line = ''
+    customer = request.GET.get('customer', '').strip()
+    etd_from = parse_date(request.GET.get('etd_from', ''))
+    etd_to = parse_date(request.GET.get('etd_to', ''))
+    cursor = request.GET.get('cursor', '')
+    include_archive = request.GET.get('include_archive') == '1'
+
+    orders = inspection_waitlist_orders(line=line, customer=customer, etd_from=etd_from, etd_to=etd_to)
+    current_orders, next_cursor = keyset_page(orders, 'etd', cursor, WAITLIST_PAGE_SIZE)
+
+    # The total is only informative, count it once per filter every few minutes
+    filters = {'line': line, 'customer': customer, 'etd_from': etd_from, 'etd_to': etd_to}
+    count_key = f"inspection_waitlist_count:{hashlib.md5(repr(sorted(filters.items())).encode()).hexdigest()}"
+    total_orders = cache.get_or_set(count_key, orders.count, 300)
+
+    order_and_status = list(zip(current_orders, order_histories(current_orders, include_archive=include_archive)))
 
-            cache.set(order_status_key, status_data, 3600)  # cache 1 hour
-        else:
-            status_data = order_status
-        
-        # Ensure to add order_status to the list
-        status.append(status_data)
-    
-    # Create a list of combined order and status
-    order_and_status = list(zip(current_orders, status))
-    
-    # Sort order_and_status by latest_create_date (descending - newest at the top)
-    order_and_status = sorted(
-        order_and_status, 
-        key=lambda x: x[1].get('latest_create_date') or '1900-01-01 00:00:00',
-        reverse=True
-    )
-    
     context = {
         'order_and_status': order_and_status,
-        'page_obj': page_obj,
-        'total_pages': paginator.num_pages,
-        'total_orders': len(all_order_ids)
+        'next_cursor': next_cursor,
+        'cursor': cursor,
+        'filters': filters,
+        'include_archive': include_archive,
+        'lines': DRYLINE_LINES,
+        'total_orders': total_orders
     }
-    
-    # Cache the result
-    cache.set(cache_key, context, 300)
-    
     return render(request, 'data_monitoring/inspection_waitlist.html', context)
 
 @login_required
 def printing_waitlist(request):
     today = datetime.date.today()
-    now = datetime.datetime.now()
-    _3daysago = now+datetime.timedelta(days=-3)
     _30daysago = today - datetime.timedelta(days=30)
-    order_and_status = []
-    count = 0
-
-    # Lấy tất cả các đơn hàng có Inspection gần nhất với qty_to_printing > 0
-    inspections = Inspection.objects.filter(
-        qty_to_printing__gt=0
-    ).select_related('production_plan__sales_order', 'sales_order').order_by('-create_date')
+    cursor = request.GET.get('cursor', '')
 
-    # Lọc ra các đơn hàng chưa có bản ghi Printing sau bản ghi Inspection cuối cùng
-    for inspection in inspections:
-        sales_order = inspection.sales_order or inspection.production_plan.sales_order
-        
-        # Kiểm tra xem có bản ghi Printing nào sau bản ghi Inspection này không
-        latest_printing = Printing.objects.filter(
-            Q(production_plan__sales_order=sales_order) | Q(sales_order=sales_order),
-            create_date__gt=inspection.create_date
-        ).exists()
-        
-        if not latest_printing:
-            process = []
-            
-            # Search in multiple models for sales_order
-            production_phases = sorted(chain(
-                ProductionPlan.objects.filter(sales_order=sales_order),
-                DryMix.objects.filter(production_plan__sales_order=sales_order),
-                DryLine.objects.filter(production_plan__sales_order=sales_order),
-                Delamination.objects.filter(production_plan__sales_order=sales_order),
-                Inspection.objects.filter(Q(production_plan__sales_order=sales_order) | Q(sales_order=sales_order)),
-                Printing.objects.filter(Q(production_plan__sales_order=sales_order) | Q(sales_order=sales_order))
-            ), key=lambda x: x.create_date)
-            
-            bal_qty = int(sales_order.order_qty)
-            
-            agrade_qty, delami_qty, pd_qty = 0, 0, 0
-            sub_pd_qty = 0
-            defect, chemical = {}, {}
-            
-            # Find the latest process name and create_date in the process list
-            latest_process = latest_create_date = latest_machine = None
-
-            if production_phases:
-                for production_phase in production_phases:
-                    create_date = production_phase.create_date.astimezone(pytz.timezone('Asia/Ho_Chi_Minh')).strftime('%Y-%m-%d %H:%M:%S')
-                    
-                    if isinstance(production_phase, ProductionPlan):
-                        phase_info = production_phase.pd_information
-                        if production_phase.item_group == 'Dry':
-                            phase_info = {
-                                'process': 'DryPlan',
-                                'create_date': create_date,
-                                'machine': production_phase.pd_line,
-                                'plan_qty': production_phase.plan_qty,
-                                'plan_date': production_phase.plan_date.strftime('%Y-%m-%d')
-                            }
-                            process.append(phase_info)
-                    
-                    elif isinstance(production_phase, DryMix):
-                        phase_info = production_phase.mixing_information
-                        for info in phase_info:
-                            if info.get('item', ''):
-                                chemical[info.get('item')] = str(info.get('quantity')) + info.get('unit')
-                        process.append({
-                            'process': 'DryMix',
-                            'chemical': chemical,
-                            'machine': '',
-                            'create_date': create_date
-                        })
-                    
-                    elif isinstance(production_phase, DryLine):
-                        phase_info = production_phase.pd_information
-                        sub_pd_qty = sub_pd_qty + production_phase.pd_qty
-                        process.append({
-                            'process': 'DryLine',
-                            'pd_qty': production_phase.pd_qty,
-                            'machine': production_phase.line_no,
-                            'create_date': create_date
-                        })
-                    
-                    elif isinstance(production_phase, Delamination):
-                        phase_info = production_phase.dlami_information
-                        process.append({
-                            'process': 'RP',
-                            'delami_qty': production_phase.dlami_qty,
-                            'create_date': create_date,
-                            'machine': production_phase.line_no
-                        })
-                    
-                    elif isinstance(production_phase, Inspection):
-                        phase_info = production_phase.ins_information
-                        sub_pd_qty = 0
-                        for info in phase_info:
-                            defect[info.get('defectCause')] = info.get('quantity')
-                        agrade_qty = production_phase.ins_qty
-                        bal_qty = bal_qty - agrade_qty
-                        
-                        process.append({
-                            'process': 'Inspection',
-                            'agrade_qty': agrade_qty,
-                            'defect': defect,
-                            'machine': production_phase.line_no,
-                            'create_date': create_date,
-                            'qty_to_printing': production_phase.qty_to_printing
-                        })
-
-                    elif isinstance(production_phase, Printing):
-                        phase_info = production_phase.print_information
-                        process.append({
-                            'process': 'Printing',
-                            'print_qty': production_phase.print_qty,
-                            'machine': production_phase.line_no,
-                            'create_date': create_date
-                        })
-                
-                # Sort by time
-                process = sorted(process, key=lambda x: x['create_date'])
-                
-                # Find the latest phase
-                for proc in process:
-                    if not latest_create_date or proc['create_date'] > latest_create_date:
-                        latest_create_date = proc['create_date']
-                        latest_process = proc['process']
-                        latest_machine = proc['machine']
-            
-            # Khởi tạo status với cấu trúc đúng
-            status_data = {
-                'bal_qty': bal_qty,
-                'line_shortage': sub_pd_qty - bal_qty,
-                'process': process,
-                'latest_process': latest_process,
-                'latest_create_date': latest_create_date,
-                'latest_machine': latest_machine,
-                'qty_to_printing': inspection.qty_to_printing
-            }
+    # Latest inspection per order with quantity for printing and no printing after it, newest first
+    inspections = printing_waitlist_events()
+    inspections, next_cursor = keyset_page(inspections, 'create_date', cursor, PRINTING_WAITLIST_PAGE_SIZE, descending=True)
+    count = cache.get_or_set('printing_waitlist_count', printing_waitlist_events().count, 300)
 
-            order_and_status.append((sales_order, status_data))
-            count += 1
+    # Timelines are only loaded for the orders on this page
+    current_orders = [inspection.sales_order for inspection in inspections]
+    order_and_status = list(zip(current_orders, stored_order_statuses(current_orders)))
 
     context = {
         'order_and_status': order_and_status,
         'count': count,
+        'cursor': cursor,
+        'next_cursor': next_cursor,
         'today': today,
         '30daysago': _30daysago
     }
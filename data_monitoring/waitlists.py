@@ -0,0 +1,70 @@
+from django.db.models import Exists, F, OuterRef, Q, Window
+from django.db.models.functions import RowNumber
+from production_management.models import SalesOrder
+from .models import DryLine, Delamination, ProductionEvent
+
+# Orders waiting for the next process, selected with indexed EXISTS checks on the ProductionEvent timeline
+# and paged by keyset so the cost of a page does not depend on how much history is stored.
+
+WAITLIST_PAGE_SIZE = 20
+PRINTING_WAITLIST_PAGE_SIZE = 50
+
+DIRECT_INSPECTION_LINES = ['bsvdl03', 'bsvdl04'] # Go to inspection right after the line
+RP_LINES = ['bsvdl01', 'bsvdl02'] # Need RP before inspection
+DRYLINE_LINES = RP_LINES + DIRECT_INSPECTION_LINES
+
+def order_events(process, **filters):
+    return ProductionEvent.objects.filter(sales_order=OuterRef('pk'), process=process, **filters)
+
+def rp_done_rolls(lines):
+    # RP is checked per production plan, as the roll and its delamination belong to one plan;
+    # the events carry no plan, so this reads the phase tables (plan indexes)
+    return DryLine.objects.filter(sales_order=OuterRef('pk'), line_no__in=lines).filter(
+        Exists(Delamination.objects.filter(production_plan=OuterRef('production_plan')))
+    )
+
+def inspection_waitlist_orders(line=None, customer=None, etd_from=None, etd_to=None):
+    """
+    Orders produced on a direct inspection line, or on an RP line with RP done for the same production plan,
+    that have not been inspected yet.
+    """
+    lines = [line] if line else DRYLINE_LINES
+    direct_lines = [line_no for line_no in lines if line_no in DIRECT_INSPECTION_LINES]
+    rp_lines = [line_no for line_no in lines if line_no in RP_LINES]
+
+    ready = Q()
+    if direct_lines:
+        ready |= Q(Exists(order_events('DryLine', machine__in=direct_lines)))
+    if rp_lines:
+        ready |= Q(Exists(rp_done_rolls(rp_lines)))
+
+    orders = SalesOrder.objects.filter(ready).exclude(Exists(order_events('Inspection')))
+    if customer:
+        orders = orders.filter(customer_name__icontains=customer)
+    if etd_from:
+        orders = orders.filter(etd__gte=etd_from)
+    if etd_to:
+        orders = orders.filter(etd__lte=etd_to)
+    return orders
+
+def printing_waitlist_events():
+    """
+    The latest inspection event of every order, when it sent a quantity to printing and no printing was recorded after it.
+    The latest inspection is picked with a ROW_NUMBER() window, so the whole selection is one SQL statement.
+    """
+    latest_inspections = ProductionEvent.objects.filter(process='Inspection').annotate(
+        row_number=Window(
+            expression=RowNumber(),
+            partition_by=[F('sales_order_id')],
+            order_by=[F('create_date').desc(), F('id').desc()]
+        )
+    ).filter(row_number=1).values('id')
+    later_printings = ProductionEvent.objects.filter(
+        sales_order=OuterRef('sales_order'),
+        process='Printing',
+        create_date__gt=OuterRef('create_date')
+    )
+    return ProductionEvent.objects.filter(
+        id__in=latest_inspections,
+        payload__qty_to_printing__gt=0
+    ).exclude(Exists(later_printings)).select_related('sales_order')
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ProductionManagementConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'production_management'
+
+    def ready(self):
+        from . import signals
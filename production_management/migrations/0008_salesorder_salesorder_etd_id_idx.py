@@ -0,0 +1,17 @@
+# Generated by Django 5.1 on 2026-10-18 10:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('production_management', '0007_alter_developmentcomment_development'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='salesorder',
+            index=models.Index(fields=['etd', 'id'], name='salesorder_etd_id_idx'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+from django.db import migrations
+
+# Frozen copy of the search columns of production_management/search.py when the index was created
+SEARCH_COLUMNS = ['order_no', 'item_name', 'color_code', 'pattern', 'customer_name', 'order_type']
+SEARCH_TABLE = 'production_management_salesorder_search'
+ORDER_TABLE = 'production_management_salesorder'
+
+
+def create_search_index(apps, schema_editor):
+    # PostgreSQL: pg_trgm GIN indexes on UPPER(column) for the icontains filters.
+    # SQLite: FTS5 trigram table over the order columns, kept in sync by triggers.
+    vendor = schema_editor.connection.vendor
+
+    if vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for column in SEARCH_COLUMNS:
+            schema_editor.execute(
+                f'CREATE INDEX IF NOT EXISTS salesorder_{column}_trgm ON {ORDER_TABLE} USING gin (UPPER({column}::text) gin_trgm_ops)'
+            )
+
+    elif vendor == 'sqlite':
+        column_list = ', '.join(SEARCH_COLUMNS)
+        new_values = ', '.join(f'new.{column}' for column in SEARCH_COLUMNS)
+        old_values = ', '.join(f'old.{column}' for column in SEARCH_COLUMNS)
+        drop_search_index(apps, schema_editor)
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5({column_list}, content='{ORDER_TABLE}', content_rowid='id', tokenize='trigram')"
+        )
+        schema_editor.execute(f"""
+            CREATE TRIGGER {SEARCH_TABLE}_ai AFTER INSERT ON {ORDER_TABLE} BEGIN
+                INSERT INTO {SEARCH_TABLE}(rowid, {column_list}) VALUES (new.id, {new_values});
+            END""")
+        schema_editor.execute(f"""
+            CREATE TRIGGER {SEARCH_TABLE}_ad AFTER DELETE ON {ORDER_TABLE} BEGIN
+                INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+            END""")
+        schema_editor.execute(f"""
+            CREATE TRIGGER {SEARCH_TABLE}_au AFTER UPDATE ON {ORDER_TABLE} BEGIN
+                INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+                INSERT INTO {SEARCH_TABLE}(rowid, {column_list}) VALUES (new.id, {new_values});
+            END""")
+        schema_editor.execute(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')")
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+
+    if vendor == 'postgresql':
+        for column in SEARCH_COLUMNS:
+            schema_editor.execute(f'DROP INDEX IF EXISTS salesorder_{column}_trgm')
+
+    elif vendor == 'sqlite':
+        for suffix in ('ai', 'ad', 'au'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {SEARCH_TABLE}_{suffix}')
+        schema_editor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('production_management', '0008_salesorder_salesorder_etd_id_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
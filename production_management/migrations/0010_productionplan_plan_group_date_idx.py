@@ -0,0 +1,17 @@
+# Generated by Django 5.1 on 2026-10-18 10:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('production_management', '0009_salesorder_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='productionplan',
+            index=models.Index(fields=['item_group', 'create_date'], name='plan_group_date_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1 on 2026-10-18 10:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('production_management', '0010_productionplan_plan_group_date_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='salesorderuploadlog',
+            name='stored_file',
+            field=models.CharField(max_length=255, null=True),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1 on 2026-10-18 10:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('production_management', '0011_salesorderuploadlog_stored_file'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='salesorder',
+            name='row_hash',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='salesorderuploadlog',
+            name='duplicate_of',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='production_management.salesorderuploadlog'),
+        ),
+        migrations.AddField(
+            model_name='salesorderuploadlog',
+            name='unchanged_count',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='salesorderuploadlog',
+            name='file_hash',
+            field=models.CharField(db_index=True, max_length=64),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1 on 2026-10-18 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('production_management', '0012_order_upload_dedupe'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='salesorderuploadlog',
+            name='errors',
+            field=models.JSONField(default=list),
+        ),
+        migrations.AddField(
+            model_name='salesorderuploadlog',
+            name='failed',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='salesorderuploadlog',
+            name='inserted_count',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='salesorderuploadlog',
+            name='skipped_count',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='salesorderuploadlog',
+            name='updated_count',
+            field=models.IntegerField(null=True),
+        ),
+    ]
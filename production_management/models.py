@@ -1,7 +1,7 @@
 from django.db import models
 from django.utils import timezone
 from django.core.exceptions import ValidationError
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
 from django.contrib.auth.models import User
 
 # ERP 주문 정보
@@ -32,6 +32,7 @@ class SalesOrder(models.Model):
     product_group = models.CharField(max_length=10) # 제품 그룹
     product_type = models.CharField(max_length=50) # 제품 유형
     color_name = models.CharField(max_length=50, null=True) # 컬러 명
+    row_hash = models.CharField(max_length=64, null=True) # SHA-256 of the order sheet row last applied, see order_sheet.py
     status = models.BooleanField(null=True) # 등록 시 null, 출고 완료 시 True, 삭제 시 false
     create_date = models.DateTimeField(default=timezone.now)
     modify_date = models.DateTimeField(auto_now=True)
@@ -44,6 +45,11 @@ class SalesOrder(models.Model):
         except IntegrityError:
             raise ValidationError(f"Order number '{self.order_no}' already exists.")
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['etd', 'id'], name='salesorder_etd_id_idx'), # Keyset pagination of the waitlists
+        ]
+
     def __str__(self):
         return self.order_no
 
@@ -51,13 +57,31 @@ class SalesOrderUploadLog(models.Model):
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)  # 업로드한 유저
     upload_time = models.DateTimeField(auto_now_add=True)  # 업로드 시간
     file_name = models.CharField(max_length=255)  # 업로드 파일 이름
-    file_hash = models.CharField(max_length=64)  # 파일의 해시값 (SHA-256 기준)
+    file_hash = models.CharField(max_length=64, db_index=True)  # 파일의 해시값 (SHA-256 기준)
     data_count = models.IntegerField()  # 업로드된 데이터 갯수
+    stored_file = models.CharField(max_length=255, null=True)  # Stored sheet read by the upload task (S3 key or file path), cleared once processed
+    unchanged_count = models.IntegerField(null=True)  # Rows identical to their order, set when the upload is processed
+    duplicate_of = models.ForeignKey('self', on_delete=models.SET_NULL, null=True)  # Earlier upload of the same file, not processed again
+    inserted_count = models.IntegerField(null=True)  # Orders created, set when the upload is processed
+    updated_count = models.IntegerField(null=True)  # Orders changed
+    skipped_count = models.IntegerField(null=True)  # Rows not applied (older receipt date, invalid row)
+    errors = models.JSONField(default=list)  # Row errors, or the error that stopped the upload
+    failed = models.BooleanField(default=False)  # The upload stopped on an error; its stored sheet is kept
 
     def __str__(self):
         return f"{self.file_name} - {self.upload_time}"
 
-class ProductionPlan(models.Model):
+class AtomicSaveModel(models.Model):
+    # Plan and phase rows: the row and what its post_save receivers write (ProductionEvent, OrderStatus, trace links,
+    # see data_monitoring/signals.py) are committed together, also when the caller has no transaction
+    def save(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+    class Meta:
+        abstract = True
+
+class ProductionPlan(AtomicSaveModel):
     sales_order = models.ForeignKey(SalesOrder, on_delete=models.CASCADE)
     plan_date = models.DateField()
     plan_no = models.CharField(max_length=10, null=True)
@@ -68,6 +92,11 @@ class ProductionPlan(models.Model):
     create_date = models.DateTimeField(default=timezone.now)
     modify_date = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['item_group', 'create_date'], name='plan_group_date_idx'), # Dry plan list
+        ]
+
     def __str__(self):
         return f"{self.sales_order.order_no}-{self.plan_date}"
 
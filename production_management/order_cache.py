@@ -0,0 +1,90 @@
+from collections import OrderedDict
+from django.core.cache import cache
+from django.conf import settings
+from .models import SalesOrder
+import threading
+import time
+
+# Order summaries shown on the kiosks when a QR code is scanned.
+# Lookups go through a small LRU in the process, then the shared cache, and only then the database.
+# Other processes drop their local copy after ORDER_LOOKUP_LOCAL_TTL seconds; the shared tier is invalidated on every change.
+
+SUMMARY_FIELDS = ('order_no', 'item_name', 'pattern', 'color_code', 'customer_name', 'order_qty', 'order_type', 'brand', 'qty_unit')
+
+class LocalOrderCache:
+    """Bounded, thread-safe LRU with a time-to-live per entry."""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+local_cache = LocalOrderCache(
+    max_size=getattr(settings, 'ORDER_LOOKUP_LOCAL_SIZE', 2048),
+    ttl=getattr(settings, 'ORDER_LOOKUP_LOCAL_TTL', 60)
+)
+
+def cache_key(order_no):
+    return f"order_summary:{order_no}"
+
+def order_summary(order):
+    return {
+        'order_number': order.order_no,
+        'order_information': {
+            'item': order.item_name,
+            'pattern': order.pattern,
+            'color_code': order.color_code,
+            'customer': order.customer_name,
+            'order_qty': order.order_qty,
+            'order_type': order.order_type,
+            'brand': order.brand,
+            'qty_unit': order.qty_unit
+        }
+    }
+
+def get_order_summary(order_no):
+    """Return the summary of an active (not deleted) order, or None if there is no such order."""
+    summary = local_cache.get(order_no)
+    if summary is not None:
+        return summary
+
+    summary = cache.get(cache_key(order_no))
+    if summary is None:
+        order = SalesOrder.objects.exclude(status=False).filter(order_no=order_no).only(*SUMMARY_FIELDS).first()
+        if order is None:
+            return None  # Misses are not cached, the order may be uploaded at any time
+        summary = order_summary(order)
+        cache.set(cache_key(order_no), summary, getattr(settings, 'ORDER_LOOKUP_CACHE_TIMEOUT', 86400))
+
+    local_cache.set(order_no, summary)
+    return summary
+
+def invalidate_order_summaries(order_nos):
+    order_nos = list(order_nos)
+    for order_no in order_nos:
+        local_cache.delete(order_no)
+    cache.delete_many([cache_key(order_no) for order_no in order_nos])
@@ -0,0 +1,253 @@
+import hashlib
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+from datetime import date, datetime
+import boto3
+import openpyxl
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from data_monitoring.status import create_order_statuses, change_order_qtys
+from .models import SalesOrder, SalesOrderUploadLog
+from .order_cache import invalidate_order_summaries
+
+import logging
+logger = logging.getLogger('production_management')
+
+# Daily ERP order sheet ("Total received today") -> SalesOrder.
+# The parsed rows are replayed in memory against the orders of the sheet, fetched with one query: an existing order
+# with a positive quantity is reactivated (status None) and overwritten, a new one with a positive quantity
+# is created, anything else is skipped. Each order keeps the SHA-256 of the row last applied (row_hash): an
+# active order whose row hash did not change is left alone, so a daily sheet repeating yesterday's rows only
+# writes what changed. The rest is written with bulk_create / bulk_update in transactions of
+# ORDER_UPLOAD_CHUNK_SIZE orders, which also refresh their OrderStatus.
+# The uploaded file is stored once (ORDER_UPLOAD_STORAGE: local directory or S3) and the Celery task only gets
+# its upload log; the worker reads the sheet row by row with a read-only openpyxl workbook, then deletes it.
+# A file identical (file_hash) to an upload already processed is only logged as its duplicate.
+
+SHEET_NAME = 'Total received today'
+
+# Sheet column -> SalesOrder field
+SHEET_COLUMNS = {
+    'Sales order': 'order_id',
+    'Line number': 'seq_no',
+    'po number': 'customer_order_no',
+    'Customer Name': 'customer_name',
+    'Sales origin': 'order_type',
+    'Receipt date': 'order_date',
+    'RTD': 'rtd',
+    'ETD': 'etd',
+    'Brand Name': 'brand',
+    'Item Name': 'item_name',
+    'Color Code': 'color_code',
+    'Color Name': 'color_name',
+    'TYPE': 'pattern',
+    'Spec Name': 'spec',
+    'Quantity': 'order_qty',
+    'Unit': 'qty_unit',
+    'Ship Unit price': 'unit_price',
+    'Currency(Trade)': 'currency',
+    'Prod. remark': 'order_remark',
+    'Model name': 'model_name',
+    'Sample Step': 'sample_step',
+    'Order To Company': 'production_location',
+    'Prod Group': 'product_group',
+    'Custom No': 'product_type',
+}
+
+ORDER_FIELDS = list(SHEET_COLUMNS.values())
+
+def processed_upload(file_hash):
+    """
+    Earlier upload of the same file, processed or still waiting for the worker (its sheet is stored), if any:
+    an identical re-upload is not processed again. A failed upload does not count.
+    """
+    return SalesOrderUploadLog.objects.filter(
+        Q(unchanged_count__isnull=False) | Q(stored_file__isnull=False),
+        file_hash=file_hash, duplicate_of__isnull=True, failed=False
+    ).order_by('-upload_time').first()
+
+def store_order_sheet(file, file_hash):
+    """Store an uploaded sheet for the worker. Returns its reference (S3 key or file path)."""
+    name = f"{timezone.now():%Y%m%d%H%M%S}_{file_hash[:16]}.xlsx"
+    file.seek(0)
+    if settings.ORDER_UPLOAD_STORAGE == 's3':
+        key = f"{settings.ORDER_UPLOAD_S3_PREFIX}{name}"
+        boto3.client('s3', region_name=settings.AWS_S3_REGION_NAME).upload_fileobj(file, settings.AWS_STORAGE_BUCKET_NAME, key)
+        return key
+
+    os.makedirs(settings.ORDER_UPLOAD_DIR, exist_ok=True)
+    path = os.path.join(settings.ORDER_UPLOAD_DIR, name)
+    with open(path, 'wb') as destination:
+        for chunk in file.chunks():
+            destination.write(chunk)
+    return path
+
+@contextmanager
+def open_order_sheet(reference):
+    """Local path of a stored sheet; an S3 sheet is streamed to a temporary file first."""
+    if settings.ORDER_UPLOAD_STORAGE != 's3':
+        yield reference
+        return
+    with tempfile.NamedTemporaryFile(suffix='.xlsx') as temporary:
+        boto3.client('s3', region_name=settings.AWS_S3_REGION_NAME).download_fileobj(settings.AWS_STORAGE_BUCKET_NAME, reference, temporary)
+        temporary.flush()
+        yield temporary.name
+
+def delete_order_sheet(reference):
+    """Delete a stored sheet once its upload has been processed."""
+    if settings.ORDER_UPLOAD_STORAGE == 's3':
+        boto3.client('s3', region_name=settings.AWS_S3_REGION_NAME).delete_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=reference)
+    elif os.path.exists(reference):
+        os.remove(reference)
+
+def cell_text(value):
+    """Cell value as the former DataFrame string (read_excel(na_filter=False) then astype(str))."""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, date) and not isinstance(value, datetime):
+        return str(datetime(value.year, value.month, value.day))
+    return str(value)
+
+def read_order_sheet(path):
+    """(sheet row number, {column: string}) of the order sheet rows, read one at a time. Empty rows are left out."""
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook[SHEET_NAME].iter_rows(values_only=True)
+        header = [cell_text(value) for value in next(rows, ())]
+        for row_no, values in enumerate(rows, start=2):
+            if all(value is None for value in values):
+                continue
+            yield row_no, dict(zip(header, (cell_text(value) for value in values)))
+    finally:
+        workbook.close()
+
+def parse_date(date_string):
+    if not date_string or date_string in ('NaT', 'nan', 'None'):
+        return None
+
+    date_formats = ['%Y-%m-%d %H:%M:%S', '%Y-%m-%d']
+    for date_format in date_formats:
+        try:
+            return datetime.strptime(str(date_string), date_format).date()
+        except ValueError:
+            continue
+
+    return None
+
+def order_data(row):
+    """SalesOrder field values of a sheet row (column -> string)."""
+    data = {field: row[column] for column, field in SHEET_COLUMNS.items()}
+    data['seq_no'] = int(data['seq_no'])
+    data['order_qty'] = int(data['order_qty'])
+    data['unit_price'] = float(data['unit_price'])
+    for field in ('order_date', 'rtd', 'etd'):
+        data[field] = parse_date(data[field])
+    return data
+
+def row_hash(data):
+    """SHA-256 of the order values of a sheet row."""
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+def plan_order_changes(numbered_rows):
+    """
+    Replay the (sheet row number, row) pairs against the existing orders, oldest receipt date first so the latest
+    row of an order wins. The pairs are consumed as they are read: only the parsed order rows are kept and sorted.
+    Returns (rows read, {order_no: data} to create, {order_no: (id, data, stored order_qty)} to update, rows unchanged,
+    rows skipped, row errors).
+    """
+    parsed = []
+    rows = 0
+    skipped = 0
+    errors = []
+    for row_no, row in numbered_rows:
+        rows += 1
+        if row['Sales order'] == "" and row['Line number'] == "":
+            skipped += 1
+            continue
+        try:
+            parsed.append((row['Receipt date'], f"{row['Sales order']}-{row['Line number']}", order_data(row)))
+        except (KeyError, ValueError, TypeError) as e:
+            errors.append(f"Row {row_no}: {e}")
+    # Stable sort: rows of the same receipt date keep their sheet order
+    parsed.sort(key=lambda item: item[0])
+    parsed = [(order_no, data) for _, order_no, data in parsed]
+
+    # Only the id, quantity, status and row hash of the existing orders are read
+    existing = {
+        order['order_no']: order
+        for order in SalesOrder.objects.filter(order_no__in={order_no for order_no, _ in parsed}).values('id', 'order_no', 'order_qty', 'status', 'row_hash')
+    }
+
+    creates, updates = {}, {}
+    for order_no, data in parsed:
+        if data['order_qty'] <= 0:
+            skipped += 1
+        elif order_no in existing:
+            updates[order_no] = (existing[order_no]['id'], data, existing[order_no]['order_qty'])
+        else:
+            # A later row of the same order overwrites the one created by an earlier row
+            creates[order_no] = data
+
+    # Active orders last written from the same row values are left alone. Orders without a row hash
+    # (created before it was kept or by hand) are written once.
+    unchanged = 0
+    for order_no, (order_id, data, _) in list(updates.items()):
+        order = existing[order_no]
+        if order['status'] is None and order['row_hash'] == row_hash(data):
+            del updates[order_no]
+            unchanged += 1
+    return rows, creates, updates, unchanged, skipped, errors
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def apply_order_sheet(numbered_rows, progress=None, chunk_size=None):
+    """
+    Create and update the orders of the (sheet row number, row) pairs. `progress(done, total)` is called after
+    each chunk. Returns the report {'rows', 'inserted', 'updated', 'unchanged', 'skipped', 'errors'}.
+    """
+    chunk_size = chunk_size or settings.ORDER_UPLOAD_CHUNK_SIZE
+    rows, creates, updates, unchanged, skipped, errors = plan_order_changes(numbered_rows)
+
+    now = timezone.now()
+    new_orders = [SalesOrder(order_no=order_no, row_hash=row_hash(data), **data) for order_no, data in creates.items()]
+    changed_orders = [
+        SalesOrder(id=order_id, order_no=order_no, status=None, row_hash=row_hash(data), modify_date=now, **data)
+        for order_no, (order_id, data, _) in updates.items()
+    ]
+    qty_changes = {order_id: data['order_qty'] - order_qty for order_id, data, order_qty in updates.values()}
+    total = len(new_orders) + len(changed_orders)
+
+    done = 0
+    for orders in chunked(new_orders, chunk_size):
+        with transaction.atomic():
+            SalesOrder.objects.bulk_create(orders)
+            create_order_statuses(orders)
+        done += len(orders)
+        if progress:
+            progress(done, total)
+
+    for orders in chunked(changed_orders, chunk_size):
+        with transaction.atomic():
+            SalesOrder.objects.bulk_update(orders, ORDER_FIELDS + ['status', 'row_hash', 'modify_date'])
+            change_order_qtys({order.id: qty_changes[order.id] for order in orders})
+        done += len(orders)
+        if progress:
+            progress(done, total)
+
+    # Drop the cached kiosk summaries of every order written
+    invalidate_order_summaries(list(creates) + list(updates))
+
+    report = {
+        'rows': rows, 'inserted': len(new_orders), 'updated': len(changed_orders),
+        'unchanged': unchanged, 'skipped': skipped, 'errors': errors
+    }
+    logger.info(f"[ORDER SHEET] INSERTED {report['inserted']} / UPDATED {report['updated']} / UNCHANGED {unchanged} / SKIPPED {skipped} / ERRORS {len(errors)}")
+    return report
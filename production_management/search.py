@@ -0,0 +1,64 @@
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from .models import SalesOrder
+
+# Free-text (partial) search over the SalesOrder attributes used by the monitoring views.
+# PostgreSQL: the icontains filters below are served by pg_trgm GIN indexes on UPPER(column).
+# SQLite: an FTS5 table with the trigram tokenizer is queried instead; it is kept in sync by triggers.
+# Both are created by migration 0009_salesorder_search_index, which keeps its own copy of the columns.
+
+# Search form field -> SalesOrder column
+SEARCH_FIELDS = {
+    'order_no': 'order_no',
+    'item': 'item_name',
+    'color_code': 'color_code',
+    'pattern': 'pattern',
+    'customer': 'customer_name',
+    'order_type': 'order_type',
+}
+
+SEARCH_TABLE = 'production_management_salesorder_search'
+TRIGRAM_MIN_LENGTH = 3 # Shorter terms cannot use the trigram index
+
+def search_terms(data):
+    """Collect the non-empty search fields of a form (request.POST / request.GET)."""
+    terms = {}
+    for field in SEARCH_FIELDS:
+        value = data.get(field, '').strip()
+        if value:
+            terms[field] = value
+    return terms
+
+def search_sales_orders(terms, queryset=None):
+    """
+    SalesOrder matching every term as a case-insensitive partial match.
+    `terms` maps search form fields (see SEARCH_FIELDS) to the searched text.
+    """
+    orders = SalesOrder.objects.all() if queryset is None else queryset
+    terms = {field: value for field, value in terms.items() if value}
+    if not terms:
+        return orders
+
+    match_terms = {}
+    for field, value in terms.items():
+        column = SEARCH_FIELDS[field]
+        if connection.vendor == 'sqlite' and len(value) >= TRIGRAM_MIN_LENGTH:
+            match_terms[column] = value
+        else:
+            orders = orders.filter(**{f'{column}__icontains': value})
+
+    if match_terms:
+        # FTS5 column filters, each term quoted as a phrase: order_no : "SOV123" AND customer_name : "..."
+        match = ' AND '.join('{} : "{}"'.format(column, value.replace('"', '""')) for column, value in match_terms.items())
+        orders = orders.filter(id__in=RawSQL(f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s', [match]))
+    return orders
+
+def search_filter(terms, path):
+    """
+    Q filtering rows related to the matching orders through `path` (e.g. 'production_plan__sales_order').
+    Empty Q when there is nothing to search.
+    """
+    if not any(terms.values()):
+        return Q()
+    return Q(**{f'{path}__in': search_sales_orders(terms).values('id')})
@@ -0,0 +1,8 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import SalesOrder
+from .order_cache import invalidate_order_summaries
+
+@receiver([post_save, post_delete], sender=SalesOrder)
+def sales_order_changed(sender, instance, **kwargs):
+    invalidate_order_summaries([instance.order_no])
@@ -1,7 +1,8 @@
 import openpyxl
 from copy import copy
 import pandas as pd
-from .models import SalesOrder, ProductionPlan
+from .models import SalesOrder, SalesOrderUploadLog, ProductionPlan
+from .order_sheet import apply_order_sheet, open_order_sheet, read_order_sheet, delete_order_sheet
 from datetime import datetime
 from django.http import HttpResponse, JsonResponse
 from django.conf import settings
@@ -9,6 +10,8 @@ from openpyxl.drawing.image import Image
 import qrcode
 import io
 import os
+import logging
+logger = logging.getLogger('production_management')
 
 # Celery
 from celery import shared_task
@@ -84,120 +87,37 @@ def copy_sheet(source_sheet, target_sheet):
     copy_cells(source_sheet, target_sheet)  # copy all the cel values and styles
     copy_sheet_attributes(source_sheet, target_sheet)
 
-def parse_date(date_string):
-    if not date_string or pd.isna(date_string):
-        return None
-    
-    date_formats = ['%Y-%m-%d %H:%M:%S', '%Y-%m-%d']
-    for date_format in date_formats:
-        try:
-            return datetime.strptime(str(date_string), date_format).date()
-        except ValueError:
-            continue
-    
-    return None
-
 @shared_task(bind=True)
-def ordersheet_upload_celery(self,df_json):
+def ordersheet_upload_celery(self, upload_log_id):
     try:
         # Object for recording progress of the operation
         progress_recorder = ProgressRecorder(self)
-        
-        # Convert JSON back to pandas DataFrame
-        df = pd.read_json(df_json)
-        df = df.sort_values(by='Receipt date', ascending=True)
-        
-        for i in range(len(df)):
-            # Skip if Sales order and Line number are empty
-            if df['Sales order'][i] == "" and df['Line number'][i] == "":
-                continue
-        
-            sales_order = SalesOrder.objects.filter(
-                order_no = f"{df['Sales order'][i]}-{(df['Line number'][i])}"
-            ).first()
-            
-            if sales_order:
-                # Compare values in the order_quantity field of the object
-                if (int(df['Quantity'][i])) < 0:
-                    
-                    # order_status 필드 false로 변경
-                    #sales_order.status = True
-                    #sales_order.save()  # Save changes
-                    pass
-                
-                elif (int(df['Quantity'][i])) > 0:
-                    # order_status 필드 None으로 변경
-                    sales_order.status = None
-                    sales_order.save()  # Save changes
-                    
-                    order_data = {
-                        'order_id': df['Sales order'][i],
-                        'seq_no': int(df['Line number'][i]),
-                        'customer_order_no': df['po number'][i],
-                        'customer_name': df['Customer Name'][i],
-                        'order_type': df['Sales origin'][i],
-                        'order_date': parse_date(df['Receipt date'][i]),
-                        'rtd': parse_date(df['RTD'][i]),
-                        'etd': parse_date(df['ETD'][i]),
-                        'brand': df['Brand Name'][i],
-                        'item_name': df['Item Name'][i],
-                        'color_code': df['Color Code'][i],
-                        'color_name': df['Color Name'][i],
-                        'pattern': df['TYPE'][i],
-                        'spec': df['Spec Name'][i],
-                        'order_qty': int(df['Quantity'][i]),
-                        'qty_unit': df['Unit'][i],
-                        'unit_price': float(df['Ship Unit price'][i]),
-                        'currency': df['Currency(Trade)'][i],
-                        'order_remark': df['Prod. remark'][i],
-                        'model_name': df['Model name'][i],
-                        'sample_step': df['Sample Step'][i],
-                        'production_location': df['Order To Company'][i],
-                        'product_group': df['Prod Group'][i],
-                        'product_type': df['Custom No'][i]
-                    }
-        
-                    for key, value in order_data.items():
-                        setattr(sales_order, key, value)
-                    sales_order.save()
-            else:
-                if int(df['Quantity'][i]) > 0:
-                    order_data = {
-                        'order_id': df['Sales order'][i],
-                        'seq_no': int(df['Line number'][i]),
-                        'customer_order_no': df['po number'][i],
-                        'customer_name': df['Customer Name'][i],
-                        'order_type': df['Sales origin'][i],
-                        'order_date': parse_date(df['Receipt date'][i]),
-                        'rtd': parse_date(df['RTD'][i]),
-                        'etd': parse_date(df['ETD'][i]),
-                        'brand': df['Brand Name'][i],
-                        'item_name': df['Item Name'][i],
-                        'color_code': df['Color Code'][i],
-                        'color_name': df['Color Name'][i],
-                        'pattern': df['TYPE'][i],
-                        'spec': df['Spec Name'][i],
-                        'order_qty': int(df['Quantity'][i]),
-                        'qty_unit': df['Unit'][i],
-                        'unit_price': float(df['Ship Unit price'][i]),
-                        'currency': df['Currency(Trade)'][i],
-                        'order_remark': df['Prod. remark'][i],
-                        'model_name': df['Model name'][i],
-                        'sample_step': df['Sample Step'][i],
-                        'production_location': df['Order To Company'][i],
-                        'product_group': df['Prod Group'][i],
-                        'product_type': df['Custom No'][i]
-                    }
-                    
-                    SalesOrder.objects.create(**order_data)
-                else:
-                    continue
-        
-            progress_recorder.set_progress(i + 1, len(df), description="Uploading")
+
+        # The task only gets the upload log; the stored sheet is read row by row
+        upload_log = SalesOrderUploadLog.objects.get(id=upload_log_id)
+        with open_order_sheet(upload_log.stored_file) as path:
+            report = apply_order_sheet(
+                read_order_sheet(path),
+                progress=lambda done, total: progress_recorder.set_progress(done, total, description="Uploading")
+            )
+
+        # The sheet is only kept until its upload is logged; a failed upload keeps it
+        stored_file = upload_log.stored_file
+        upload_log.data_count = report['rows']
+        upload_log.unchanged_count = report['unchanged']
+        upload_log.inserted_count = report['inserted']
+        upload_log.updated_count = report['updated']
+        upload_log.skipped_count = report['skipped']
+        upload_log.errors = report['errors']
+        upload_log.stored_file = None
+        upload_log.save(update_fields=['data_count', 'unchanged_count', 'inserted_count', 'updated_count', 'skipped_count', 'errors', 'stored_file'])
+        delete_order_sheet(stored_file)
+        return report
     except Exception as e:
-        # Print error message if an error occurs during the operation
-        print(f"An error occurred during the operation: {e}")
-        # Add necessary exception handling here
+        logger.exception(f"[ORDER SHEET] Upload {upload_log_id} failed")
+        # The log shows the failure; the stored sheet stays for a retry
+        SalesOrderUploadLog.objects.filter(id=upload_log_id).update(failed=True, errors=[str(e)])
+        raise
 
 def dryplan_convert_to_qrcard(df_json):
     try:
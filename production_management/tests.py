@@ -1,3 +1,233 @@
-from django.test import TestCase
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
+import openpyxl
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from .models import SalesOrder, SalesOrderUploadLog
+from .order_sheet import SHEET_NAME, SHEET_COLUMNS, store_order_sheet, apply_order_sheet
+from .order_cache import LocalOrderCache, local_cache, get_order_summary
+from .search import search_sales_orders
+from .tasks import ordersheet_upload_celery
 
-# Create your tests here.
+LOCAL_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+def sheet_row(order_id, seq_no, receipt_date='2024-01-01 00:00:00', quantity=100, **columns):
+    row = {column: '' for column in SHEET_COLUMNS}
+    row.update({
+        'Sales order': order_id, 'Line number': seq_no, 'Customer Name': 'CUSTOMER', 'Sales origin': 'NO',
+        'Receipt date': receipt_date, 'RTD': '2024-01-10', 'ETD': '2024-01-10', 'Brand Name': 'BRAND',
+        'Item Name': 'ITEM', 'Color Code': 'COLOR', 'TYPE': 'PATTERN', 'Spec Name': '1.0', 'Quantity': quantity,
+        'Unit': 'M', 'Ship Unit price': 1.5, 'Currency(Trade)': 'USD', 'Order To Company': 'BSV',
+        'Prod Group': 'D', 'Custom No': 'T',
+    })
+    row.update(columns)
+    return row
+
+def order_sheet_file(rows, name='orders.xlsx'):
+    """Uploaded .xlsx with the order sheet rows."""
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = SHEET_NAME
+    sheet.append(list(SHEET_COLUMNS))
+    for row in rows:
+        sheet.append([row[column] for column in SHEET_COLUMNS])
+    content = io.BytesIO()
+    workbook.save(content)
+    return SimpleUploadedFile(name, content.getvalue())
+
+
+@override_settings(CACHES=LOCAL_CACHE, ORDER_UPLOAD_STORAGE='local')
+class OrderSheetTaskTests(TestCase):
+    def setUp(self):
+        upload_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, upload_dir)
+        self.enterContext(override_settings(ORDER_UPLOAD_DIR=upload_dir))
+        # No result backend to report the progress to
+        self.enterContext(mock.patch('production_management.tasks.ProgressRecorder'))
+
+    def upload(self, rows, file_hash='0' * 64):
+        stored_file = store_order_sheet(order_sheet_file(rows), file_hash)
+        upload_log = SalesOrderUploadLog.objects.create(file_name='orders.xlsx', file_hash=file_hash, data_count=0, stored_file=stored_file)
+        report = ordersheet_upload_celery(upload_log.id)
+        upload_log.refresh_from_db()
+        return upload_log, stored_file, report
+
+    def test_stored_sheet_is_deleted_once_processed(self):
+        upload_log, stored_file, report = self.upload([sheet_row('SOV0000001', 1), sheet_row('SOV0000001', 2)])
+
+        self.assertEqual(report['inserted'], 2)
+        self.assertEqual((upload_log.data_count, upload_log.unchanged_count, upload_log.stored_file), (2, 0, None))
+        self.assertFalse(os.path.exists(stored_file))
+        self.assertEqual(SalesOrder.objects.count(), 2)
+
+    def test_report_is_kept_on_the_log(self):
+        self.upload([sheet_row('SOV0000001', 1), sheet_row('SOV0000001', 2)])
+        upload_log, _, report = self.upload([
+            sheet_row('SOV0000001', 1), sheet_row('SOV0000001', 2, quantity=200), sheet_row('SOV0000001', 3),
+            sheet_row('SOV0000001', 4, quantity=0), sheet_row('SOV0000001', 5, Quantity='many'),
+        ], file_hash='1' * 64)
+
+        self.assertEqual(
+            (upload_log.inserted_count, upload_log.updated_count, upload_log.unchanged_count, upload_log.skipped_count),
+            (1, 1, 1, 1)
+        )
+        self.assertEqual(upload_log.errors, report['errors'])
+        self.assertEqual(len(upload_log.errors), 1)
+        self.assertFalse(upload_log.failed)
+
+    def test_failed_upload_is_logged(self):
+        with mock.patch('production_management.tasks.apply_order_sheet', side_effect=ValueError('Sheet not found')):
+            with self.assertLogs('production_management', 'ERROR'), self.assertRaises(ValueError):
+                self.upload([sheet_row('SOV0000001', 1)])
+
+        upload_log = SalesOrderUploadLog.objects.get()
+        self.assertTrue(upload_log.failed)
+        self.assertEqual(upload_log.errors, ['Sheet not found'])
+        # The sheet is kept for a retry
+        self.assertTrue(os.path.exists(upload_log.stored_file))
+
+    def test_cancelled_order_is_reactivated_by_an_unchanged_row(self):
+        rows = [sheet_row('SOV0000001', 1)]
+        self.upload(rows)
+        SalesOrder.objects.filter(order_no='SOV0000001-1').update(status=False)
+
+        _, _, report = self.upload(rows, file_hash='1' * 64)
+        self.assertEqual((report['updated'], report['unchanged']), (1, 0))
+        self.assertIsNone(SalesOrder.objects.get(order_no='SOV0000001-1').status)
+
+    def test_reupload_only_writes_changed_rows(self):
+        rows = [sheet_row('SOV0000001', seq_no) for seq_no in range(1, 4)]
+        self.upload(rows)
+        first_write = SalesOrder.objects.get(order_no='SOV0000001-1').modify_date
+
+        rows[1]['Quantity'] = 150
+        upload_log, _, report = self.upload(rows, file_hash='1' * 64)
+        self.assertEqual((report['inserted'], report['updated'], report['unchanged']), (0, 1, 2))
+        self.assertEqual(upload_log.unchanged_count, 2)
+        self.assertEqual(SalesOrder.objects.get(order_no='SOV0000001-2').order_qty, 150)
+        self.assertEqual(SalesOrder.objects.get(order_no='SOV0000001-1').modify_date, first_write)
+
+    def post_sheet(self, sheet, times, run_upload=True):
+        """Upload the sheet `times` times through the page; the task runs in the request unless run_upload is False."""
+        user = User.objects.create_user('planner', password='password')
+        user.profile.position = 'PM'
+        user.profile.save()
+        self.client.force_login(user)
+
+        with mock.patch('production_management.views.ordersheet_upload_celery') as upload_task:
+            def delay(upload_log_id):
+                if run_upload:
+                    ordersheet_upload_celery(upload_log_id)
+                return mock.Mock(task_id='upload-task')
+            upload_task.delay.side_effect = delay
+            for _ in range(times):
+                sheet.seek(0)
+                self.client.post('/production_management/order_sheet_upload/', {'importData': sheet})
+        return upload_task.delay.call_count
+
+    def test_same_sheet_is_processed_once(self):
+        self.assertEqual(self.post_sheet(order_sheet_file([sheet_row('SOV0000001', 1)]), 2), 1)
+        first, second = SalesOrderUploadLog.objects.order_by('id')
+        self.assertEqual((second.duplicate_of, second.stored_file, second.data_count), (first, None, 1))
+        self.assertEqual(SalesOrder.objects.count(), 1)
+
+    def test_sheet_waiting_for_the_worker_is_not_queued_again(self):
+        self.assertEqual(self.post_sheet(order_sheet_file([sheet_row('SOV0000001', 1)]), 2, run_upload=False), 1)
+        first, second = SalesOrderUploadLog.objects.order_by('id')
+        self.assertIsNotNone(first.stored_file)
+        self.assertEqual((second.duplicate_of, second.stored_file), (first, None))
+
+    def test_failed_sheet_can_be_uploaded_again(self):
+        sheet = order_sheet_file([sheet_row('SOV0000001', 1)])
+        file_hash = hashlib.sha256(sheet.read()).hexdigest()
+        SalesOrderUploadLog.objects.create(file_name='orders.xlsx', file_hash=file_hash, data_count=0, stored_file='kept.xlsx', failed=True)
+
+        self.assertEqual(self.post_sheet(sheet, 1), 1)
+        self.assertEqual(SalesOrder.objects.count(), 1)
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class OrderSheetTests(TestCase):
+    def apply(self, rows):
+        # Rows streamed as the worker reads them
+        return apply_order_sheet(((row_no, row) for row_no, row in enumerate(rows, start=2)), chunk_size=2)
+
+    def test_latest_receipt_date_wins(self):
+        report = self.apply([
+            sheet_row('SOV0000001', 1, receipt_date='2024-01-03 00:00:00', quantity=300),
+            sheet_row('SOV0000001', 2),
+            sheet_row('SOV0000001', 1, receipt_date='2024-01-02 00:00:00', quantity=200),
+            sheet_row('', ''),
+            sheet_row('SOV0000001', 'x'),
+        ])
+
+        self.assertEqual((report['rows'], report['inserted'], report['skipped']), (5, 2, 1))
+        self.assertEqual(report['errors'], ["Row 6: invalid literal for int() with base 10: 'x'"])
+        self.assertEqual(SalesOrder.objects.get(order_no='SOV0000001-1').order_qty, 300)
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class SearchTests(TestCase):
+    def test_partial_terms_follow_order_writes(self):
+        apply_order_sheet(enumerate([sheet_row('SOV0000001', 1, **{'Customer Name': 'ALPHA TEXTILE'}), sheet_row('SOV0000002', 1)], start=2))
+        self.assertEqual([order.order_no for order in search_sales_orders({'customer': 'textile'})], ['SOV0000001-1'])
+        # Short terms skip the trigram index
+        self.assertEqual(search_sales_orders({'order_no': '2-'}).count(), 1)
+
+        order = SalesOrder.objects.get(order_no='SOV0000002-1')
+        order.customer_name = 'BETA TEXTILE'
+        order.save()
+        self.assertEqual(search_sales_orders({'customer': 'textile'}).count(), 2)
+
+
+class LocalOrderCacheTests(TestCase):
+    def test_least_recently_used_entry_is_evicted(self):
+        lru = LocalOrderCache(max_size=2, ttl=60)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+        self.assertEqual((lru.get('a'), lru.get('b'), lru.get('c')), (1, None, 3))
+
+    def test_entry_expires_after_ttl(self):
+        lru = LocalOrderCache(max_size=2, ttl=60)
+        with mock.patch('production_management.order_cache.time.monotonic', return_value=1000.0):
+            lru.set('a', 1)
+        with mock.patch('production_management.order_cache.time.monotonic', return_value=1059.0):
+            self.assertEqual(lru.get('a'), 1)
+        with mock.patch('production_management.order_cache.time.monotonic', return_value=1061.0):
+            self.assertIsNone(lru.get('a'))
+        self.assertEqual(len(lru.entries), 0)
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class OrderSummaryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        local_cache.entries.clear()
+        apply_order_sheet(enumerate([sheet_row('SOV0000001', 1)], start=2))
+
+    def test_lookup_is_served_from_the_cache(self):
+        self.assertEqual(get_order_summary('SOV0000001-1')['order_information']['order_qty'], 100)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_order_summary('SOV0000001-1')['order_number'], 'SOV0000001-1')
+
+    def test_order_changes_invalidate_the_summary(self):
+        get_order_summary('SOV0000001-1')
+        order = SalesOrder.objects.get(order_no='SOV0000001-1')
+        order.order_qty = 150
+        order.save()
+        self.assertEqual(get_order_summary('SOV0000001-1')['order_information']['order_qty'], 150)
+
+        # Bulk writes of the order sheet do not send signals and invalidate explicitly
+        apply_order_sheet(enumerate([sheet_row('SOV0000001', 1, quantity=200)], start=2))
+        self.assertEqual(get_order_summary('SOV0000001-1')['order_information']['order_qty'], 200)
+
+        order.delete()
+        self.assertIsNone(get_order_summary('SOV0000001-1'))
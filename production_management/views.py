@@ -2,6 +2,7 @@ from django.shortcuts import render, get_object_or_404, redirect, resolve_url
 from django.http import JsonResponse, HttpResponseNotAllowed
 import pandas as pd
 from .tasks import ordersheet_upload_celery, dryplan_convert_to_qrcard, dev_order_convert_to_qrcard
+from .order_sheet import processed_upload, store_order_sheet
 from .models import SalesOrder, SalesOrderUploadLog, Development, DevelopmentOrder, DevelopmentComment
 import hashlib
 from django.utils import timezone
@@ -50,35 +51,44 @@ def order_sheet_upload(request):
             file = request.FILES['importData']
 
             # Calculate file hash
-            file_hash = hashlib.sha256(file.read()).hexdigest()
-            file.seek(0)  # Move file pointer back to the beginning
-            
-            # Convert Excel file to Pandas DataFrame
-            df = pd.read_excel(file, na_filter=False, sheet_name='Total received today')            
-            # Remove rows with NaN values
-            df = df.dropna()
-            
-            # Convert required columns to strings
-            for col in df.columns:
-                df[col] = df[col].astype(str)
-            
-            # Convert DataFrame to JSON
-            df_json = df.to_json()
-            
-            # Optional: Validate order sheet file
-            # ordersheet_file_validation(df_json)
-            
-            # Start Celery task
-            order_upload_task = ordersheet_upload_celery.delay(df_json)
-            task_id = order_upload_task.task_id
+            sha256 = hashlib.sha256()
+            for chunk in file.chunks():
+                sha256.update(chunk)
+            file_hash = sha256.hexdigest()
+
+            # The same file was already applied: log it without processing it again
+            previous_upload = processed_upload(file_hash)
+            if previous_upload:
+                SalesOrderUploadLog.objects.create(
+                    user=request.user,
+                    file_name=file.name,
+                    file_hash=file_hash,
+                    data_count=previous_upload.data_count,
+                    unchanged_count=previous_upload.data_count,
+                    duplicate_of=previous_upload
+                )
+                upload_time = f"{timezone.localtime(previous_upload.upload_time):%Y-%m-%d %H:%M}"
+                if previous_upload.stored_file:
+                    messages.info(request, f"{file.name} is identical to the upload of {upload_time}, which is still being processed.")
+                else:
+                    messages.info(request, f"{file.name} is identical to the upload of {upload_time}, nothing to update.")
+                return redirect('production_management:order_sheet_upload')
+
+            # Store the file once; the Celery task only gets the upload log and reads the sheet itself
+            stored_file = store_order_sheet(file, file_hash)
 
-            # Create SalesOrderUploadLog
-            SalesOrderUploadLog.objects.create(
+            # Create SalesOrderUploadLog, data_count is set by the task
+            upload_log = SalesOrderUploadLog.objects.create(
                 user=request.user,
                 file_name=file.name,
                 file_hash=file_hash,
-                data_count=len(df)
+                data_count=0,
+                stored_file=stored_file
             )
+
+            # Start Celery task
+            order_upload_task = ordersheet_upload_celery.delay(upload_log.id)
+            task_id = order_upload_task.task_id
             
             return render(request, 'production_management/order_sheet_upload.html', {'task_id': task_id})
 